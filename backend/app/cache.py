@@ -0,0 +1,82 @@
+"""
+In-process Caches
+-----------------
+Small LRU cache with per-entry TTL and hit/miss/eviction counters, plus a
+registry so every named cache can be reported from one place.
+
+Invalidation is epoch-based: ``invalidate()`` bumps the cache epoch, and a
+``set()`` tagged with the epoch read before the lookup started is dropped
+if an invalidation happened meanwhile. This keeps a slow read that raced
+with a write from re-inserting the old value.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+_registry: Dict[str, "TTLCache"] = {}
+
+
+class TTLCache:
+    """LRU of at most ``maxsize`` entries, each valid for ``ttl`` seconds."""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self.epoch = 0
+        self.hits = self.misses = self.evictions = 0
+        _registry[name] = self
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is not None:
+            value, expires = entry
+            if time.monotonic() < expires:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, epoch: Optional[int] = None) -> None:
+        """Store ``value``; skipped if ``epoch`` is given and an invalidation happened since."""
+        if self.maxsize <= 0 or (epoch is not None and epoch != self.epoch):
+            return
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self.epoch += 1
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self.epoch += 1
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+def cache_stats() -> Dict[str, dict]:
+    """Stats of every cache created so far, by name."""
+    return {name: cache.stats() for name, cache in _registry.items()}
@@ -0,0 +1,70 @@
+"""
+Grievance Template Warm-up
+--------------------------
+Translates every grievance letter template into every supported language
+(or the ``--languages`` / ``--templates`` given) and stores the results,
+the same way the first ``POST /generate-grievance`` in a language would, so
+no letter request has to wait for the LLM. Pairs already stored for the
+current English text are only read back.
+
+Prints one line per pair; the exit status is 1 if any translation failed.
+
+Run from ``backend/``::
+
+    python -m app.cli.grievance_templates --languages hi,ta,bn
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+from typing import List, Optional
+
+from app import db as storage
+from app.models import grievance_letters
+from app.models.text_simplifier import LANGUAGE_NAMES
+
+
+async def run(args) -> int:
+    await storage.connect()
+    print(f"[TEMPLATES] storage: {storage.storage_mode()}", file=sys.stderr)
+    started = time.monotonic()
+    try:
+        rows = await grievance_letters.warm(args.languages, args.templates)
+    finally:
+        await storage.close()
+    for row in rows:
+        print(f"{row['template']:<10} {row['language']:<4} {'ok' if row['ok'] else 'FAILED'}")
+    failed = sum(not row["ok"] for row in rows)
+    print(f"[TEMPLATES] done in {time.monotonic() - started:.1f}s: {len(rows) - failed} ready, {failed} failed",
+          file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _codes(value: str) -> List[str]:
+    return [code.strip() for code in value.split(",") if code.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(
+        prog="python -m app.cli.grievance_templates",
+        description="Translate and store the grievance letter templates ahead of time.",
+    )
+    ap.add_argument("--languages", type=_codes, help="comma-separated language codes (default: all)")
+    ap.add_argument("--templates", type=_codes, help="comma-separated template ids (default: all)")
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    unknown = sorted(set(args.languages or ()) - set(LANGUAGE_NAMES))
+    unknown += sorted(set(args.templates or ()) - set(grievance_letters.templates()))
+    if unknown:
+        raise SystemExit(f"unknown language or template: {', '.join(unknown)}")
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
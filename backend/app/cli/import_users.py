@@ -0,0 +1,80 @@
+"""
+Bulk User Import
+----------------
+Creates accounts from an NDJSON file (one ``{"username", "password",
+"emergency_contact"}`` object per line) in the configured storage, the same
+way ``POST /users/import`` does, without going through HTTP.
+
+The file is streamed; every ``--batch-size`` rows the passwords are hashed
+across ``--workers`` processes and the batch is written in one
+``insert_many``. Rejected rows (invalid JSON or fields, existing usernames,
+repeats) are written as NDJSON to ``--errors`` (default: stderr) with their
+line numbers; the rest are imported. The exit status is 1 if any row failed.
+
+Run from ``backend/``::
+
+    python -m app.cli.import_users pensioners.ndjson --errors rejected.ndjson
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import List, Optional
+
+from app import db as storage
+from app.models import password_hasher, user_import
+
+
+async def run(args) -> int:
+    password_hasher.PASSWORD_HASH_PROCESSES = args.workers
+    await storage.connect()
+    print(f"[IMPORT] storage: {storage.storage_mode()}", file=sys.stderr)
+    started = time.monotonic()
+    summary = {}
+    try:
+        with open(args.input, encoding="utf-8") as f, contextlib.ExitStack() as stack:
+            errors_out = stack.enter_context(open(args.errors, "w", encoding="utf-8")) if args.errors else sys.stderr
+            async for event in user_import.import_users(f, batch_size=args.batch_size):
+                if event["type"] == "error":
+                    errors_out.write(json.dumps(event, ensure_ascii=False) + "\n")
+                elif event["type"] == "batch":
+                    rate = event["rows"] / max(time.monotonic() - started, 1e-9)
+                    print(f"[IMPORT] {event['rows']:,} rows  {event['inserted']:,} inserted  "
+                          f"{event['failed']:,} failed  {rate:,.0f} rows/s", file=sys.stderr)
+                else:
+                    summary = event
+    finally:
+        await storage.close()
+    print(f"[IMPORT] done in {time.monotonic() - started:.1f}s: {summary.get('inserted', 0):,} inserted, "
+          f"{summary.get('failed', 0):,} failed", file=sys.stderr)
+    return 1 if summary.get("failed") else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(
+        prog="python -m app.cli.import_users",
+        description="Create user accounts in bulk from an NDJSON file.",
+    )
+    ap.add_argument("input", help="NDJSON file, one user object per line")
+    ap.add_argument("--errors", help="write rejected rows here as NDJSON (default: stderr)")
+    ap.add_argument("--batch-size", type=int, default=user_import.USER_IMPORT_BATCH,
+                    help="rows hashed and inserted together")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="password hashing processes")
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.batch_size < 1 or args.workers < 1:
+        raise SystemExit("--batch-size and --workers must be at least 1")
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+"""
+Portfolio Risk Scan
+-------------------
+Scores every payment history in a treasury export with the same semantics as
+``/predict-delay`` and writes one result row per pensioner.
+
+The input is streamed in chunks of ``--chunk-size`` histories which are
+scored by ``predict_delay_batch`` on a pool of worker processes. Results are
+written in input order as soon as each chunk is done, so memory stays bounded
+by ``chunk_size * workers * 2`` histories however large the export is.
+
+After every written chunk a checkpoint (``<output>.ckpt``) records how far
+the input and the output got; ``--resume`` truncates the output to that point
+and continues from the matching input offset. The checkpoint is removed once
+the scan completes.
+
+Input layouts:
+  * ``wide`` CSV   one row per pensioner, dates joined by ``--date-sep`` in
+                   the ``--history-field`` column
+  * ``long`` CSV   one row per payment (``--date-field``); rows of the same
+                   pensioner must be contiguous, as in an export sorted by id
+  * NDJSON         one object per line with ``--history-field`` as a list
+
+Run from ``backend/``::
+
+    python -m app.cli.risk_scan payments.csv -o risk.csv --workers 8
+    python -m app.cli.risk_scan payments.csv -o risk.csv --resume
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from app.models.delay_model import predict_delay_batch
+
+OUTPUT_FIELDS = ("id", "risk_score", "status", "expected_next_date", "invalid_dates", "error")
+PROGRESS_EVERY_S = 2.0
+
+
+# ---------------------------------------------------------------------------
+# Input
+# ---------------------------------------------------------------------------
+class _Lines:
+    """UTF-8 line iterator over a binary file that tracks its byte offset.
+
+    ``csv.reader`` pulls lines only as it needs them, so after each row the
+    offset is exactly where the next row starts.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = f.tell()
+
+    def seek(self, offset: int) -> None:
+        self.f.seek(offset)
+        self.offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        raw = self.f.readline()
+        if not raw:
+            raise StopIteration
+        start, self.offset = self.offset, self.offset + len(raw)
+        return raw.decode("utf-8-sig" if start == 0 else "utf-8")
+
+
+@dataclass
+class _Record:
+    id: str
+    history: List[str]
+    end: int  # input offset just past this record
+
+
+def _require(header: List[str], *fields: str) -> None:
+    missing = [f for f in fields if f not in header]
+    if missing:
+        raise SystemExit(f"input is missing column(s): {', '.join(missing)} (have: {', '.join(header)})")
+
+
+def _read_wide_csv(lines: _Lines, start: int, args) -> Iterator[_Record]:
+    reader = csv.reader(lines)
+    header = next(reader, None) or []
+    _require(header, args.id_field, args.history_field)
+    id_col, hist_col = header.index(args.id_field), header.index(args.history_field)
+    if start:
+        lines.seek(start)
+    for row in reader:
+        if not row:
+            continue
+        history = [d for d in row[hist_col].split(args.date_sep) if d.strip()] if hist_col < len(row) else []
+        yield _Record(row[id_col], history, lines.offset)
+
+
+def _read_long_csv(lines: _Lines, start: int, args) -> Iterator[_Record]:
+    reader = csv.reader(lines)
+    header = next(reader, None) or []
+    _require(header, args.id_field, args.date_field)
+    id_col, date_col = header.index(args.id_field), header.index(args.date_field)
+    if start:
+        lines.seek(start)
+    current, history, row_start = None, [], lines.offset
+    for row in reader:
+        if not row:
+            row_start = lines.offset
+            continue
+        if row[id_col] != current:
+            if current is not None:
+                yield _Record(current, history, row_start)
+            current, history = row[id_col], []
+        if date_col < len(row) and row[date_col].strip():
+            history.append(row[date_col])
+        row_start = lines.offset
+    if current is not None:
+        yield _Record(current, history, lines.offset)
+
+
+def _read_ndjson(lines: _Lines, start: int, args) -> Iterator[_Record]:
+    lines.seek(start)
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            raise SystemExit(f"invalid JSON in the line ending at byte offset {lines.offset}")
+        history = obj.get(args.history_field) or []
+        yield _Record(str(obj.get(args.id_field, "")), [str(d) for d in history], lines.offset)
+
+
+def _chunks(records: Iterator[_Record], size: int) -> Iterator[List[_Record]]:
+    chunk: List[_Record] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ---------------------------------------------------------------------------
+# Output
+# ---------------------------------------------------------------------------
+def _render_csv(ids: List[str], results: List[dict]) -> str:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    for record_id, r in zip(ids, results):
+        writer.writerow((
+            record_id,
+            r.get("risk_score", ""),
+            r.get("status", ""),
+            r.get("expected_next_date") or "",
+            ";".join(map(str, r.get("invalid_dates", ()))),
+            r.get("error", ""),
+        ))
+    return buf.getvalue()
+
+
+def _render_ndjson(ids: List[str], results: List[dict]) -> str:
+    return "".join(
+        json.dumps({"id": record_id, **r}, ensure_ascii=False) + "\n" for record_id, r in zip(ids, results)
+    )
+
+
+def _csv_header() -> str:
+    return ",".join(OUTPUT_FIELDS) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint
+# ---------------------------------------------------------------------------
+def _checkpoint_path(output: Path) -> Path:
+    return output.with_name(output.name + ".ckpt")
+
+
+def _save_checkpoint(path: Path, state: dict) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, path)
+
+
+def _load_checkpoint(path: Path, identity: dict) -> Optional[dict]:
+    if not path.exists():
+        return None
+    state = json.loads(path.read_text())
+    if {k: state.get(k) for k in identity} != identity:
+        raise SystemExit(
+            f"checkpoint {path} was written for a different input or options; "
+            "delete it or rerun without --resume"
+        )
+    return state
+
+
+# ---------------------------------------------------------------------------
+# Scan
+# ---------------------------------------------------------------------------
+def _score_chunk(histories: List[List[str]]) -> List[dict]:
+    return predict_delay_batch(histories)
+
+
+_STOP_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+def _ignore_stop_signals() -> None:
+    # Workers share the terminal's process group; the parent decides when
+    # to stop and shuts the pool down once in-flight chunks are written.
+    for sig in _STOP_SIGNALS:
+        signal.signal(sig, signal.SIG_IGN)
+
+
+@contextlib.contextmanager
+def _graceful_stop() -> Iterator[threading.Event]:
+    """First Ctrl-C/SIGTERM finishes the chunks in flight; a second aborts."""
+    stop = threading.Event()
+
+    def handler(signum, frame):
+        if stop.is_set():
+            raise KeyboardInterrupt
+        stop.set()
+        print("\n[SCAN] stopping after the chunks in flight (Ctrl-C again to abort)", file=sys.stderr)
+
+    previous = [signal.signal(sig, handler) for sig in _STOP_SIGNALS]
+    try:
+        yield stop
+    finally:
+        for sig, old in zip(_STOP_SIGNALS, previous):
+            signal.signal(sig, old)
+
+
+def _detect_format(path: Path, explicit: Optional[str]) -> str:
+    if explicit:
+        return explicit
+    return "ndjson" if path.suffix.lower() in (".ndjson", ".jsonl", ".json") else "csv"
+
+
+def scan(args) -> int:
+    input_path, output_path = Path(args.input), Path(args.output)
+    in_format = _detect_format(input_path, args.input_format)
+    out_format = _detect_format(output_path, args.output_format)
+    identity = {
+        "input": str(input_path.resolve()),
+        "input_size": input_path.stat().st_size,
+        "input_format": in_format,
+        "layout": args.layout,
+        "output_format": out_format,
+    }
+    ckpt_path = _checkpoint_path(output_path)
+    state = _load_checkpoint(ckpt_path, identity) if args.resume else None
+    if state is None:
+        state = {**identity, "input_offset": 0, "records_done": 0, "output_bytes": 0}
+
+    if in_format == "ndjson":
+        read = _read_ndjson
+    else:
+        read = _read_long_csv if args.layout == "long" else _read_wide_csv
+    render = _render_ndjson if out_format == "ndjson" else _render_csv
+
+    resumed_from = state["records_done"]
+    if resumed_from:
+        print(f"[SCAN] resuming after {resumed_from} histories", file=sys.stderr)
+
+    started = last_report = time.perf_counter()
+    scanned = 0
+
+    with open(input_path, "rb") as src, open(output_path, "r+b" if state["output_bytes"] else "wb") as out:
+        out.truncate(state["output_bytes"])
+        out.seek(state["output_bytes"])
+        if not state["output_bytes"] and out_format == "csv":
+            out.write(_csv_header().encode())
+
+        def commit(chunk: List[_Record], results: List[dict]) -> None:
+            nonlocal scanned, last_report
+            out.write(render([r.id for r in chunk], results).encode("utf-8"))
+            out.flush()
+            os.fsync(out.fileno())
+            scanned += len(chunk)
+            state.update(
+                input_offset=chunk[-1].end,
+                records_done=state["records_done"] + len(chunk),
+                output_bytes=out.tell(),
+            )
+            _save_checkpoint(ckpt_path, state)
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_EVERY_S:
+                last_report = now
+                print(f"[SCAN] {state['records_done']:,} histories  "
+                      f"{scanned / (now - started):,.0f} rows/s", file=sys.stderr)
+
+        records = read(_Lines(src), state["input_offset"], args)
+        chunks = _chunks(records, args.chunk_size)
+        with _graceful_stop() as stop:
+            if args.workers <= 1:
+                for chunk in chunks:
+                    commit(chunk, _score_chunk([r.history for r in chunk]))
+                    if stop.is_set():
+                        break
+            else:
+                with ProcessPoolExecutor(max_workers=args.workers, initializer=_ignore_stop_signals) as pool:
+                    # Ordered window: results are written in input order while
+                    # up to 2x workers chunks are in flight.
+                    window: deque = deque()
+                    for chunk in chunks:
+                        window.append((chunk, pool.submit(_score_chunk, [r.history for r in chunk])))
+                        if len(window) >= args.workers * 2:
+                            done, fut = window.popleft()
+                            commit(done, fut.result())
+                        if stop.is_set():
+                            break
+                    while window:
+                        done, fut = window.popleft()
+                        commit(done, fut.result())
+
+    if stop.is_set():
+        print(f"[SCAN] stopped after {state['records_done']:,} histories; "
+              "rerun with --resume to continue", file=sys.stderr)
+        return 130
+
+    elapsed = time.perf_counter() - started
+    ckpt_path.unlink(missing_ok=True)
+    print(f"[SCAN] done: {state['records_done']:,} histories "
+          f"({scanned:,} this run) in {elapsed:.1f}s, "
+          f"{scanned / elapsed if elapsed else 0:,.0f} rows/s -> {output_path}", file=sys.stderr)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(
+        prog="python -m app.cli.risk_scan",
+        description="Score payment-delay risk for every pensioner in a CSV/NDJSON export.",
+    )
+    ap.add_argument("input", help="CSV or NDJSON export")
+    ap.add_argument("-o", "--output", required=True, help="result file (.csv or .ndjson)")
+    ap.add_argument("--input-format", choices=("csv", "ndjson"), help="default: from the file extension")
+    ap.add_argument("--output-format", choices=("csv", "ndjson"), help="default: from the file extension")
+    ap.add_argument("--layout", choices=("wide", "long"), default="wide",
+                    help="CSV layout: one row per pensioner (wide) or per payment (long)")
+    ap.add_argument("--id-field", default="pensioner_id")
+    ap.add_argument("--history-field", default="payment_history")
+    ap.add_argument("--date-field", default="payment_date", help="date column of the long layout")
+    ap.add_argument("--date-sep", default=";", help="separator of dates in the wide layout")
+    ap.add_argument("--chunk-size", type=int, default=5000, help="histories scored per task")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (1 = inline)")
+    ap.add_argument("--resume", action="store_true", help="continue from <output>.ckpt if present")
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.chunk_size < 1:
+        raise SystemExit("--chunk-size must be at least 1")
+    return scan(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
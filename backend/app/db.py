@@ -1,173 +1,348 @@
 import os
+import math
 import asyncio
-from typing import Any
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
 from pathlib import Path
 
 MONGO_URI = os.getenv("MONGODB_URI") or os.getenv("MONGO_URI") or "mongodb://localhost:27017"
 MONGO_DB = os.getenv("MONGO_DB", "samaan")
+DATA_DIR = Path(__file__).resolve().parent / "data"
+LOCAL_DB_PATH = Path(os.getenv("LOCAL_DB_PATH") or DATA_DIR / "samaan.db")
 
+# Connection pool per process. Requests beyond MONGO_MAX_POOL_SIZE wait for a
+# free connection, for at most MONGO_WAIT_QUEUE_TIMEOUT_MS (0 = no limit).
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0"))
 
-class FileUsersCollection:
-    def __init__(self, path: Path):
-        self.path = path
-        self.path.parent.mkdir(parents=True, exist_ok=True)
-        if not self.path.exists():
-            self.path.write_text("{}")
+# Startup waits at most MONGO_CONNECT_TIMEOUT_S for MongoDB (it is also the
+# ping and driver server-selection timeout); requests are served from the
+# local store until it answers.
+MONGO_CONNECT_TIMEOUT_S = float(os.getenv("MONGO_CONNECT_TIMEOUT_S", "2"))
+# Ping interval while connected, and retry backoff bounds while not.
+MONGO_HEALTHCHECK_S = float(os.getenv("MONGO_HEALTHCHECK_S", "15"))
+MONGO_RETRY_MIN_S = float(os.getenv("MONGO_RETRY_MIN_S", "1"))
+MONGO_RETRY_MAX_S = float(os.getenv("MONGO_RETRY_MAX_S", "60"))
+# Consecutive failed pings before switching a connected app to local storage.
+_FAILOVER_AFTER = 2
 
-    def _read(self):
-        import json
-        try:
-            return json.loads(self.path.read_text())
-        except Exception:
-            return {}
-
-    def _write(self, data):
-        import json
-        self.path.write_text(json.dumps(data, indent=2))
-
-    async def find_one(self, query: dict):
-        return await asyncio.to_thread(self._find_one_sync, query)
-
-    async def find(self, query: dict = None):
-        """Return all matching documents as a simple async-iterable list wrapper."""
-        return await asyncio.to_thread(self._find_sync, query or {})
-
-    def _find_sync(self, query: dict):
-        users = self._read()
-        results = []
-        for uname, doc in users.items():
-            doc_copy = dict(doc)
-            doc_copy["username"] = uname
-            match = True
-            for k, v in query.items():
-                if isinstance(v, dict):  # handle operators like {"$ne": None}
-                    op, operand = next(iter(v.items()))
-                    field_val = uname if k == "username" else doc.get(k)
-                    if op == "$ne" and field_val == operand:
-                        match = False
-                        break
-                    elif op == "$eq" and field_val != operand:
-                        match = False
-                        break
-                else:
-                    field_val = uname if k == "username" else doc.get(k)
-                    if field_val != v:
-                        match = False
-                        break
-            if match:
-                results.append(doc_copy)
-        return results
-
-    def _find_one_sync(self, query: dict):
-        users = self._read()
-        for uname, doc in users.items():
-            match = True
-            for k, v in query.items():
-                key_val = uname if k == "username" else doc.get(k)
-                if key_val != v:
-                    match = False
-                    break
-            if match:
-                doc_copy = dict(doc)
-                doc_copy["username"] = uname
-                return doc_copy
-        return None
-
-    async def insert_one(self, doc: dict):
-        return await asyncio.to_thread(self._insert_one_sync, doc)
-
-    def _insert_one_sync(self, doc: dict):
-        users = self._read()
-        users[doc["username"]] = {k: v for k, v in doc.items() if k != "username"}
-        self._write(users)
-        class Res:
-            pass
-        r = Res()
-        r.inserted_id = doc["username"]
-        return r
-
-    async def update_one(self, query: dict, update: dict):
-        return await asyncio.to_thread(self._update_one_sync, query, update)
-
-    def _update_one_sync(self, query: dict, update: dict):
-        users = self._read()
-        username = query.get("username") or None
-        if username is None:
-            class Res:
-                pass
-            r = Res()
-            r.matched_count = 0
-            return r
-        if username not in users:
-            class Res:
-                pass
-            r = Res()
-            r.matched_count = 0
-            return r
-        setobj = update.get("$set", {})
-        users[username].update(setobj)
-        self._write(users)
-        class Res:
-            pass
-        r = Res()
-        r.matched_count = 1
-        return r
+# Indexes ensured whenever a backend becomes active: (collection, field,
+# partial filter). All unique. Users without a fingerprint are left out of
+# the fingerprint index.
+INDEXES = (
+    ("users", "username", None),
+    ("users", "fingerprint", {"fingerprint": {"$type": "string"}}),
+    ("payments", "username", None),
+    ("sessions", "username", None),
+    ("chat_sessions", "session_id", None),
+    ("grievance_templates", "template_id", None),
+)
+
+try:
+    import pymongo
+    import pymongo.errors
+    from pymongo import AsyncMongoClient
+    from pymongo.errors import BulkWriteError as _MongoBulkWriteError
+    from pymongo.errors import DuplicateKeyError as _MongoDuplicateKeyError
+except ImportError:
+    pymongo = None
+    _MongoDuplicateKeyError = _MongoBulkWriteError = None
+
+from app import deadline, request_timing
+from app.local_store import LocalDB
+from app.local_store import BulkWriteError as _LocalBulkWriteError
+from app.local_store import DuplicateKeyError as _LocalDuplicateKeyError
+
+# Raised by insert_one / update_one when a unique index rejects a write.
+DUPLICATE_KEY_ERRORS = tuple(e for e in (_MongoDuplicateKeyError, _LocalDuplicateKeyError) if e)
+# Raised by insert_many after the batch when some documents failed; the
+# failures are in ``err.details["writeErrors"]`` (index, code, errmsg, keyPattern).
+BULK_WRITE_ERRORS = tuple(e for e in (_MongoBulkWriteError, _LocalBulkWriteError) if e)
+
+# Collections still written to the local store while degraded: a lost chat
+# session or cached translation costs a retry, not a user's data.
+DEGRADED_WRITABLE = {"chat_sessions", "grievance_templates"}
+
+
+class StorageReadOnly(RuntimeError):
+    """A write refused because MongoDB, the store of record, is down (see StorageRouter)."""
 
+    def __init__(self, collection: str, retry_after: int):
+        super().__init__(f"{collection}: writes are paused until MongoDB is back")
+        self.collection = collection
+        self.retry_after = retry_after
 
+
+# Kept in sync with the active backend; read it at call time
+# (``from app.db import USING_MONGO`` inside the function), or use storage_mode().
 USING_MONGO = False
 
-try:
-    import pymongo
 
-    print(f"[DB] Connecting to MongoDB: {MONGO_URI[:50]}...")
-    client = pymongo.MongoClient(
-        MONGO_URI,
-        serverSelectionTimeoutMS=5000,
-    )
-    client.admin.command("ping")
-    _raw_db = client[MONGO_DB]
-    print(f"[DB] ✅  MongoDB connected — database: '{MONGO_DB}'")
-
-    class AsyncCollection:
-        def __init__(self, coll: pymongo.collection.Collection):
-            self._coll = coll
-
-        async def find_one(self, *args, **kwargs) -> Any:
-            return await asyncio.to_thread(self._coll.find_one, *args, **kwargs)
-
-        async def find(self, query: dict = None, **kwargs) -> list:
-            """Run a find query and return all results as a plain list."""
-            def _run():
-                return list(self._coll.find(query or {}))
-            return await asyncio.to_thread(_run)
-
-        async def insert_one(self, *args, **kwargs) -> Any:
-            return await asyncio.to_thread(self._coll.insert_one, *args, **kwargs)
-
-        async def update_one(self, *args, **kwargs) -> Any:
-            return await asyncio.to_thread(self._coll.update_one, *args, **kwargs)
-
-    class DBWrapper:
-        def __init__(self, raw_db):
-            self._raw = raw_db
-
-        def __getattr__(self, item: str) -> AsyncCollection:
-            coll = self._raw[item]
-            return AsyncCollection(coll)
-
-    db = DBWrapper(_raw_db)
-    USING_MONGO = True
-
-except Exception as _e:
-    print(f"[DB] ❌  MongoDB unavailable ({_e.__class__.__name__}: {str(_e)[:150]})")
-    print("[DB] ⚠️   Falling back to local file storage (backend/app/data/users.json)")
-    data_dir = Path(__file__).resolve().parent / "data"
-    users_file = data_dir / "users.json"
-    file_coll = FileUsersCollection(users_file)
-
-    class FileDB:
-        def __init__(self, users_coll):
-            self.users = users_coll
-
-    db = FileDB(file_coll)
-    USING_MONGO = False
+class AsyncCollection:
+    """Native async collection; ``find`` returns a plain list like the local store."""
+
+    def __init__(self, coll):
+        self._coll = coll
+
+    async def find_one(self, query: dict, projection: dict = None) -> Any:
+        return await self._coll.find_one(query, projection)
+
+    async def find(self, query: dict = None, projection: dict = None,
+                   sort: Optional[List[Tuple[str, int]]] = None, limit: int = 0) -> list:
+        """Run a find query and return the results as a plain list (``limit=0``: all)."""
+        return await self._coll.find(query or {}, projection, sort=sort, limit=limit).to_list(None)
+
+    async def insert_one(self, *args, **kwargs) -> Any:
+        return await self._coll.insert_one(*args, **kwargs)
+
+    async def insert_many(self, *args, **kwargs) -> Any:
+        return await self._coll.insert_many(*args, **kwargs)
+
+    async def update_one(self, *args, **kwargs) -> Any:
+        return await self._coll.update_one(*args, **kwargs)
+
+    async def create_index(self, field: str, unique: bool = False, partial: Optional[dict] = None) -> None:
+        kwargs = {"partialFilterExpression": partial} if partial else {}
+        await self._coll.create_index([(field, pymongo.ASCENDING)], unique=unique, **kwargs)
+
+
+class DBWrapper:
+    def __init__(self, raw_db):
+        self._raw = raw_db
+        self._collections: Dict[str, AsyncCollection] = {}
+
+    def __getattr__(self, item: str) -> AsyncCollection:
+        if item.startswith("_"):
+            raise AttributeError(item)
+        coll = self._collections.get(item)
+        if coll is None:
+            coll = self._collections[item] = AsyncCollection(self._raw[item])
+        return coll
+
+
+@contextmanager
+def _bounded():
+    """Timing plus the request deadline for one database call.
+
+    Nothing starts once the deadline has passed; MongoDB operations get the
+    time left as their client-side timeout (``pymongo.timeout``), and running
+    out of it raises DeadlineExceeded. SQLite calls are short and local, so
+    they are only checked before starting.
+    """
+    deadline.check("db")
+    left = deadline.remaining()
+    with request_timing.stage("db"):
+        if left is None or not USING_MONGO:
+            yield
+            return
+        try:
+            with pymongo.timeout(left):
+                yield
+        except pymongo.errors.PyMongoError as e:
+            if e.timeout:
+                raise deadline.DeadlineExceeded("db") from e
+            raise
+
+
+class RoutedCollection:
+    """Collection handle that forwards each call to the backend active at that moment."""
+
+    def __init__(self, router: "StorageRouter", name: str):
+        self._router = router
+        self._name = name
+
+    def _target(self):
+        return getattr(self._router.active(), self._name)
+
+    def _write_target(self):
+        self._router.check_writable(self._name)
+        return self._target()
+
+    async def find_one(self, *args, **kwargs) -> Any:
+        with _bounded():
+            return await self._target().find_one(*args, **kwargs)
+
+    async def find(self, *args, **kwargs) -> list:
+        with _bounded():
+            return await self._target().find(*args, **kwargs)
+
+    async def insert_one(self, *args, **kwargs) -> Any:
+        with _bounded():
+            return await self._write_target().insert_one(*args, **kwargs)
+
+    async def insert_many(self, *args, **kwargs) -> Any:
+        with _bounded():
+            return await self._write_target().insert_many(*args, **kwargs)
+
+    async def update_one(self, *args, **kwargs) -> Any:
+        with _bounded():
+            return await self._write_target().update_one(*args, **kwargs)
+
+    async def create_index(self, *args, **kwargs) -> None:
+        await self._target().create_index(*args, **kwargs)
+
+
+class StorageRouter:
+    """``db`` object used by the app: MongoDB when reachable, else local SQLite.
+
+    Nothing connects at import. ``connect()`` (run at startup) tries MongoDB
+    within MONGO_CONNECT_TIMEOUT_S and starts a supervisor task that keeps
+    pinging it: the app switches to MongoDB when it answers and back to the
+    local store after repeated failures. The local store is only opened
+    when it is first needed.
+
+    The two stores are never reconciled. Once MongoDB has been active, it is
+    the store of record: while it is down the local store serves reads,
+    which may be stale (writes made to MongoDB are not in it), and refuses
+    writes other than to ``DEGRADED_WRITABLE`` with StorageReadOnly (503),
+    so signups, payments and token revocations are not lost or undone by
+    the next switch. Before MongoDB has ever answered, the local store is
+    the store of record and takes all writes; those are not copied over
+    when MongoDB comes up, which is logged with how many there were.
+    """
+
+    def __init__(self):
+        self._mongo: Optional[DBWrapper] = None
+        self._client = None
+        self._local: Optional[LocalDB] = None
+        self._collections: Dict[str, RoutedCollection] = {}
+        self._supervisor: Optional[asyncio.Task] = None
+        self._last_error = ""
+        self._had_mongo = False
+        self._retry_s = MONGO_RETRY_MIN_S
+        # Writes taken by the local store before MongoDB was ever reached.
+        self._local_writes = 0
+
+    def __getattr__(self, item: str) -> RoutedCollection:
+        if item.startswith("_"):
+            raise AttributeError(item)
+        coll = self._collections.get(item)
+        if coll is None:
+            coll = self._collections[item] = RoutedCollection(self, item)
+        return coll
+
+    def local(self) -> LocalDB:
+        if self._local is None:
+            # Legacy users.json / payments.json in DATA_DIR are migrated on first use.
+            self._local = LocalDB(LOCAL_DB_PATH, legacy_dir=DATA_DIR)
+        return self._local
+
+    def active(self):
+        return self._mongo if USING_MONGO else self.local()
+
+    def degraded(self) -> bool:
+        """MongoDB has served this process but is down now."""
+        return self._had_mongo and not USING_MONGO
+
+    def check_writable(self, collection: str) -> None:
+        if USING_MONGO:
+            return
+        if self._had_mongo:
+            if collection not in DEGRADED_WRITABLE:
+                raise StorageReadOnly(collection, max(1, math.ceil(self._retry_s)))
+        else:
+            self._local_writes += 1
+
+    # ---- connection management ----
+    async def _ping(self) -> bool:
+        if self._client is None:
+            self._client = AsyncMongoClient(
+                MONGO_URI,
+                serverSelectionTimeoutMS=int(MONGO_CONNECT_TIMEOUT_S * 1000),
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS or None,
+            )
+            self._mongo = DBWrapper(self._client[MONGO_DB])
+        try:
+            await asyncio.wait_for(self._client.admin.command("ping"), MONGO_CONNECT_TIMEOUT_S)
+            return True
+        except asyncio.TimeoutError:
+            self._last_error = f"no answer within {MONGO_CONNECT_TIMEOUT_S:g}s"
+            return False
+        except Exception as e:
+            self._last_error = f"{e.__class__.__name__}: {str(e)[:150]}"
+            return False
+
+    async def _switch(self, to_mongo: bool) -> None:
+        global USING_MONGO
+        USING_MONGO = to_mongo
+        if to_mongo:
+            print(f"[DB] ✅  MongoDB connected — database: '{MONGO_DB}' (pool {MONGO_MIN_POOL_SIZE}-{MONGO_MAX_POOL_SIZE})")
+            if self._local_writes and not self._had_mongo:
+                print(f"[DB] ⚠️   {self._local_writes} writes made to local SQLite storage before MongoDB "
+                      f"answered are not in MongoDB and will not be served from now on")
+            self._had_mongo = True
+        elif self._had_mongo:
+            print(f"[DB] ❌  MongoDB unavailable ({self._last_error})")
+            print(f"[DB] ⚠️   Serving reads from local SQLite storage ({LOCAL_DB_PATH}), which lacks writes made "
+                  f"to MongoDB; writes are refused (503) until it is back")
+        else:
+            print(f"[DB] ❌  MongoDB unavailable ({self._last_error})")
+            print(f"[DB] ⚠️   Using local SQLite storage ({LOCAL_DB_PATH}) until it is back")
+        await ensure_indexes()
+
+    async def connect(self) -> None:
+        """Try MongoDB once within the startup budget, then supervise in the background."""
+        if pymongo is None:
+            print("[DB] ⚠️   pymongo not installed; using local SQLite storage only")
+            await ensure_indexes()
+            return
+        print(f"[DB] Connecting to MongoDB: {MONGO_URI[:50]}...")
+        await self._switch(await self._ping())
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    async def _supervise(self) -> None:
+        failures, delay = 0, MONGO_RETRY_MIN_S
+        while True:
+            self._retry_s = MONGO_HEALTHCHECK_S if USING_MONGO else delay
+            await asyncio.sleep(self._retry_s)
+            ok = await self._ping()
+            if ok:
+                failures, delay = 0, MONGO_RETRY_MIN_S
+                if not USING_MONGO:
+                    await self._switch(True)
+            elif USING_MONGO:
+                failures += 1
+                if failures >= _FAILOVER_AFTER:
+                    await self._switch(False)
+            else:
+                delay = min(delay * 2, MONGO_RETRY_MAX_S)
+
+    async def close(self) -> None:
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            self._supervisor = None
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+db = StorageRouter()
+
+
+def storage_mode() -> str:
+    """``"mongodb"`` or ``"sqlite"``: where requests are being served from."""
+    return "mongodb" if USING_MONGO else "sqlite"
+
+
+async def connect() -> None:
+    await db.connect()
+
+
+async def close() -> None:
+    await db.close()
+
+
+async def ensure_indexes() -> None:
+    """Create the unique indexes in ``INDEXES`` on the active backend.
+
+    Existing duplicates make an index build fail; that is reported and the
+    app keeps running without that index rather than refusing to start.
+    """
+    for name, field, partial in INDEXES:
+        try:
+            await getattr(db, name).create_index(field, unique=True, partial=partial)
+        except Exception as e:
+            print(f"[DB] ⚠️   Could not create unique index {name}.{field} ({e.__class__.__name__}: {str(e)[:150]})")
@@ -0,0 +1,89 @@
+"""
+Request Deadlines
+-----------------
+The time by which the current request must be answered, kept in a context
+variable by ``DeadlineMiddleware`` so any code below a route can ask how
+much budget is left without it being passed around.
+
+Consumers clamp their own timeouts with :func:`clamp` (LLM attempts and
+back-off, MongoDB operations) or call :func:`check` before starting work
+that would be wasted (each OCR stage, each database call). Outside a
+request (CLI, benchmarks, background tasks started after the response)
+there is no deadline and both are no-ops. Work submitted through
+``request_timing.run_in_executor`` sees the deadline of the request that
+submitted it, so a job that waited in the OCR queue past its deadline is
+dropped when a worker picks it up. Work shared by several requests is
+started with :func:`detach`, so it runs on its own timeout instead of the
+deadline of whichever request happened to start it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request ran out of time before ``stage`` could start or finish."""
+
+    def __init__(self, stage: str = ""):
+        super().__init__(f"request deadline exceeded{f' at {stage}' if stage else ''}")
+        self.stage = stage
+
+
+def start(seconds: Optional[float]) -> contextvars.Token:
+    """Give the current context ``seconds`` from now (None: no deadline); returns a reset token."""
+    return _deadline.set(time.monotonic() + seconds if seconds else None)
+
+
+def finish(token: contextvars.Token) -> None:
+    _deadline.reset(token)
+
+
+def detach(coro) -> "asyncio.Task":
+    """Run ``coro`` as a task with no deadline, whatever the current request's is."""
+    ctx = contextvars.copy_context()
+    ctx.run(_deadline.set, None)
+    return ctx.run(asyncio.ensure_future, coro)
+
+
+def at() -> Optional[float]:
+    """The deadline as a ``time.monotonic()`` value, or None."""
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left (may be negative), or None without a deadline."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def clamp(timeout: Optional[float]) -> Optional[float]:
+    """``timeout`` cut to the time left; None only if both are None."""
+    left = remaining()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def check(stage: str = "") -> None:
+    """Raise DeadlineExceeded if the current deadline has passed."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(stage)
+
+
+@contextmanager
+def scope(seconds: Optional[float]) -> Iterator[None]:
+    """Run the ``with`` block under a deadline ``seconds`` from now, never later than the current one."""
+    seconds = clamp(seconds)
+    token = _deadline.set(time.monotonic() + seconds if seconds is not None else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
@@ -0,0 +1,444 @@
+"""
+Local Storage Engine
+--------------------
+Embedded SQLite backend used when MongoDB is unavailable. Each collection is
+a table keyed by one document field (the primary index: ``username``, or
+the field named in :data:`KEY_FIELDS`) holding the rest of the document as
+JSON, and exposes the same async subset of the Motor/PyMongo
+collection API the app uses: ``find_one``, ``find`` (with ``sort`` and
+``limit``), ``insert_one``, ``insert_many``, ``update_one`` (``$set``,
+``$push``/``$each``, ``upsert``) and ``create_index``. Filters support
+equality and ``$eq``/``$ne``/``$gt``/``$gte``/``$lt``/``$lte``/``$in``.
+
+* The database runs in WAL mode: readers never block the writer and see
+  only committed data. Reads use one connection per worker thread.
+* All writes go through a single writer thread. ``update_one`` reads,
+  modifies and writes the document inside that thread, so concurrent
+  updates to the same user can no longer overwrite each other.
+* The writer drains whatever is queued and commits it as one transaction
+  (group commit); each operation runs in its own savepoint so a failing
+  one does not undo the rest, and callers are only resumed after COMMIT.
+* A collection's table is created by the writer thread on first use; its
+  operations wait for that asynchronously, never blocking the event loop.
+  On first open, a legacy ``<collection>.json`` file next to the database
+  is imported in one transaction and renamed to ``*.json.migrated``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# WAL + NORMAL survives process crashes; FULL also survives power loss at
+# the cost of an fsync per group commit.
+LOCAL_DB_SYNCHRONOUS = os.getenv("LOCAL_DB_SYNCHRONOUS", "NORMAL").upper()
+GROUP_COMMIT_MAX = int(os.getenv("LOCAL_DB_GROUP_COMMIT_MAX", "256"))
+
+_STOP = object()
+
+# Collections whose documents are identified by a field other than "username".
+# The table column stays "username" either way; only documents see the name.
+KEY_FIELDS = {"chat_sessions": "session_id", "grievance_templates": "template_id"}
+
+
+class DuplicateKeyError(Exception):
+    """A write would violate a unique index (mirrors ``pymongo.errors.DuplicateKeyError``)."""
+
+    def __init__(self, message: str, field: Optional[str] = None):
+        super().__init__(message)
+        self.field = field
+
+
+class BulkWriteError(Exception):
+    """Some documents of ``insert_many`` failed (mirrors ``pymongo.errors.BulkWriteError``).
+
+    ``details["writeErrors"]`` lists ``{"index", "code", "errmsg", "keyPattern"}``
+    per failed document; the others were inserted.
+    """
+
+    def __init__(self, details: dict):
+        super().__init__(f"{len(details['writeErrors'])} write errors")
+        self.details = details
+
+
+# Comparison operators: SQL spelling and Python test.
+_OPS = {
+    "$eq": ("=", lambda a, b: a == b),
+    "$ne": ("!=", lambda a, b: a != b),
+    "$gt": (">", lambda a, b: a > b),
+    "$gte": (">=", lambda a, b: a >= b),
+    "$lt": ("<", lambda a, b: a < b),
+    "$lte": ("<=", lambda a, b: a <= b),
+    "$in": ("IN", lambda a, b: a in b),
+}
+
+# Upsert that keeps the row's rowid, so scans stay in insertion order.
+_UPSERT = "INSERT INTO {} (username, doc) VALUES (?, ?) ON CONFLICT(username) DO UPDATE SET doc = excluded.doc"
+
+
+def _conditions(v: Any) -> List[Tuple[str, Any]]:
+    """``{"$gt": a, "$lt": b}`` -> [("$gt", a), ("$lt", b)]; plain values are ``$eq``."""
+    if isinstance(v, dict) and v and all(k in _OPS for k in v):
+        return list(v.items())
+    return [("$eq", v)]
+
+
+def _column(k: str, key: str = "username") -> str:
+    return "username" if k == key else f"json_extract(doc, '$.\"{k}\"')"
+
+
+def _matches(key_val: str, doc: dict, query: dict, key: str = "username") -> bool:
+    for k, v in query.items():
+        field_val = key_val if k == key else doc.get(k)
+        for op, operand in _conditions(v):
+            if op in ("$eq", "$ne"):
+                ok = _OPS[op][1](field_val, operand)
+            else:
+                try:
+                    ok = field_val is not None and _OPS[op][1](field_val, operand)
+                except TypeError:
+                    ok = False
+            if not ok:
+                return False
+    return True
+
+
+def _where(query: dict, key: str = "username") -> Tuple[str, list, dict]:
+    """Translate what SQLite can index or filter; return the rest for Python."""
+    clauses, params, rest = [], [], {}
+    for k, v in query.items():
+        field_clauses, field_params = [], []
+        for op, operand in _conditions(v):
+            if op == "$in":
+                if not all(isinstance(x, str) for x in operand):
+                    rest[k] = v
+                    break
+                field_clauses.append(f"{_column(k, key)} IN ({', '.join('?' * len(operand)) or 'NULL'})")
+                field_params += operand
+            elif operand is None and k != key and op in ("$eq", "$ne"):
+                field_clauses.append(f"{_column(k, key)} IS {'NOT ' if op == '$ne' else ''}NULL")
+            elif (isinstance(operand, (str, int, float)) and not isinstance(operand, bool)
+                  and (op in ("$eq", "$ne") or k == key)):
+                # Ranges on JSON fields stay in Python: SQLite orders numbers
+                # before text instead of comparing within one type.
+                field_clauses.append(f"{_column(k, key)} {_OPS[op][0]} ?")
+                field_params.append(operand)
+            else:
+                rest[k] = v
+                break
+        else:
+            clauses += field_clauses
+            params += field_params
+    sql = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return sql, params, rest
+
+
+def _project(doc: dict, projection: Optional[dict], key: str = "username") -> dict:
+    if not projection:
+        return doc
+    if any(v for k, v in projection.items() if k != "_id"):
+        return {k: doc[k] for k in doc if k == key or projection.get(k)}
+    return {k: v for k, v in doc.items() if projection.get(k, 1)}
+
+
+class LocalStore:
+    """One SQLite database file: shared writer thread plus per-thread readers."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._readers = threading.local()
+        # Table name -> its CREATE TABLE (and legacy import), queued on the writer.
+        self._tables: Dict[str, Future] = {}
+        self._legacy: Dict[str, Optional[Path]] = {}
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer = threading.Thread(target=self._run_writer, name="local-store-writer", daemon=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+        conn.execute(f"PRAGMA synchronous={LOCAL_DB_SYNCHRONOUS}")
+        return conn
+
+    def reader(self) -> sqlite3.Connection:
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = self._readers.conn = self._connect()
+        return conn
+
+    def collection(self, name: str, legacy_json: Optional[Path] = None) -> "SQLiteCollection":
+        """Handle on the table ``name``, created by the writer thread without waiting for it here."""
+        if not name.isidentifier():
+            raise ValueError(f"invalid collection name: {name!r}")
+        if name not in self._tables:
+            self._open_table(name, legacy_json)
+        return SQLiteCollection(self, name, KEY_FIELDS.get(name, "username"))
+
+    def _open_table(self, name: str, legacy_json: Optional[Path]) -> None:
+        def migrated(fut: Future) -> None:
+            if fut.exception() is None and fut.result() is not None:
+                # Only once the import is committed.
+                legacy_json.rename(legacy_json.with_name(legacy_json.name + ".migrated"))
+                print(f"[DB] Migrated {fut.result()} documents from {legacy_json.name} into SQLite table '{name}'")
+
+        self._legacy[name] = legacy_json
+        fut = self._tables[name] = self.write(self._create_table, name, legacy_json)
+        fut.add_done_callback(migrated)
+
+    async def ready(self, name: str) -> None:
+        """Wait until the table exists; a failed creation is queued again."""
+        fut = self._tables[name]
+        if fut.done() and fut.exception() is not None:
+            self._open_table(name, self._legacy[name])
+            fut = self._tables[name]
+        if not fut.done():
+            await asyncio.wrap_future(fut)
+        fut.result()
+
+    @staticmethod
+    def _create_table(conn: sqlite3.Connection, name: str, legacy_json: Optional[Path]) -> Optional[int]:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {name} (username TEXT PRIMARY KEY, doc TEXT NOT NULL)")
+        if legacy_json is None or not legacy_json.exists():
+            return None
+        if conn.execute(f"SELECT 1 FROM {name} LIMIT 1").fetchone():
+            return None
+        try:
+            data = json.loads(legacy_json.read_text() or "{}")
+        except ValueError:
+            print(f"[DB] ⚠️   {legacy_json.name} is not valid JSON; not migrated")
+            return None
+        conn.executemany(_UPSERT.format(name), ((uname, json.dumps(doc)) for uname, doc in data.items()))
+        return len(data)
+
+    # ---- writer ----
+    def write(self, fn: Callable, *args) -> Future:
+        """Queue ``fn(conn, *args)`` for the writer thread; resolves after COMMIT."""
+        fut: Future = Future()
+        self._queue.put((fn, args, fut))
+        return fut
+
+    def _run_writer(self) -> None:
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            while len(batch) < GROUP_COMMIT_MAX:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit_batch(conn, batch)
+        conn.close()
+
+    @staticmethod
+    def _commit_batch(conn: sqlite3.Connection, batch: list) -> None:
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, args, fut in batch:
+                conn.execute("SAVEPOINT op")
+                try:
+                    outcomes.append((fut, fn(conn, *args), None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO op")
+                    outcomes.append((fut, None, e))
+                conn.execute("RELEASE op")
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, _, fut in batch:
+                fut.set_exception(e)
+            return
+        for fut, result, err in outcomes:
+            if err is not None:
+                fut.set_exception(err)
+            else:
+                fut.set_result(result)
+
+    def close(self) -> None:
+        """Flush queued writes and stop the writer thread."""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+
+
+class SQLiteCollection:
+    """Async collection over one table of a :class:`LocalStore`."""
+
+    def __init__(self, store: LocalStore, name: str, key: str = "username"):
+        self._store = store
+        self._name = name
+        self._key = key
+
+    # ---- reads ----
+    def _select(self, query: dict, limit: Optional[int] = None,
+                sort: Optional[List[Tuple[str, int]]] = None) -> Iterable[Tuple[str, dict]]:
+        where, params, rest = _where(query or {}, self._key)
+        sql = f"SELECT username, doc FROM {self._name}{where}"
+        if sort:
+            # Sorting by the key walks the primary key, so pages stay cheap.
+            sql += " ORDER BY " + ", ".join(f"{_column(k, self._key)} {'DESC' if d < 0 else 'ASC'}" for k, d in sort)
+        if limit and not rest:
+            sql += f" LIMIT {int(limit)}"
+        returned = 0
+        for key_val, raw in self._store.reader().execute(sql, params):
+            doc = json.loads(raw)
+            if rest and not _matches(key_val, doc, rest, self._key):
+                continue
+            doc[self._key] = key_val
+            yield key_val, doc
+            returned += 1
+            if limit and returned >= limit:
+                return
+
+    def _find_one_sync(self, query: dict, projection: Optional[dict]) -> Optional[dict]:
+        for _, doc in self._select(query, limit=1):
+            return _project(doc, projection, self._key)
+        return None
+
+    def _find_sync(self, query: dict, projection: Optional[dict], sort, limit: int) -> List[dict]:
+        return [_project(doc, projection, self._key) for _, doc in self._select(query, limit, sort)]
+
+    async def find_one(self, query: dict, projection: dict = None) -> Optional[dict]:
+        await self._store.ready(self._name)
+        return await asyncio.to_thread(self._find_one_sync, query, projection)
+
+    async def find(self, query: dict = None, projection: dict = None,
+                   sort: Optional[List[Tuple[str, int]]] = None, limit: int = 0) -> List[dict]:
+        """Return matching documents as a plain list (``limit=0``: all of them)."""
+        await self._store.ready(self._name)
+        return await asyncio.to_thread(self._find_sync, query or {}, projection, sort, limit)
+
+    # ---- writes (run on the writer thread) ----
+    def _execute(self, conn: sqlite3.Connection, sql: str, params: tuple) -> None:
+        try:
+            conn.execute(sql, params)
+        except sqlite3.IntegrityError as e:
+            # "UNIQUE constraint failed: users.username" or "... index 'users_<field>_idx'"
+            msg = str(e)
+            field = msg.rsplit(".", 1)[-1] if msg.startswith(f"UNIQUE constraint failed: {self._name}.") else None
+            if field == "username":
+                field = self._key
+            elif field is None and msg.endswith("_idx'"):
+                field = msg[msg.index(f"'{self._name}_") + len(self._name) + 2:-len("_idx'")]
+            raise DuplicateKeyError(f"{self._name}: {msg}", field) from None
+
+    def _insert(self, conn: sqlite3.Connection, doc: dict) -> Any:
+        body = {k: v for k, v in doc.items() if k != self._key}
+        self._execute(conn, f"INSERT INTO {self._name} (username, doc) VALUES (?, ?)", (doc[self._key], json.dumps(body)))
+        return SimpleNamespace(inserted_id=doc[self._key])
+
+    def _update(self, conn: sqlite3.Connection, query: dict, update: dict, upsert: bool) -> Any:
+        key_val = query.get(self._key)
+        if not isinstance(key_val, str):
+            return SimpleNamespace(matched_count=0, upserted_id=None)
+        row = conn.execute(f"SELECT doc FROM {self._name} WHERE username = ?", (key_val,)).fetchone()
+        if row is not None:
+            doc = json.loads(row[0])
+            if not _matches(key_val, doc, query, self._key):
+                row = None
+        if row is None and not upsert:
+            return SimpleNamespace(matched_count=0, upserted_id=None)
+        if row is None:
+            doc = {}
+        doc.update(update.get("$set", {}))
+        for k, v in update.get("$push", {}).items():
+            items = v["$each"] if isinstance(v, dict) and "$each" in v else [v]
+            doc.setdefault(k, []).extend(items)
+        self._execute(conn, _UPSERT.format(self._name), (key_val, json.dumps(doc)))
+        matched = 1 if row is not None else 0
+        return SimpleNamespace(matched_count=matched, upserted_id=None if matched else key_val)
+
+    def _insert_many(self, conn: sqlite3.Connection, docs: List[dict], ordered: bool) -> Any:
+        inserted, errors = [], []
+        for i, doc in enumerate(docs):
+            conn.execute("SAVEPOINT doc")
+            try:
+                inserted.append(self._insert(conn, doc).inserted_id)
+            except DuplicateKeyError as e:
+                conn.execute("ROLLBACK TO doc")
+                errors.append({"index": i, "code": 11000, "errmsg": str(e), "keyPattern": {e.field or "_": 1}})
+            finally:
+                conn.execute("RELEASE doc")
+            if errors and ordered:
+                break
+        # Errors are reported after the batch commits, like pymongo.
+        return SimpleNamespace(inserted_ids=inserted, write_errors=errors)
+
+    async def insert_one(self, doc: dict) -> Any:
+        await self._store.ready(self._name)
+        return await asyncio.wrap_future(self._store.write(self._insert, doc))
+
+    async def insert_many(self, docs: List[dict], ordered: bool = True) -> Any:
+        """Insert ``docs`` in one transaction; raise BulkWriteError listing the failures.
+
+        With ``ordered=False`` every document is attempted, otherwise the
+        first failure stops the rest.
+        """
+        await self._store.ready(self._name)
+        res = await asyncio.wrap_future(self._store.write(self._insert_many, list(docs), ordered))
+        if res.write_errors:
+            raise BulkWriteError({"writeErrors": res.write_errors, "nInserted": len(res.inserted_ids)})
+        return SimpleNamespace(inserted_ids=res.inserted_ids)
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False) -> Any:
+        await self._store.ready(self._name)
+        return await asyncio.wrap_future(self._store.write(self._update, query, update, upsert))
+
+    # ---- indexes ----
+    def _create_index(self, conn: sqlite3.Connection, field: str, unique: bool, partial: Optional[dict]) -> None:
+        if field == self._key:
+            return  # the primary key
+        column = f"json_extract(doc, '$.\"{field}\"')"
+        # Any partial filter is stored as "field is set": SQLite only uses a
+        # partial index when the query implies its WHERE, and ``field = ?``
+        # implies ``IS NOT NULL``.
+        where = f" WHERE {column} IS NOT NULL" if partial else ""
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        self._execute(conn, f"CREATE {kind} IF NOT EXISTS {self._name}_{field}_idx ON {self._name}({column}){where}", ())
+
+    async def create_index(self, field: str, unique: bool = False, partial: Optional[dict] = None) -> None:
+        """Index a top-level field, with the same expression ``_where`` filters on."""
+        if not field.isidentifier():
+            raise ValueError(f"invalid field name: {field!r}")
+        await self._store.ready(self._name)
+        await asyncio.wrap_future(self._store.write(self._create_index, field, unique, partial))
+
+
+class LocalDB:
+    """Attribute access to collections, like ``pymongo.database.Database``."""
+
+    def __init__(self, path: Path, legacy_dir: Optional[Path] = None):
+        self._store = LocalStore(path)
+        self._legacy_dir = legacy_dir
+        self._collections: Dict[str, SQLiteCollection] = {}
+
+    def __getattr__(self, name: str) -> SQLiteCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        coll = self._collections.get(name)
+        if coll is None:
+            legacy = self._legacy_dir / f"{name}.json" if self._legacy_dir else None
+            coll = self._collections[name] = self._store.collection(name, legacy)
+        return coll
@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import os
@@ -9,16 +10,48 @@ _root = Path(__file__).resolve().parent.parent.parent
 load_dotenv(_root / ".env.local", override=False)
 load_dotenv(override=False)
 
+from app.db import StorageReadOnly
+from app.deadline import DeadlineExceeded
+from app.middleware.deadline import DeadlineMiddleware, deadline_exceeded_handler
+from app.middleware.load_shed import LoadShedMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.middleware.server_timing import ServerTimingMiddleware
 from app.routes import predict, ocr, grievance, simplify, auth, chat, clarify
 
 app = FastAPI(title="SAMAAN ML Backend")
 
+app.add_exception_handler(DeadlineExceeded, deadline_exceeded_handler)
+
+
+@app.exception_handler(StorageReadOnly)
+async def storage_read_only_handler(request, exc: StorageReadOnly):
+    return JSONResponse(
+        {"error": "storage_read_only", "detail": "Saving is paused while the database reconnects. Please retry shortly."},
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+# Added first so they run inside CORS: 429s still get CORS headers, and
+# rate-limited requests are counted in the latency metrics. Deadlines wrap
+# load shedding, so time spent queued for a slot counts against the deadline
+# and a client that hangs up while queued gives its place away.
+app.add_middleware(LoadShedMiddleware)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ServerTimingMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy", "Retry-After",
+        "Server-Timing", "X-Profile-File",
+    ],
 )
 
 app.include_router(predict.router, prefix="", tags=["predict"])
@@ -32,11 +65,20 @@ app.include_router(clarify.router, prefix="", tags=["clarify"])
 
 @app.on_event("startup")
 async def startup_event():
-    from app.db import USING_MONGO
-    if USING_MONGO:
+    from app.db import connect, storage_mode
+    await connect()
+    if storage_mode() == "mongodb":
         print("[STARTUP] ✅  Storage: MongoDB Atlas")
     else:
-        print("[STARTUP] ⚠️   Storage: local file fallback (no MongoDB)")
+        print("[STARTUP] ⚠️   Storage: local SQLite fallback (no MongoDB yet, reconnecting in background)")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from app.db import close
+    from app.services import llm_provider
+    await close()
+    await llm_provider.aclose()
 
 @app.get("/")
 async def root():
@@ -46,4 +88,23 @@ async def root():
 @app.get("/health")
 async def health():
     """Health-check endpoint for monitoring."""
-    return {"status": "healthy", "service": "samaan-backend", "version": "2.0.0"}
+    from app.cache import cache_stats
+    from app.db import storage_mode
+    from app.middleware import load_shed
+    from app.models import faq_index
+    return {
+        "status": "healthy",
+        "service": "samaan-backend",
+        "version": "2.0.0",
+        "storage": storage_mode(),
+        "caches": cache_stats(),
+        "faq": faq_index.stats(),
+        "load": load_shed.stats(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (per worker process)."""
+    from app import metrics as registry
+    return Response(registry.render(), media_type=registry.CONTENT_TYPE)
@@ -0,0 +1,172 @@
+"""
+Metrics
+-------
+Counters and histograms kept in process and rendered in the Prometheus
+text exposition format (0.0.4) by ``GET /metrics``.
+
+Metrics are created once at import time by the module that records them;
+each distinct combination of label values is a separate series. Label
+values must come from a small fixed set (route templates, caller names,
+stages), never from user input. Recording is thread-safe, since OCR stages
+are observed from the OCR worker threads.
+
+Values that already live elsewhere (cache counters) are not copied: a
+collector registered with :func:`register_collector` reads them at scrape
+time.
+
+Every worker process has its own registry; with several workers each one
+reports its own series.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# Seconds; covers sub-millisecond cache hits up to multi-retry LLM calls.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_metrics: Dict[str, "_Metric"] = {}
+_collectors: List[Callable[[], Iterable[str]]] = []
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Response adds "; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        if name in _metrics:
+            raise ValueError(f"metric {name!r} already registered")
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+        _metrics[name] = self
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield from super().render()
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the ``with`` block, even if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> Iterator[str]:
+        yield from super().render()
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = 'le="%s"' % _number(bound)
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+def register_collector(fn: Callable[[], Iterable[str]]) -> None:
+    """Add a function returning exposition lines, called on every scrape."""
+    _collectors.append(fn)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _metrics.values():
+        lines.extend(metric.render())
+    for collect in _collectors:
+        lines.extend(collect())
+    return "\n".join(lines) + "\n"
+
+
+# ---- cache counters (app.cache registry) ----
+def _cache_lines() -> Iterator[str]:
+    from app.cache import cache_stats
+
+    stats = cache_stats()
+    for field, kind, help in (
+        ("hits", "counter", "Cache lookups that found a live entry."),
+        ("misses", "counter", "Cache lookups that found nothing or an expired entry."),
+        ("evictions", "counter", "Entries dropped because the cache was full."),
+        ("size", "gauge", "Entries currently cached."),
+        ("hit_rate", "gauge", "hits / (hits + misses) since start."),
+    ):
+        name = f"samaan_cache_{field}" + ("_total" if kind == "counter" else "")
+        yield f"# HELP {name} {help}"
+        yield f"# TYPE {name} {kind}"
+        for cache, s in sorted(stats.items()):
+            if s[field] is not None:
+                yield f'{name}{{cache="{_escape(cache)}"}} {_number(s[field])}'
+
+
+register_collector(_cache_lines)
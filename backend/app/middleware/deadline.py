@@ -0,0 +1,185 @@
+"""
+Request Deadlines and Cancellation
+----------------------------------
+``DeadlineMiddleware`` gives every HTTP request a deadline (see
+:mod:`app.deadline`) and stops working on requests nobody is waiting for:
+
+* The budget is the route's entry in ``REQUEST_DEADLINES`` (``METHOD
+  PATH=SECONDS`` separated by ``;``, ``*`` suffix for a prefix, ``0`` for
+  none) or ``REQUEST_DEADLINE_S``. A client may ask for less with an
+  ``X-Request-Timeout: <seconds>`` header, never for more.
+* Code below the route clamps LLM retries, OCR stages and database calls
+  to what is left, so a route normally answers (or falls back) in time on
+  its own. If the handler is still running ``DEADLINE_GRACE_S`` after the
+  deadline and has not started its response, it is cancelled and the
+  client gets 504 ``{"error": "deadline_exceeded"}``. A
+  ``DeadlineExceeded`` raised by a stage gets the same 504 through
+  :func:`deadline_exceeded_handler`.
+* When the client disconnects, the handler is cancelled at once. The
+  request body is read through a one-message queue, so uploads keep their
+  back-pressure while the disconnect is still noticed.
+
+Once a response has started (streaming endpoints), the deadline no longer
+cuts it off; disconnects still do. Once it has been sent in full, neither
+does: the server reports the connection as gone at that point, while the
+route's background tasks are still to run (without a deadline).
+Cancellations are counted in ``samaan_requests_cancelled_total{reason}``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import List, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+
+from app import deadline
+from app.metrics import Counter
+
+REQUEST_DEADLINE_S = float(os.getenv("REQUEST_DEADLINE_S", "30"))
+# Long-running and streaming routes get more, or no deadline at all.
+REQUEST_DEADLINES = os.getenv("REQUEST_DEADLINES", (
+    "POST /chat=20; POST /ocr-extract=90; POST /ocr-extract/batch=300; "
+    "POST /users/import=0; GET /users=0"
+))
+DEADLINE_GRACE_S = float(os.getenv("DEADLINE_GRACE_S", "0.5"))
+
+REQUESTS_CANCELLED = Counter(
+    "samaan_requests_cancelled_total",
+    "Requests whose handler was cancelled, by reason (deadline, disconnect).",
+    ("reason",),
+)
+
+_DISCONNECT = {"type": "http.disconnect"}
+
+
+def parse_deadlines(spec: str) -> List[Tuple[str, str, float]]:
+    rules = []
+    for entry in filter(None, (e.strip() for e in spec.split(";"))):
+        try:
+            route, seconds = entry.rsplit("=", 1)
+            method, path = route.split()
+            rules.append((method.upper(), path, float(seconds)))
+        except ValueError:
+            raise ValueError(f"invalid REQUEST_DEADLINES entry: {entry!r}") from None
+    return rules
+
+
+def _header_timeout(scope) -> Optional[float]:
+    for name, value in scope.get("headers") or ():
+        if name == b"x-request-timeout":
+            try:
+                seconds = float(value)
+            except ValueError:
+                return None
+            return seconds if seconds > 0 else None
+    return None
+
+
+def deadline_response(stage: str = "") -> JSONResponse:
+    """The 504 sent for a request that ran out of time."""
+    detail = "The request could not be completed in time."
+    return JSONResponse({"error": "deadline_exceeded", "detail": detail, "stage": stage or None}, status_code=504)
+
+
+async def deadline_exceeded_handler(request, exc: deadline.DeadlineExceeded) -> JSONResponse:
+    """FastAPI exception handler for DeadlineExceeded raised inside a route."""
+    return deadline_response(exc.stage)
+
+
+class DeadlineMiddleware:
+    def __init__(self, app, rules: Optional[List[Tuple[str, str, float]]] = None, default: float = REQUEST_DEADLINE_S):
+        self.app = app
+        self.rules = parse_deadlines(REQUEST_DEADLINES) if rules is None else rules
+        self.default = default
+
+    def budget(self, scope) -> Optional[float]:
+        method, path = scope["method"], scope["path"]
+        seconds = self.default
+        for rule_method, rule_path, rule_seconds in self.rules:
+            if rule_method == method and (
+                path.startswith(rule_path[:-1]) if rule_path.endswith("*") else path == rule_path
+            ):
+                seconds = rule_seconds
+                break
+        requested = _header_timeout(scope)
+        if requested is not None:
+            seconds = min(seconds, requested) if seconds else requested
+        return seconds or None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = self.budget(scope)
+        started = finished = False
+        disconnected = asyncio.Event()
+        inbox: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=1)
+
+        async def pump():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                    return
+                await inbox.put(message)
+
+        async def app_receive():
+            if not inbox.empty():
+                return inbox.get_nowait()
+            if disconnected.is_set():
+                return _DISCONNECT
+            get = asyncio.ensure_future(inbox.get())
+            gone = asyncio.ensure_future(disconnected.wait())
+            done, _ = await asyncio.wait({get, gone}, return_when=asyncio.FIRST_COMPLETED)
+            if get in done:
+                gone.cancel()
+                return get.result()
+            get.cancel()
+            return _DISCONNECT
+
+        async def app_send(message):
+            nonlocal started, finished
+            if message["type"] == "http.response.start":
+                started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                # Set before sending: the server reports a disconnect as soon as the body is out.
+                finished = True
+                # Background tasks run after this in the handler's context; the
+                # deadline was for the response, not for them.
+                deadline.start(None)
+            await send(message)
+
+        # The handler task copies the context, deadline included, when created.
+        token = deadline.start(budget)
+        try:
+            handler = asyncio.ensure_future(self.app(scope, app_receive, app_send))
+        finally:
+            deadline.finish(token)
+        reader = asyncio.ensure_future(pump())
+        gone = asyncio.ensure_future(disconnected.wait())
+        try:
+            timeout = budget + DEADLINE_GRACE_S if budget else None
+            done, _ = await asyncio.wait({handler, gone}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done and started:
+                # Streaming past the deadline is allowed; only a disconnect stops it now.
+                done, _ = await asyncio.wait({handler, gone}, return_when=asyncio.FIRST_COMPLETED)
+            if handler in done:
+                handler.result()
+                return
+            if finished:
+                # The response is complete and the server now reports the connection
+                # as gone; what is still running is the route's background tasks.
+                await handler
+                return
+            reason = "disconnect" if gone in done else "deadline"
+            REQUESTS_CANCELLED.inc(reason=reason)
+            handler.cancel()
+            await asyncio.gather(handler, return_exceptions=True)
+            if reason == "deadline" and not started:
+                await deadline_response()(scope, receive, send)
+        finally:
+            reader.cancel()
+            gone.cancel()
@@ -0,0 +1,268 @@
+"""
+Load Shedding
+-------------
+Per-route concurrency limits applied as ASGI middleware, so a latency spike
+in OCR or the LLM cannot pile up unbounded work in the process and drag
+every other endpoint down with it.
+
+Each entry of ``LOAD_SHED_LIMITS`` (``METHOD PATH=CONCURRENCY[:QUEUE]``,
+``*`` suffix for a prefix) gives its routes ``CONCURRENCY`` slots and a
+waiting line of at most ``QUEUE`` requests. Routes without an entry, and the
+``LOAD_SHED_EXEMPT`` routes (health and metrics), are never queued or shed.
+
+How long a request may wait follows CoDel (controlled delay): while the line
+has been empty at some point in the last ``LOAD_SHED_INTERVAL_MS``, a
+request may wait up to that interval, which absorbs bursts. Once it has
+stayed non-empty for a whole interval the route is overloaded: waits are cut
+to ``LOAD_SHED_TARGET_MS`` and newer requests are served before older ones
+(adaptive LIFO), since the oldest are the likeliest to have been given up
+on. A request that cannot get a slot in time, or finds the line full, gets
+503 ``{"error": "overloaded"}`` with ``Retry-After``. Waiting never outlasts
+the request's deadline.
+
+Shed requests are counted in ``samaan_load_shed_total{policy,reason}``;
+slots in use and line length are exported as gauges, and time spent waiting
+as ``samaan_load_shed_wait_seconds``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import json
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterator, List, Optional
+
+from app import deadline
+from app.metrics import Counter, Histogram, register_collector
+
+logger = logging.getLogger("samaan.loadshed")
+
+LOAD_SHED_ENABLED = os.getenv("LOAD_SHED_ENABLED", "1") != "0"
+# "METHOD PATH=CONCURRENCY[:QUEUE]" entries separated by ";" (QUEUE defaults to 2 x CONCURRENCY).
+LOAD_SHED_LIMITS = os.getenv("LOAD_SHED_LIMITS", (
+    "POST /ocr-extract*=8:32; POST /chat=64:128; POST /api/clarify=32:64; "
+    "POST /simplify-text=32:64; POST /generate-grievance*=32:64; POST /users/import=2:2"
+))
+LOAD_SHED_EXEMPT = os.getenv("LOAD_SHED_EXEMPT", "GET /health; GET /metrics; GET /")
+LOAD_SHED_TARGET_MS = float(os.getenv("LOAD_SHED_TARGET_MS", "100"))
+LOAD_SHED_INTERVAL_MS = float(os.getenv("LOAD_SHED_INTERVAL_MS", "1000"))
+
+LOAD_SHED = Counter(
+    "samaan_load_shed_total",
+    "Requests rejected with 503 by load shedding, by policy and reason (queue_full, queue_timeout).",
+    ("policy", "reason"),
+)
+LOAD_SHED_WAIT = Histogram(
+    "samaan_load_shed_wait_seconds",
+    "Time requests waited for a concurrency slot before running.",
+    ("policy",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+_limiters: Dict[str, "Limiter"] = {}
+
+
+def _route_matches(pattern: str, path: str) -> bool:
+    return path.startswith(pattern[:-1]) if pattern.endswith("*") else path == pattern
+
+
+@dataclass(frozen=True)
+class Limit:
+    method: str
+    path: str
+    concurrency: int
+    queue: int
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.path}"
+
+    def matches(self, method: str, path: str) -> bool:
+        return method == self.method and _route_matches(self.path, path)
+
+
+def parse_limits(spec: str) -> List[Limit]:
+    limits = []
+    for entry in filter(None, (e.strip() for e in spec.split(";"))):
+        try:
+            route, rule = entry.rsplit("=", 1)
+            method, path = route.split()
+            concurrency, _, queue = rule.partition(":")
+            limits.append(Limit(method.upper(), path, int(concurrency), int(queue) if queue else 2 * int(concurrency)))
+        except ValueError:
+            raise ValueError(f"invalid LOAD_SHED_LIMITS entry: {entry!r}") from None
+    return limits
+
+
+def parse_exempt(spec: str) -> List[tuple]:
+    routes = []
+    for entry in filter(None, (e.strip() for e in spec.split(";"))):
+        method, _, path = entry.partition(" ")
+        routes.append((method.upper(), path.strip()))
+    return routes
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Limiter:
+    """Concurrency slots plus a CoDel-managed waiting line for one :class:`Limit`."""
+
+    def __init__(self, limit: Limit, target_s: float = LOAD_SHED_TARGET_MS / 1000,
+                 interval_s: float = LOAD_SHED_INTERVAL_MS / 1000):
+        self.limit = limit
+        self.target_s = target_s
+        self.interval_s = interval_s
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = collections.deque()
+        self._last_empty = time.monotonic()
+        # Smoothed time a request holds its slot, for Retry-After.
+        self._service_s = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def overloaded(self, now: float) -> bool:
+        return bool(self._waiters) and now - self._last_empty > self.interval_s
+
+    def retry_after(self) -> int:
+        drain = self._service_s * (self.queued + 1) / self.limit.concurrency
+        return max(1, math.ceil(drain))
+
+    async def acquire(self) -> float:
+        """Take a slot, waiting if needed; returns the wait in seconds or raises Overloaded."""
+        if self.active < self.limit.concurrency and not self._waiters:
+            self.active += 1
+            return 0.0
+        if self.queued >= self.limit.queue:
+            raise Overloaded("queue_full", self.retry_after())
+
+        now = time.monotonic()
+        if not self._waiters:
+            self._last_empty = now
+        overloaded = self.overloaded(now)
+        wait = deadline.clamp(self.target_s if overloaded else self.interval_s)
+        waiter = asyncio.get_running_loop().create_future()
+        if overloaded:
+            self._waiters.appendleft(waiter)  # adaptive LIFO
+        else:
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, max(wait, 0))
+        except asyncio.TimeoutError:
+            raise Overloaded("queue_timeout", self.retry_after()) from None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(0.0)  # handed a slot just as the caller went away
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                self._remove(waiter)
+        return time.monotonic() - now
+
+    def _remove(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        if not self._waiters:
+            self._last_empty = time.monotonic()
+
+    def release(self, held_s: float) -> None:
+        """Return a slot, handing it straight to the next waiter if there is one."""
+        if held_s:
+            self._service_s = held_s if not self._service_s else 0.8 * self._service_s + 0.2 * held_s
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # the slot moves over; active is unchanged
+                if not self._waiters:
+                    self._last_empty = time.monotonic()
+                return
+        self._last_empty = time.monotonic()
+        self.active -= 1
+
+
+def stats() -> Dict[str, dict]:
+    """Slots in use and waiting requests per limited route."""
+    return {
+        name: {"active": lim.active, "queued": lim.queued, "concurrency": lim.limit.concurrency, "queue": lim.limit.queue}
+        for name, lim in _limiters.items()
+    }
+
+
+def _gauge_lines() -> Iterator[str]:
+    current = stats()
+    for field, text in (("active", "Requests holding a concurrency slot."), ("queued", "Requests waiting for a slot.")):
+        name = f"samaan_load_shed_{field}"
+        yield f"# HELP {name} {text}"
+        yield f"# TYPE {name} gauge"
+        for policy, s in sorted(current.items()):
+            yield f'{name}{{policy="{policy}"}} {s[field]}'
+
+
+register_collector(_gauge_lines)
+
+
+async def _reject(send, err: Overloaded) -> None:
+    body = json.dumps({
+        "error": "overloaded",
+        "detail": f"The server is busy. Please retry in {err.retry_after}s.",
+    }).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"retry-after", str(err.retry_after).encode()),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class LoadShedMiddleware:
+    def __init__(self, app, limits: Optional[List[Limit]] = None, exempt: Optional[List[tuple]] = None):
+        self.app = app
+        limits = parse_limits(LOAD_SHED_LIMITS) if limits is None else limits
+        self.exempt = parse_exempt(LOAD_SHED_EXEMPT) if exempt is None else exempt
+        self.limiters = [_limiters.setdefault(lim.name, Limiter(lim)) for lim in limits]
+
+    def _limiter(self, method: str, path: str) -> Optional[Limiter]:
+        if any(m == method and _route_matches(p, path) for m, p in self.exempt):
+            return None
+        for limiter in self.limiters:
+            if limiter.limit.matches(method, path):
+                return limiter
+        return None
+
+    async def __call__(self, scope, receive, send):
+        limiter = self._limiter(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if limiter is None or not LOAD_SHED_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        policy = limiter.limit.name
+        try:
+            waited = await limiter.acquire()
+        except Overloaded as e:
+            LOAD_SHED.inc(policy=policy, reason=e.reason)
+            logger.warning("Shed %s (%s): %d running, %d waiting", policy, e.reason, limiter.active, limiter.queued)
+            await _reject(send, e)
+            return
+        LOAD_SHED_WAIT.observe(waited, policy=policy)
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.monotonic() - started)
@@ -0,0 +1,67 @@
+"""
+Request Metrics
+---------------
+ASGI middleware recording one ``samaan_http_request_duration_seconds``
+observation per HTTP request, labelled by method, route template (e.g.
+``/profile/{username}``, so path parameters do not create new series) and
+status code. Requests that match no route are grouped under ``unmatched``.
+
+The duration runs until the last body chunk is sent, so streamed responses
+(NDJSON exports, OCR batches) are measured in full.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Dict
+
+from app.metrics import Histogram
+
+REQUEST_SECONDS = Histogram(
+    "samaan_http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response.",
+    ("method", "route", "status"),
+)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._templates: Dict[object, str] = {}
+
+    def _route(self, scope) -> str:
+        # The router stores the matched endpoint in the (shared) scope.
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        template = self._templates.get(endpoint)
+        if template is None:
+            template = next(
+                (r.path for r in scope["app"].routes if getattr(r, "endpoint", None) is endpoint),
+                "unmatched",
+            )
+            self._templates[endpoint] = template
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        started = time.perf_counter()
+        status = 500
+
+        async def send_and_record(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=method, route=self._route(scope), status=str(status),
+            )
@@ -0,0 +1,218 @@
+"""
+Rate Limiting
+-------------
+Per-client request limits applied as ASGI middleware, with one policy per
+route (method + path, ``*`` suffix for a prefix).
+
+Each (policy, client IP) pair is a GCRA bucket: the whole state is one
+number, the theoretical arrival time (TAT) of the next request, so a check
+is O(1) however many requests a client made. A policy ``limit/window`` with
+``burst`` admits ``burst`` back-to-back requests and then one every
+``window / limit`` seconds.
+
+Stores:
+  * ``memory`` (default) - per worker process. Buckets sit in one LRU
+    per policy ordered by last use; a bucket untouched for ``burst``
+    intervals is full again, carries no state and is evicted.
+  * ``sqlite`` - one table in ``RATE_LIMIT_DB_PATH`` shared by every worker
+    on the host; each check is a single atomic UPSERT. Full buckets are
+    deleted every ``RATE_LIMIT_SWEEP_S``. Store errors fail open.
+
+Responses of limited routes carry ``RateLimit-Limit``, ``RateLimit-Remaining``,
+``RateLimit-Reset`` and ``RateLimit-Policy`` (IETF ratelimit-headers draft);
+rejected requests get 429 with ``Retry-After``.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("samaan.ratelimit")
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+RATE_LIMIT_DB_PATH = Path(os.getenv("RATE_LIMIT_DB_PATH") or Path(__file__).resolve().parent.parent / "data" / "ratelimit.db")
+RATE_LIMIT_SWEEP_S = float(os.getenv("RATE_LIMIT_SWEEP_S", "60"))
+# "METHOD PATH=LIMIT/WINDOW_S[:BURST]" entries separated by ";".
+RATE_LIMITS = os.getenv("RATE_LIMITS", (
+    "POST /api/clarify=20/60; POST /chat=30/60; "
+    "POST /login*=30/60; POST /signup*=30/60; POST /register/*=30/60; POST /token/refresh=30/60"
+))
+
+
+@dataclass(frozen=True)
+class Policy:
+    method: str
+    path: str
+    limit: int
+    window: float
+    burst: int
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.path}"
+
+    @property
+    def interval(self) -> float:
+        return self.window / self.limit
+
+    @property
+    def tolerance(self) -> float:
+        return self.interval * self.burst
+
+    def matches(self, method: str, path: str) -> bool:
+        if method != self.method:
+            return False
+        if self.path.endswith("*"):
+            return path.startswith(self.path[:-1])
+        return path == self.path
+
+
+def parse_policies(spec: str) -> List[Policy]:
+    policies = []
+    for entry in filter(None, (e.strip() for e in spec.split(";"))):
+        try:
+            route, rule = entry.rsplit("=", 1)
+            method, path = route.split()
+            rate, _, burst = rule.partition(":")
+            limit, window = rate.split("/")
+            policies.append(Policy(method.upper(), path, int(limit), float(window), int(burst or limit)))
+        except ValueError:
+            raise ValueError(f"invalid RATE_LIMITS entry: {entry!r}") from None
+    return policies
+
+
+# ---- stores: update(policy, key, now) -> (allowed, tat) ----
+class MemoryStore:
+    def __init__(self):
+        # policy name -> key -> (tat, last_update)
+        self._buckets: Dict[str, "OrderedDict[str, Tuple[float, float]]"] = {}
+
+    def __len__(self) -> int:
+        return sum(map(len, self._buckets.values()))
+
+    def update(self, policy: Policy, key: str, now: float) -> Tuple[bool, float]:
+        buckets = self._buckets.setdefault(policy.name, OrderedDict())
+        # Allowed requests keep tat <= last_update + tolerance, so a bucket
+        # idle that long is full; the LRU front is always the idlest one.
+        while buckets:
+            oldest = next(iter(buckets.values()))
+            if oldest[1] + policy.tolerance > now:
+                break
+            buckets.popitem(last=False)
+        entry = buckets.get(key)
+        tat = max(entry[0], now) if entry else now
+        if tat + policy.interval - policy.tolerance > now:
+            return False, tat
+        buckets[key] = (tat + policy.interval, now)
+        buckets.move_to_end(key)
+        return True, tat + policy.interval
+
+
+class SQLiteStore:
+    _UPDATE = (
+        "INSERT INTO buckets (key, tat) VALUES (?1, ?2 + ?3) "
+        "ON CONFLICT(key) DO UPDATE SET tat = max(tat, ?2) + ?3 WHERE max(tat, ?2) + ?3 - ?4 <= ?2 "
+        "RETURNING tat"
+    )
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, timeout=0.05)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")  # losing buckets on a crash is harmless
+        self._conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID")
+        self._swept = 0.0
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT count(*) FROM buckets").fetchone()[0]
+
+    def update(self, policy: Policy, key: str, now: float) -> Tuple[bool, float]:
+        if now - self._swept >= RATE_LIMIT_SWEEP_S:
+            self._swept = now
+            self._conn.execute("DELETE FROM buckets WHERE tat <= ?", (now,))
+        key = f"{policy.name}|{key}"
+        row = self._conn.execute(self._UPDATE, (key, now, policy.interval, policy.tolerance)).fetchone()
+        if row is not None:
+            return True, row[0]
+        (tat,) = self._conn.execute("SELECT tat FROM buckets WHERE key = ?", (key,)).fetchone()
+        return False, max(tat, now)
+
+
+def make_store(kind: str = RATE_LIMIT_STORE):
+    if kind == "sqlite":
+        return SQLiteStore(RATE_LIMIT_DB_PATH)
+    if kind != "memory":
+        raise ValueError(f"unknown RATE_LIMIT_STORE: {kind!r}")
+    return MemoryStore()
+
+
+# ---- middleware ----
+class RateLimitMiddleware:
+    def __init__(self, app, policies: Optional[List[Policy]] = None, store=None):
+        self.app = app
+        self.policies = parse_policies(RATE_LIMITS) if policies is None else policies
+        self.store = store or make_store()
+
+    def _policy(self, method: str, path: str) -> Optional[Policy]:
+        for policy in self.policies:
+            if policy.matches(method, path):
+                return policy
+        return None
+
+    async def __call__(self, scope, receive, send):
+        policy = self._policy(scope.get("method", ""), scope.get("path", "")) if scope["type"] == "http" else None
+        if policy is None or not RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        now = time.time()
+        try:
+            allowed, tat = self.store.update(policy, client[0] if client else "unknown", now)
+        except sqlite3.Error as e:
+            logger.warning("Rate limit store unavailable (%s); allowing request", e)
+            await self.app(scope, receive, send)
+            return
+
+        remaining = max(0, int((policy.tolerance - (tat - now)) // policy.interval))
+        headers = [
+            (b"ratelimit-limit", str(policy.burst).encode()),
+            (b"ratelimit-remaining", str(remaining if allowed else 0).encode()),
+            (b"ratelimit-reset", str(math.ceil(tat - now)).encode()),
+            (b"ratelimit-policy", f"{policy.limit};w={policy.window:g};burst={policy.burst}".encode()),
+        ]
+        if not allowed:
+            retry_after = math.ceil(tat + policy.interval - policy.tolerance - now)
+            logger.warning("Rate limit exceeded for %s on %s", client[0] if client else "unknown", policy.name)
+            body = json.dumps({
+                "error": "rate_limit_exceeded",
+                "detail": f"Too many requests. Please retry in {retry_after}s.",
+            }).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": headers + [
+                    (b"retry-after", str(retry_after).encode()),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
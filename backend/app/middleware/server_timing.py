@@ -0,0 +1,144 @@
+"""
+Server-Timing and Request Profiling
+-----------------------------------
+``ServerTimingMiddleware`` adds a ``Server-Timing`` header to every HTTP
+response with the stages recorded through :mod:`app.request_timing`
+(tesseract passes, PDF rendering, LLM calls by caller, database, bcrypt)
+plus ``total``, the time until the response headers were sent. For
+streamed responses only the stages finished before the first chunk appear.
+
+Profiling one request: when ``PROFILE_TOKEN`` is set, a request carrying
+``X-Profile: <token>`` (or ``?profile=<token>``) is sampled every
+``PROFILE_INTERVAL_MS`` by a background thread walking every thread's
+Python stack. The result is written to ``PROFILE_DIR`` in the folded-stack
+format (``thread;outer;...;inner count`` per line), which flamegraph.pl,
+speedscope and inferno read directly, and the file name is returned in
+the ``X-Profile-File`` header. Samples cover the whole process, so requests
+running at the same time show up too; idle threads are left out. Only one
+request is profiled at a time.
+"""
+
+from __future__ import annotations
+
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs
+
+from app import request_timing
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR") or Path(__file__).resolve().parent.parent / "data" / "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+# (file name suffix, function) of frames where a thread sits waiting for work.
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("concurrent/futures/thread.py", "_worker"),
+    ("queue.py", "get"),
+}
+
+
+class SamplingProfiler:
+    """Samples all Python thread stacks until :meth:`stop`; aggregates folded stacks."""
+
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval_s):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if any(code.co_filename.endswith(f) and code.co_name == fn for f, fn in _IDLE_LEAVES):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+_profile_lock = threading.Lock()
+
+
+def _requested_token(scope) -> Optional[str]:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile":
+            return value.decode("latin-1")
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get("profile", [None])[0]
+
+
+def _wants_profile(scope) -> bool:
+    token = _requested_token(scope)
+    return bool(PROFILE_TOKEN and token and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode()))
+
+
+class ServerTimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profiler = None
+        profile_name = None
+        if _wants_profile(scope) and _profile_lock.acquire(blocking=False):
+            profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000)
+            slug = re.sub(r"[^A-Za-z0-9]+", "-", scope["path"]).strip("-") or "root"
+            profile_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['method']}-{slug}-{os.getpid()}.folded"
+            profiler.start()
+
+        stages, token = request_timing.start()
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                extra = [(b"server-timing", request_timing.header_value(stages, time.perf_counter() - started).encode())]
+                if profile_name:
+                    extra.append((b"x-profile-file", profile_name.encode()))
+                message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timing.finish(token)
+            if profiler is not None:
+                profiler.stop()
+                _profile_lock.release()
+                profiler.write(PROFILE_DIR / profile_name)
+                print(f"[PROFILE] {sum(profiler.samples.values())} samples -> {PROFILE_DIR / profile_name}")
@@ -0,0 +1,179 @@
+"""
+Chat Sessions
+-------------
+Server-side conversation state for ``POST /chat``, kept in
+``db.chat_sessions`` so every worker sees the same history. A client sends
+its ``session_id`` and the new message only; the prompt is rebuilt here from
+
+* ``summary``: a short running summary of everything already folded away,
+* ``turns``: the recent messages verbatim (at most ``CHAT_SUMMARIZE_AFTER``
+  of them go into a prompt),
+
+so the prompt stays roughly the same size however long the chat runs.
+
+Once a session holds more than ``CHAT_SUMMARIZE_AFTER`` turns,
+:func:`summarize` (run in the background after the reply is sent) asks the
+LLM to merge the oldest turns into the summary and keeps the last
+``CHAT_RECENT_TURNS``. Appends and folds are compare-and-set on
+``turn_count`` / ``folded``, so concurrent requests and workers neither lose
+turns nor fold the same turns twice.
+
+Sessions idle for ``CHAT_SESSION_TTL_S`` are treated as unknown: the next
+message starts a new session.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import secrets
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.db import db, DUPLICATE_KEY_ERRORS
+from app.models import faq_index
+from app.services.llm_provider import LLMError, chat_completion
+
+logger = logging.getLogger("samaan.chat_sessions")
+
+CHAT_RECENT_TURNS = int(os.getenv("CHAT_RECENT_TURNS", "6"))
+CHAT_SUMMARIZE_AFTER = max(int(os.getenv("CHAT_SUMMARIZE_AFTER", "12")), CHAT_RECENT_TURNS + 1)
+CHAT_SESSION_TTL_S = int(os.getenv("CHAT_SESSION_TTL_S", str(7 * 24 * 3600)))
+CHAT_SUMMARY_WORDS = int(os.getenv("CHAT_SUMMARY_WORDS", "120"))
+
+_CAS_ATTEMPTS = 8
+
+_SUMMARY_PROMPT = f"""You maintain the memory of a conversation between a pensioner and the SAMAAN pension assistant.
+Merge the previous summary and the new messages into one updated summary of at most {CHAT_SUMMARY_WORDS} words.
+Keep facts the assistant will need later: the user's scheme, names, dates, amounts, reference numbers,
+problems raised, advice already given and open questions. Write plain sentences, no preamble."""
+
+# Sessions being summarized by this process; other workers are kept out by the
+# compare-and-set on ``folded``.
+_summarizing: set = set()
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(16)
+
+
+async def load(session_id: Optional[str]) -> Optional[dict]:
+    """The stored session, or None when it is unknown or has expired."""
+    if not session_id:
+        return None
+    doc = await db.chat_sessions.find_one({"session_id": session_id}, {"_id": 0})
+    if doc is None or doc.get("updated_at", 0) < time.time() - CHAT_SESSION_TTL_S:
+        return None
+    return doc
+
+
+def covers(session: Optional[dict], message: str) -> bool:
+    """Whether every word of a follow-up ``message`` already occurs in the summary or recent turns.
+
+    Such follow-ups ("yes", "and for my wife?") are answered from the
+    conversation, so there is nothing to look up for them.
+    """
+    if not session:
+        return False
+    seen = " ".join([session.get("summary", ""), *(t["content"] for t in session.get("turns", [])[-CHAT_SUMMARIZE_AFTER:])])
+    return set(faq_index.tokenize(message)) <= set(faq_index.tokenize(seen))
+
+
+def build_messages(system_prompt: str, session: Optional[dict], message: str,
+                   context: Optional[str] = None) -> List[Dict[str, str]]:
+    """System prompt, running summary, optional context, recent turns and the new user message."""
+    messages = [{"role": "system", "content": system_prompt}]
+    if session and session.get("summary"):
+        messages.append({"role": "system", "content": f"Summary of the conversation so far: {session['summary']}"})
+    if context:
+        messages.append({"role": "system", "content": context})
+    if session:
+        messages.extend(session.get("turns", [])[-CHAT_SUMMARIZE_AFTER:])
+    messages.append({"role": "user", "content": message})
+    return messages
+
+
+async def append(session_id: str, session: Optional[dict], turns: List[Dict[str, str]]) -> bool:
+    """Store ``turns`` at the end of the session, creating it if needed.
+
+    Returns True when the session now has enough turns to be summarized.
+    """
+    now = time.time()
+    if session is None:
+        doc = {"session_id": session_id, "summary": "", "turns": turns, "turn_count": len(turns),
+               "folded": 0, "created_at": now, "updated_at": now}
+        try:
+            await db.chat_sessions.insert_one(doc)
+            return False
+        except DUPLICATE_KEY_ERRORS:
+            session = await db.chat_sessions.find_one({"session_id": session_id}, {"_id": 0})
+
+    for _ in range(_CAS_ATTEMPTS):
+        count = session.get("turn_count", 0)
+        res = await db.chat_sessions.update_one(
+            {"session_id": session_id, "turn_count": count},
+            {"$push": {"turns": {"$each": turns}}, "$set": {"turn_count": count + len(turns), "updated_at": now}},
+        )
+        if res.matched_count:
+            return len(session.get("turns", [])) + len(turns) > CHAT_SUMMARIZE_AFTER
+        session = await db.chat_sessions.find_one({"session_id": session_id}, {"_id": 0})
+    logger.warning("Gave up appending to chat session %s after %d conflicts", session_id, _CAS_ATTEMPTS)
+    return False
+
+
+def _fold_input(summary: str, turns: List[Dict[str, str]]) -> str:
+    lines = [f"Previous summary: {summary or '(none)'}", "", "New messages:"]
+    lines += [f"{t['role']}: {t['content']}" for t in turns]
+    return "\n".join(lines)
+
+
+async def _fold(session_id: str) -> Tuple[str, int]:
+    """Fold the session's older turns into its summary; returns (outcome, folded turns)."""
+    doc = await db.chat_sessions.find_one({"session_id": session_id}, {"_id": 0})
+    if doc is None:
+        return "missing", 0
+    turns = doc.get("turns", [])
+    cut = len(turns) - CHAT_RECENT_TURNS
+    if cut <= 0:
+        return "short", 0
+    folded = doc.get("folded", 0)
+
+    resp = await chat_completion(
+        messages=[
+            {"role": "system", "content": _SUMMARY_PROMPT},
+            {"role": "user", "content": _fold_input(doc.get("summary", ""), turns[:cut])},
+        ],
+        temperature=0.2,
+        max_tokens=CHAT_SUMMARY_WORDS * 2,
+        caller="chat-summary",
+    )
+
+    # New turns may have been appended meanwhile; they are kept, only the
+    # folded prefix is dropped.
+    for _ in range(_CAS_ATTEMPTS):
+        count = doc.get("turn_count", 0)
+        res = await db.chat_sessions.update_one(
+            {"session_id": session_id, "turn_count": count, "folded": folded},
+            {"$set": {"summary": resp.content, "turns": doc["turns"][cut:], "folded": folded + cut}},
+        )
+        if res.matched_count:
+            return "ok", cut
+        doc = await db.chat_sessions.find_one({"session_id": session_id}, {"_id": 0})
+        if doc is None or doc.get("folded", 0) != folded:
+            return "raced", 0
+    return "conflict", 0
+
+
+async def summarize(session_id: str) -> None:
+    """Background task: fold older turns into the running summary."""
+    if session_id in _summarizing:
+        return
+    _summarizing.add(session_id)
+    try:
+        outcome, n = await _fold(session_id)
+        logger.info("Chat session %s summary: %s (%d turns folded)", session_id, outcome, n)
+    except LLMError as e:
+        # The turns stay as they are; the next message schedules another try.
+        logger.warning("Chat session %s not summarized: %s", session_id, e)
+    finally:
+        _summarizing.discard(session_id)
@@ -0,0 +1,112 @@
+"""
+Payment-date parsing
+--------------------
+Parses the date strings found in pension payment histories. Accepts the same
+inputs, and returns the same values, as trying each of :data:`DATE_FORMATS`
+with ``strptime`` and then ``datetime.fromisoformat``.
+
+Fixed-width numeric dates (``2024-01-31``, ``31-01-2024``, ``31/01/2024``,
+``2024/01/31``) are decoded by slicing, without raising an exception per
+miss. Everything else goes through ``strptime``, trying the format that last
+worked for the same column first, so a history in one format costs at most
+one attempt per value.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%Y/%m/%d", "%d %B %Y")
+
+# Separator a format needs to be present before strptime is worth trying
+# ("%d %B %Y" is left out: a space in a strptime format matches any run of
+# whitespace).
+_FORMAT_SEP = {"%Y-%m-%d": "-", "%d-%m-%Y": "-", "%d/%m/%Y": "/", "%Y/%m/%d": "/"}
+
+
+def _fixed_width(s: str) -> Optional[datetime] | bool:
+    """Decode a 10-char ASCII numeric date, or return False if not that shape.
+
+    The fields are rearranged into ``YYYY-MM-DD`` for the C-level
+    ``fromisoformat``. For these shapes no other format can succeed where
+    the matching one fails, so an all-digit invalid date is simply None.
+    """
+    if s[4] == "-" and s[7] == "-":
+        iso = s
+    elif s[2] in "-/" and s[5] == s[2]:
+        iso = f"{s[6:]}-{s[3:5]}-{s[:2]}"
+    elif s[4] == "/" and s[7] == "/":
+        iso = f"{s[:4]}-{s[5:7]}-{s[8:]}"
+    else:
+        return False
+    try:
+        return datetime.fromisoformat(iso)
+    except ValueError:
+        return None if (iso[:4] + iso[5:7] + iso[8:]).isdigit() else False
+
+
+class DateParser:
+    """Parses one column of dates, remembering the format that last matched.
+
+    No string matches two of :data:`DATE_FORMATS` (field widths and
+    separators differ), so trying the remembered format first never changes
+    the result, only how many attempts a miss costs.
+    """
+
+    __slots__ = ("hint",)
+
+    def __init__(self) -> None:
+        self.hint: Optional[str] = None
+
+    def parse(self, s: str) -> Optional[datetime]:
+        s = s.strip()
+        if len(s) == 10 and s.isascii():
+            fixed = _fixed_width(s)
+            if fixed is not False:
+                return fixed
+        hint = self.hint
+        if hint is not None:
+            try:
+                return datetime.strptime(s, hint)
+            except Exception:
+                pass
+        for fmt in DATE_FORMATS:
+            if fmt is hint or _FORMAT_SEP.get(fmt, "") not in s:
+                continue
+            try:
+                value = datetime.strptime(s, fmt)
+            except Exception:
+                continue
+            self.hint = fmt
+            return value
+        try:
+            # ISO fallback
+            return datetime.fromisoformat(s)
+        except Exception:
+            return None
+
+
+def parse_date(s: str) -> Optional[datetime]:
+    """Parse a single date string; None if no supported format matches."""
+    return DateParser().parse(s)
+
+
+@dataclass
+class ParsedDates:
+    """Result of :func:`parse_dates`, aligned with the input column."""
+
+    dates: List[Optional[datetime]]
+    invalid: List[int] = field(default_factory=list)  # indices that failed
+
+    def valid(self) -> List[datetime]:
+        return [d for d in self.dates if d is not None]
+
+
+def parse_dates(values: Sequence[str]) -> ParsedDates:
+    """Parse a whole column of date strings with one shared :class:`DateParser`."""
+    parse = DateParser().parse
+    dates = list(map(parse, values))
+    invalid = [i for i, d in enumerate(dates) if d is None] if None in dates else []
+    return ParsedDates(dates, invalid)
@@ -1,26 +1,17 @@
-from datetime import datetime, timedelta
-from statistics import mean
-from typing import List
+from array import array
+from datetime import datetime, time, timedelta, timezone
+from itertools import repeat
+from operator import attrgetter, floordiv, ne, sub
+from typing import List, Optional, Sequence
 
+import numpy as np
 
-def _parse_date(s: str) -> datetime | None:
-    s = s.strip()
-    for fmt in ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%Y/%m/%d", "%d %B %Y"):
-        try:
-            return datetime.strptime(s, fmt)
-        except Exception:
-            continue
-    try:
-        # ISO fallback
-        return datetime.fromisoformat(s)
-    except Exception:
-        return None
+from app.models.date_parser import parse_dates
 
 
 def predict_delay(payment_history: List[str]) -> dict:
     # Convert to datetimes and sort
-    dates = [_parse_date(d) for d in payment_history]
-    dates = [d for d in dates if d is not None]
+    dates = parse_dates(payment_history).valid()
     if not dates:
         # no history, return neutral prediction
         return {"risk_score": 0.1, "status": "Insufficient data", "expected_next_date": None}
@@ -31,9 +22,20 @@ def predict_delay(payment_history: List[str]) -> dict:
     for a, b in zip(dates[:-1], dates[1:]):
         gaps.append((b - a).days)
 
-    if gaps:
-        mean_gap = max(1, mean(gaps))
-        latest_gap = gaps[-1]
+    return score_gaps(len(gaps), sum(gaps), gaps[-1] if gaps else None, dates[-1])
+
+
+def score_gaps(gap_count: int, gap_sum: int, last_gap: Optional[int], last_date: datetime) -> dict:
+    """Score a history from its running aggregates.
+
+    ``gap_count``/``gap_sum`` cover the whole-day gaps between consecutive
+    sorted dates, ``last_gap`` is the most recent one and ``last_date`` the
+    latest payment. This is all :func:`predict_delay` needs, so callers that
+    keep these aggregates up to date never have to revisit the history.
+    """
+    if gap_count:
+        mean_gap = max(1, gap_sum / gap_count)
+        latest_gap = last_gap
     else:
         mean_gap = 30
         latest_gap = mean_gap
@@ -54,7 +56,6 @@ def predict_delay(payment_history: List[str]) -> dict:
     else:
         status = "Low Risk"
 
-    last_date = dates[-1]
     expected_next = last_date + timedelta(days=round(mean_gap))
 
     return {
@@ -62,3 +63,159 @@ def predict_delay(payment_history: List[str]) -> dict:
         "status": status,
         "expected_next_date": expected_next.date().isoformat(),
     }
+
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_US = timedelta(microseconds=1)
+_DAY_US = 86_400_000_000
+_MAX_LOCAL_US = (datetime.max - _EPOCH) // _US
+
+
+def predict_delay_batch(histories: Sequence[Sequence[str]]) -> List[dict]:
+    """Vectorised :func:`predict_delay` over many payment histories.
+
+    Histories are flattened into one ragged array (values + row ids), sorted
+    per row with a stable lexsort and reduced with bincount, so the scoring
+    cost is a handful of NumPy passes regardless of how many pensioners are
+    scored. Each result is identical to ``predict_delay(history)``; a history
+    the scalar function cannot order (naive and timezone-aware dates mixed)
+    yields ``{"error": ...}`` instead of failing the whole batch. Rows with
+    unparseable dates also carry ``invalid_dates``, the positions of those
+    entries in the submitted history.
+    """
+    return _score_flat(_flatten_histories(histories))
+
+
+class _FlatHistories:
+    """Parsed histories as parallel flat arrays (CSR-style ragged layout)."""
+
+    def __init__(self, keys, local_keys, counts, mixed, invalid):
+        self.keys = keys              # instant, µs since epoch (UTC if aware)
+        self.local_keys = local_keys  # wall-clock µs, what .date() uses
+        self.counts = counts          # dates per row; rows are contiguous
+        self.mixed = mixed            # rows mixing naive and aware dates
+        self.invalid = invalid        # per row, indices of unparseable dates
+        self.n_rows = len(counts)
+
+
+_TZINFO = attrgetter("tzinfo")
+
+
+_MIDNIGHT = time()
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+
+
+def _to_us(values: list) -> np.ndarray:
+    # map() over C-level methods keeps the per-date conversion out of Python.
+    # Payment dates are almost always date-only, where the day ordinal is
+    # enough; anything with a time of day takes the exact timedelta route.
+    if not any(map(ne, map(datetime.time, values), repeat(_MIDNIGHT))):
+        days = np.frombuffer(array("q", map(datetime.toordinal, values)), dtype=np.int64)
+        return (days - _EPOCH_ORDINAL) * _DAY_US
+    us = array("q", map(floordiv, map(sub, values, repeat(_EPOCH)), repeat(_US)))
+    return np.frombuffer(us, dtype=np.int64)
+
+
+def _flatten_histories(histories: Sequence[Sequence[str]]) -> _FlatHistories:
+    instants: list[datetime] = []  # naive; aware dates converted to UTC
+    walls: list[datetime] = []     # naive wall-clock values
+    counts: list[int] = []
+    mixed: list[bool] = []
+    invalid: list[list[int]] = []
+    any_aware = False
+    for history in histories:
+        column = parse_dates(history)
+        parsed = column.valid() if column.invalid else column.dates
+        invalid.append(column.invalid)
+        counts.append(len(parsed))
+        has_aware = any(map(_TZINFO, parsed))
+        mixed.append(has_aware and not all(map(_TZINFO, parsed)))
+        if not has_aware:
+            instants.extend(parsed)
+            walls.extend(parsed)
+        else:
+            any_aware = True
+            for d in parsed:
+                wall = d.replace(tzinfo=None)
+                walls.append(wall)
+                instants.append(d.astimezone(timezone.utc).replace(tzinfo=None) if d.tzinfo else wall)
+    keys = _to_us(instants)
+    local_keys = _to_us(walls) if any_aware else keys
+    return _FlatHistories(
+        keys, local_keys, np.asarray(counts, dtype=np.int64), np.asarray(mixed, dtype=bool), invalid
+    )
+
+
+def _score_flat(flat: _FlatHistories) -> List[dict]:
+    n_rows = flat.n_rows
+    key_arr, local_arr, counts = flat.keys, flat.local_keys, flat.counts
+    row_arr = np.repeat(np.arange(n_rows), counts)
+
+    # Sort each row by instant. Rows are already contiguous, so only rows that
+    # arrive out of order are lexsorted (stable, matching list.sort() on ties).
+    descending = (key_arr[1:] < key_arr[:-1]) & (row_arr[1:] == row_arr[:-1])
+    if descending.any():
+        unsorted = np.flatnonzero(np.isin(row_arr, row_arr[1:][descending]))
+        order = np.arange(len(key_arr))
+        order[unsorted] = unsorted[np.lexsort((key_arr[unsorted], row_arr[unsorted]))]
+        sk, sr, sl = key_arr[order], row_arr[order], local_arr[order]
+    else:
+        sk, sr, sl = key_arr, row_arr, local_arr
+
+    ends = np.cumsum(counts) - 1  # index of each row's latest date in sk
+
+    # Whole-day gaps between consecutive dates of the same row.
+    same_row = sr[1:] == sr[:-1]
+    gaps = (sk[1:] - sk[:-1]) // _DAY_US
+    gap_rows = sr[1:][same_row]
+    gap_sum = np.bincount(gap_rows, weights=gaps[same_row], minlength=n_rows)
+    gap_count = np.maximum(counts - 1, 0)
+
+    has_gaps = gap_count > 0
+    mean_gap = np.full(n_rows, 30.0)
+    np.divide(gap_sum, gap_count, out=mean_gap, where=has_gaps)
+    mean_gap = np.where(has_gaps, np.maximum(1.0, mean_gap), 30.0)
+    latest_gap = np.full(n_rows, 30.0)
+    if len(gaps):
+        latest_idx = np.clip(ends - 1, 0, len(gaps) - 1)
+        latest_gap = np.where(has_gaps, gaps[latest_idx], 30.0)
+
+    diff = latest_gap - mean_gap
+    risk = np.minimum(1.0, 0.2 + (diff / (mean_gap + 1)) * 0.8)
+    risk = np.where(diff <= 0, 0.05, risk)
+
+    status = np.where(
+        latest_gap > mean_gap * 1.5,
+        "High Risk of Delay",
+        np.where(latest_gap > mean_gap * 1.1, "Medium Risk of Delay", "Low Risk"),
+    )
+
+    # expected_next_date = latest date + round(mean_gap) days (round-half-even,
+    # like round()), taken on the latest date's own wall clock.
+    has_dates = counts > 0
+    last_local = np.where(has_dates, sl[np.clip(ends, 0, None)] if len(sl) else 0, 0)
+    next_local = last_local + np.rint(mean_gap).astype(np.int64) * _DAY_US
+    next_dates = np.datetime_as_string(next_local.astype("datetime64[us]").astype("datetime64[D]"))
+
+    mixed = flat.mixed.tolist()
+    overflow = (has_dates & (next_local > _MAX_LOCAL_US)).tolist()
+    risk_l, status_l, next_l = risk.tolist(), status.tolist(), next_dates.tolist()
+
+    results: List[dict] = []
+    for r, dated in enumerate(has_dates.tolist()):
+        if mixed[r]:
+            results.append({"error": "cannot compare naive and timezone-aware dates"})
+        elif overflow[r]:
+            results.append({"error": "expected next date is out of range"})
+        elif not dated:
+            results.append({"risk_score": 0.1, "status": "Insufficient data", "expected_next_date": None})
+        else:
+            results.append({
+                "risk_score": round(risk_l[r], 3),
+                "status": status_l[r],
+                "expected_next_date": next_l[r],
+            })
+        if flat.invalid[r]:
+            results[-1]["invalid_dates"] = flat.invalid[r]
+    return results
@@ -0,0 +1,237 @@
+"""
+Pension FAQ Index
+-----------------
+In-memory BM25 retrieval over the curated knowledge base in
+``app/knowledge/pension_faq.json`` (scheme rules and common questions, each
+with an answer), used by ``POST /chat`` before it calls the LLM.
+
+Two inverted indexes are built on first use:
+
+* questions: every phrasing of every entry (``question`` and ``variants``)
+  as its own short document, for deciding whether a message *is* a known
+  question;
+* passages: question plus answer per entry, for picking grounding context.
+
+:func:`lookup` returns a :class:`Match`. ``direct`` means the best phrasing
+covers the message closely enough (``FAQ_DIRECT_MIN``) to answer from the
+knowledge base without the LLM; ``context`` means the top ``FAQ_CONTEXT_K``
+passages scored at least ``FAQ_CONTEXT_MIN`` and go into the prompt;
+``none`` leaves the prompt unchanged.
+
+BM25 only ranks, so thresholds apply to IDF-weighted coverage instead. A
+direct answer needs the product of how much of the message the matched
+phrasing accounts for and how much of the phrasing the message contains;
+a context passage only needs to cover enough of the message, but must
+share at least ``FAQ_CONTEXT_MIN_TERMS`` of its words, worth
+``FAQ_CONTEXT_MIN_WEIGHT`` IDF together, so that "yes" or "1" does not
+count as fully covered by any passage that contains it.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter as _TermCounts
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.metrics import Counter
+
+FAQ_ENABLED = os.getenv("FAQ_ENABLED", "1") != "0"
+FAQ_KB_PATH = Path(os.getenv("FAQ_KB_PATH") or Path(__file__).resolve().parent.parent / "knowledge" / "pension_faq.json")
+FAQ_DIRECT_MIN = float(os.getenv("FAQ_DIRECT_MIN", "0.6"))
+FAQ_CONTEXT_MIN = float(os.getenv("FAQ_CONTEXT_MIN", "0.4"))
+FAQ_CONTEXT_K = int(os.getenv("FAQ_CONTEXT_K", "3"))
+# A context passage must also share this many message words, of this much
+# IDF weight in total: one- and two-word messages ("yes", "ok 1") cover
+# themselves completely in passages that merely contain them.
+FAQ_CONTEXT_MIN_TERMS = int(os.getenv("FAQ_CONTEXT_MIN_TERMS", "2"))
+FAQ_CONTEXT_MIN_WEIGHT = float(os.getenv("FAQ_CONTEXT_MIN_WEIGHT", "3.0"))
+
+FAQ_LOOKUPS = Counter(
+    "samaan_chat_faq_lookups_total",
+    "Chat messages checked against the FAQ index, by outcome (direct, context, none).",
+    ("outcome",),
+)
+
+_K1 = 1.2
+_B = 0.75
+
+# \w alone splits Devanagari words at vowel signs and viramas.
+_TOKEN = re.compile(r"[\w\u0900-\u097F]+")
+_STOPWORDS = frozenset(
+    "a an the i me my we our you your it its is am are was were be been to of in on at by for from with and or "
+    "do does did can could should would will shall this that these those there have has had about please "
+    "tell know want get kya hai ka ki ke ko se aur mera meri mere "
+    "का की के है में को से और मेरा मेरी मेरे हैं"
+    .split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords; a trailing plural ``s`` is dropped."""
+    tokens = []
+    for tok in _TOKEN.findall(text.lower()):
+        if tok in _STOPWORDS:
+            continue
+        if len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss"):
+            tok = tok[:-1]
+        tokens.append(tok)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over short documents, with an inverted index of term -> postings."""
+
+    def __init__(self, docs: Sequence[List[str]]):
+        self.n = len(docs)
+        self.lengths = [len(d) for d in docs]
+        self.avgdl = (sum(self.lengths) / self.n) if self.n else 0.0
+        self.terms = [set(d) for d in docs]
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for i, doc in enumerate(docs):
+            for term, tf in _TermCounts(doc).items():
+                self.postings[term].append((i, tf))
+        self.idf = {t: math.log(1 + (self.n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+        # Words the index has never seen weigh like the rarest known word.
+        self.unknown_idf = math.log(1 + (self.n + 0.5) / 0.5) if self.n else 0.0
+
+    def weight(self, term: str) -> float:
+        return self.idf.get(term, self.unknown_idf)
+
+    def search(self, terms: List[str], k: int) -> List[Tuple[int, float]]:
+        """Top ``k`` (doc index, score) pairs containing at least one of ``terms``."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(terms):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self.postings[term]:
+                norm = _K1 * (1 - _B + _B * self.lengths[i] / self.avgdl)
+                scores[i] += idf * tf * (_K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda kv: -kv[1])[:k]
+
+    def shared(self, terms: List[str], i: int) -> Tuple[int, float]:
+        """Number of distinct ``terms`` found in document ``i`` and their summed IDF."""
+        common = set(terms) & self.terms[i]
+        return len(common), sum(self.weight(t) for t in common)
+
+    def coverage(self, terms: List[str], i: int) -> Tuple[float, float]:
+        """IDF-weighted share of ``terms`` found in document ``i``, and of the document found in ``terms``."""
+        query = set(terms)
+        doc = self.terms[i]
+        shared = sum(self.weight(t) for t in query & doc)
+        if not shared:
+            return 0.0, 0.0
+        return shared / sum(self.weight(t) for t in query), shared / sum(self.weight(t) for t in doc)
+
+
+@dataclass
+class Match:
+    kind: str  # "direct" | "context" | "none"
+    confidence: float = 0.0
+    entries: List[dict] = field(default_factory=list)
+    # The entry with the closest question phrasing, whatever the kind, and
+    # its direct-answer confidence.
+    nearest: Optional[dict] = None
+    nearest_confidence: float = 0.0
+
+    @property
+    def answer(self) -> Optional[str]:
+        return self.entries[0]["answer"] if self.kind == "direct" else None
+
+
+class FAQIndex:
+    def __init__(self, entries: List[dict]):
+        self.entries = entries
+        self._phrasing_entry: List[int] = []
+        phrasings = []
+        for n, entry in enumerate(entries):
+            for text in [entry["question"], *entry.get("variants", [])]:
+                phrasings.append(tokenize(text))
+                self._phrasing_entry.append(n)
+        self.questions = BM25Index(phrasings)
+        self.passages = BM25Index([tokenize(f"{e['question']} {e['answer']}") for e in entries])
+
+    @classmethod
+    def load(cls, path: Path) -> "FAQIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def lookup(self, text: str) -> Match:
+        terms = tokenize(text)
+        if not terms:
+            return Match("none")
+        best, confidence = None, 0.0
+        for i, _ in self.questions.search(terms, 5):
+            query_share, phrasing_share = self.questions.coverage(terms, i)
+            c = query_share * phrasing_share
+            if c > confidence:
+                best, confidence = self._phrasing_entry[i], c
+        nearest = self.entries[best] if best is not None else None
+        if nearest is not None and confidence >= FAQ_DIRECT_MIN:
+            return Match("direct", confidence, [nearest], nearest, confidence)
+
+        # Passages are long, so only the share of the message they cover counts
+        # here, provided enough of the message is actually shared.
+        hits = []
+        for i, _ in self.passages.search(terms, FAQ_CONTEXT_K):
+            count, weight = self.passages.shared(terms, i)
+            if count < FAQ_CONTEXT_MIN_TERMS or weight < FAQ_CONTEXT_MIN_WEIGHT:
+                continue
+            c = self.passages.coverage(terms, i)[0]
+            if c >= FAQ_CONTEXT_MIN:
+                hits.append((i, c))
+        if not hits:
+            return Match("none", confidence, [], nearest, confidence)
+        return Match("context", max(c for _, c in hits), [self.entries[i] for i, _ in hits], nearest, confidence)
+
+
+_index: Optional[FAQIndex] = None
+_index_lock = threading.Lock()
+_counts = {"direct": 0, "context": 0, "none": 0}
+
+
+def get_index() -> FAQIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = FAQIndex.load(FAQ_KB_PATH)
+    return _index
+
+
+def lookup(text: str) -> Match:
+    """Match a chat message against the knowledge base and count the outcome."""
+    if not FAQ_ENABLED:
+        return Match("none")
+    match = get_index().lookup(text)
+    _counts[match.kind] += 1
+    FAQ_LOOKUPS.inc(outcome=match.kind)
+    return match
+
+
+def context_prompt(entries: List[dict]) -> str:
+    """System message carrying the retrieved passages."""
+    notes = "\n\n".join(f"Q: {e['question']}\nA: {e['answer']}" for e in entries)
+    return (
+        "Reference notes from the SAMAAN pension knowledge base. Use them when they answer the "
+        "user's question and say so if they do not; do not invent rules beyond them.\n\n" + notes
+    )
+
+
+def stats() -> dict:
+    """Lookup counts and the share answered without the LLM, for ``/health``."""
+    lookups = sum(_counts.values())
+    return {
+        "enabled": FAQ_ENABLED,
+        "entries": len(get_index().entries) if FAQ_ENABLED else 0,
+        "lookups": lookups,
+        **_counts,
+        "hit_rate": round(_counts["direct"] / lookups, 4) if lookups else None,
+    }
@@ -0,0 +1,203 @@
+"""
+Fingerprint Index
+-----------------
+In-memory index that finds the stored fingerprint most similar to a query
+without running ``SequenceMatcher`` against every user.
+
+* Identical fingerprints (the common case) are answered from a hash map.
+* Near matches come from a q-gram inverted index. ``SequenceMatcher.ratio()``
+  is ``2*M / (len(a) + len(b))`` where the ``M`` matched characters form a
+  common subsequence, so a ratio at or above the threshold bounds the indel
+  distance between the two strings, and by the q-gram lemma every such pair
+  shares at least ``tau`` q-grams. Users below that count cannot reach the
+  threshold and are never scored.
+* Only the rarest query q-grams are looked up (within a postings budget);
+  the bound is lowered by the number of q-grams skipped, so pruning stays
+  exact while the frequent ones (e.g. the ``fp_`` prefix) are never read.
+
+Candidates are scored with the same similarity function in insertion order,
+so the best match, ties included, is the one a full scan would pick.
+"""
+
+from __future__ import annotations
+
+import os
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+FP_INDEX_Q = int(os.getenv("FP_INDEX_Q", "4"))
+# Upper bound on posting entries read per lookup beyond the mandatory ones.
+FP_INDEX_POSTINGS_BUDGET = int(os.getenv("FP_INDEX_POSTINGS_BUDGET", "50000"))
+
+_NEVER = np.iinfo(np.int32).max
+
+
+def qgrams(s: str, q: int) -> List[str]:
+    """q-grams of ``s`` with repeats numbered, so sets behave like multisets."""
+    seen: Dict[str, int] = {}
+    out = []
+    for i in range(len(s) - q + 1):
+        g = s[i:i + q]
+        k = seen.get(g, 0)
+        seen[g] = k + 1
+        out.append(g if k == 0 else f"{g}\x00{k}")
+    return out
+
+
+def min_matches(la: int, lb: int, threshold: float) -> Optional[int]:
+    """Smallest matched-character count whose ratio reaches ``threshold``.
+
+    Evaluated with difflib's own float expression (``2.0 * M / T``) so the
+    boundary is identical; None if even a full match of the shorter string
+    falls short.
+    """
+    total = la + lb
+    if total == 0:
+        return None
+    m = max(0, int(threshold * total / 2) - 1)
+    while m <= min(la, lb):
+        if 2.0 * m / total >= threshold:
+            return m
+        m += 1
+    return None
+
+
+class FingerprintIndex:
+    """Username -> fingerprint map with exact and q-gram candidate lookup."""
+
+    def __init__(self, threshold: float, similarity: Callable[[str, str], float], q: int = FP_INDEX_Q):
+        self.threshold = threshold
+        self.similarity = similarity  # called as similarity(stored, query)
+        self.q = q
+        self._ids: Dict[str, int] = {}
+        self._usernames: List[str] = []
+        self._fps: List[Optional[str]] = []
+        self._lengths = array("i")
+        self._exact: Dict[str, Set[int]] = {}
+        self._by_length: Dict[int, Set[int]] = {}
+        # Postings may keep ids whose fingerprint has since changed; that only
+        # over-counts, so it can add candidates but never drop a real match.
+        self._postings: Dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return sum(map(len, self._exact.values()))
+
+    @classmethod
+    def build(cls, entries: Iterable[Tuple[str, Optional[str]]], threshold: float,
+              similarity: Callable[[str, str], float]) -> "FingerprintIndex":
+        index = cls(threshold, similarity)
+        for username, fingerprint in entries:
+            index.add(username, fingerprint)
+        return index
+
+    def get(self, username: str) -> Optional[str]:
+        i = self._ids.get(username)
+        return None if i is None else self._fps[i]
+
+    def add(self, username: str, fingerprint: Optional[str]) -> None:
+        """Insert or replace the fingerprint of ``username`` (None removes it).
+
+        A user keeps its original position, matching the store's own order.
+        """
+        i = self._ids.get(username)
+        if i is None:
+            if not fingerprint:
+                return
+            i = self._ids[username] = len(self._usernames)
+            self._usernames.append(username)
+            self._fps.append(None)
+            self._lengths.append(0)
+        old = self._fps[i]
+        if old == fingerprint:
+            return
+        if old:
+            self._exact[old].discard(i)
+            if not self._exact[old]:
+                del self._exact[old]
+            self._by_length[len(old)].discard(i)
+        self._fps[i] = fingerprint or None
+        if not fingerprint:
+            return
+        self._lengths[i] = len(fingerprint)
+        self._exact.setdefault(fingerprint, set()).add(i)
+        self._by_length.setdefault(len(fingerprint), set()).add(i)
+        postings = self._postings
+        for g in qgrams(fingerprint, self.q):
+            p = postings.get(g)
+            if p is None:
+                p = postings[g] = array("i")
+            p.append(i)
+
+    def remove(self, username: str) -> None:
+        self.add(username, None)
+
+    # ---- lookup ----
+    def _candidates(self, query: str) -> Set[int]:
+        q, la = self.q, len(query)
+        grams = qgrams(query, q)
+        n_grams = len(grams)
+
+        # tau per stored length: q-grams any match of that length must share.
+        tau_by_len: Dict[int, int] = {}
+        scan: Set[int] = set()
+        for length, ids in self._by_length.items():
+            if not ids:
+                continue
+            m = min_matches(la, length, self.threshold)
+            if m is None:
+                continue
+            tau = max(la, length) - q + 1 - q * (la + length - 2 * m)
+            if tau > 0:
+                tau_by_len[length] = tau
+            else:
+                scan |= ids  # too short/dissimilar for a q-gram guarantee
+        if not tau_by_len:
+            return scan
+
+        # Rarest q-grams first: the first n - tau_min + 1 are required to catch
+        # every match; more are added while the postings budget allows.
+        sized = sorted((len(self._postings.get(g, ())), g) for g in grams)
+        k_min = n_grams - min(tau_by_len.values()) + 1
+        chosen, total = sized[:k_min], sum(size for size, _ in sized[:k_min])
+        for size, g in sized[k_min:]:
+            if total + size > FP_INDEX_POSTINGS_BUDGET:
+                break
+            chosen.append((size, g))
+            total += size
+        arrays = [np.frombuffer(self._postings[g], dtype=np.int32) for size, g in chosen if size]
+        if not arrays:
+            return scan
+
+        ids, hits = np.unique(np.concatenate(arrays), return_counts=True)
+        need_by_len = np.full(max(self._by_length) + 1, _NEVER, dtype=np.int64)
+        skipped = n_grams - len(chosen)
+        for length, tau in tau_by_len.items():
+            need_by_len[length] = tau - skipped
+        lengths = np.frombuffer(self._lengths, dtype=np.int32)[ids]
+        keep = ids[hits >= need_by_len[lengths]]
+        return scan | set(keep.tolist())
+
+    def best_match(self, query: str) -> Tuple[Optional[str], float, int]:
+        """Return ``(username, score, scored)`` of the best match at or above
+        the threshold, else ``(None, best_candidate_score, scored)``.
+        """
+        if not query:
+            return None, 0.0, 0
+        exact = self._exact.get(query)
+        if exact:
+            return self._usernames[min(exact)], 1.0, 0
+
+        best_i, best_score, scored = None, 0.0, 0
+        for i in sorted(self._candidates(query)):
+            stored = self._fps[i]
+            if not stored:
+                continue
+            scored += 1
+            score = self.similarity(stored, query)
+            if score > best_score:
+                best_score, best_i = score, i
+        if best_i is not None and best_score >= self.threshold:
+            return self._usernames[best_i], best_score, scored
+        return None, best_score, scored
@@ -0,0 +1,237 @@
+"""
+Grievance Letter Templates
+--------------------------
+Pension grievance letters filled from per-scheme templates in
+``app/knowledge/grievance_templates.json``, in any of the languages in
+:data:`~app.models.text_simplifier.LANGUAGE_NAMES`.
+
+Each template is English text with ``{name}``, ``{scheme}``,
+``{last_payment}`` and ``{delay_days}`` placeholders. The first time a
+template is needed in another language it is translated once by the LLM
+with the placeholders left in place, checked (every placeholder must come
+back exactly as often as it went in) and stored in
+``db.grievance_templates`` under ``<template id>:<language>`` together with
+a hash of the English text, so an edited template is translated again. A
+per-process copy is kept in memory; after that, writing a letter is a
+string substitution with no LLM call, which is what lets
+``POST /generate-grievance/batch`` produce thousands of letters at once.
+
+When a translation cannot be had (LLM down, placeholders mangled) the
+letter is written from the English template and reported as ``"en"``; the
+pair is not tried again for ``GRIEVANCE_TRANSLATE_RETRY_S``. All pairs can
+be translated ahead of time with ``python -m app.cli.grievance_templates``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter as _PlaceholderCounts
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app import deadline
+from app.db import db
+from app.metrics import Counter
+from app.models.text_simplifier import LANGUAGE_NAMES
+from app.services.llm_provider import LLMError, chat_completion
+
+logger = logging.getLogger("samaan.grievance")
+
+GRIEVANCE_TEMPLATES_PATH = Path(
+    os.getenv("GRIEVANCE_TEMPLATES_PATH")
+    or Path(__file__).resolve().parent.parent / "knowledge" / "grievance_templates.json"
+)
+# How long a language whose translation failed is served in English before trying again.
+GRIEVANCE_TRANSLATE_RETRY_S = float(os.getenv("GRIEVANCE_TRANSLATE_RETRY_S", "300"))
+GRIEVANCE_TRANSLATE_TIMEOUT_S = float(os.getenv("GRIEVANCE_TRANSLATE_TIMEOUT_S", "60"))
+# Translations started at once by one bulk request or warm-up.
+GRIEVANCE_TRANSLATE_CONCURRENCY = int(os.getenv("GRIEVANCE_TRANSLATE_CONCURRENCY", "8"))
+
+TEMPLATE_LOOKUPS = Counter(
+    "samaan_grievance_templates_total",
+    "Grievance template lookups, by where the template came from (memory, stored, translated, fallback).",
+    ("outcome",),
+)
+
+PLACEHOLDER = re.compile(r"\{(name|scheme|last_payment|delay_days)\}")
+DEFAULT_TEMPLATE = "general"
+
+_templates: Optional[Dict[str, dict]] = None
+# Normalised scheme name -> template id: names of one scheme family first,
+# then generic kinds of pension ("family pension", "railway") that several
+# families pay, so "EPS family pension" goes to EPFO and not the treasury.
+_aliases: Tuple[Dict[str, str], Dict[str, str]] = ({}, {})
+# (template id, language) -> translated template text; English is the source itself.
+_translations: Dict[Tuple[str, str], str] = {}
+_failed: Dict[Tuple[str, str], float] = {}
+_pending: Dict[Tuple[str, str], asyncio.Task] = {}
+
+
+def _normalize(scheme: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", scheme.lower()).strip()
+
+
+def templates() -> Dict[str, dict]:
+    """Template entries by id, loaded on first use."""
+    global _templates
+    if _templates is None:
+        entries = json.loads(GRIEVANCE_TEMPLATES_PATH.read_text(encoding="utf-8"))
+        loaded = {}
+        for entry in entries:
+            entry["hash"] = hashlib.sha1(entry["template"].encode("utf-8")).hexdigest()[:12]
+            loaded[entry["id"]] = entry
+            for aliases, field in zip(_aliases, ("schemes", "generic")):
+                for scheme in entry.get(field, ()):
+                    aliases[_normalize(scheme)] = entry["id"]
+        _templates = loaded
+    return _templates
+
+
+def template_for(scheme: str) -> str:
+    """Id of the template used for ``scheme`` (the general one when it is not recognised)."""
+    entries = templates()
+    key = _normalize(scheme)
+    for aliases in _aliases:
+        if key in aliases:
+            return aliases[key]
+    # "EPS-95 pension", "Old Age Pension (IGNOAPS)": match a known name inside the text.
+    for aliases in _aliases:
+        for alias, template_id in sorted(aliases.items(), key=lambda kv: -len(kv[0])):
+            if re.search(rf"\b{re.escape(alias)}\b", key):
+                return template_id
+    return DEFAULT_TEMPLATE if DEFAULT_TEMPLATE in entries else next(iter(entries))
+
+
+def placeholders_intact(source: str, translated: str) -> bool:
+    return _PlaceholderCounts(PLACEHOLDER.findall(source)) == _PlaceholderCounts(PLACEHOLDER.findall(translated))
+
+
+async def _translate(source: str, language: str) -> Optional[str]:
+    lang_name = LANGUAGE_NAMES[language]
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                "You translate formal letters for Indian pensioners. "
+                f"Translate the letter into {lang_name}, keeping its formal, respectful tone and line breaks. "
+                "The letter contains placeholders in curly braces: {name}, {scheme}, {last_payment}, {delay_days}. "
+                "Copy every placeholder exactly as written, in English, braces included, and do not add new ones. "
+                "Respond ONLY with the translated letter — no preamble, no explanation."
+            ),
+        },
+        {"role": "user", "content": source},
+    ]
+    try:
+        resp = await chat_completion(
+            messages, temperature=0.1, max_tokens=2048, caller="grievance-template",
+            timeout=GRIEVANCE_TRANSLATE_TIMEOUT_S,
+        )
+    except LLMError as e:
+        logger.warning("Translating grievance template into %s failed: %s", language, e)
+        return None
+    text = resp.content.strip()
+    if not placeholders_intact(source, text):
+        logger.warning("Discarded %s grievance template translation: placeholders changed", language)
+        return None
+    return text
+
+
+async def template_text(template_id: str, language: str) -> Tuple[str, str]:
+    """The template in ``language`` and the language it is actually in."""
+    entry = templates()[template_id]
+    if language == "en":
+        return entry["template"], "en"
+    key = (template_id, language)
+    if key in _translations:
+        TEMPLATE_LOOKUPS.inc(outcome="memory")
+        return _translations[key], language
+
+    doc_id = f"{template_id}:{language}"
+    doc = await db.grievance_templates.find_one({"template_id": doc_id}, {"_id": 0})
+    if doc and doc.get("source_hash") == entry["hash"]:
+        _translations[key] = doc["template"]
+        TEMPLATE_LOOKUPS.inc(outcome="stored")
+        return doc["template"], language
+
+    if time.monotonic() - _failed.get(key, float("-inf")) < GRIEVANCE_TRANSLATE_RETRY_S:
+        TEMPLATE_LOOKUPS.inc(outcome="fallback")
+        return entry["template"], "en"
+    # Requests arriving while the pair is being translated wait for that
+    # translation, which runs on GRIEVANCE_TRANSLATE_TIMEOUT_S rather than
+    # the deadline of the request that started it.
+    task = _pending.get(key)
+    if task is None:
+        task = _pending[key] = deadline.detach(_translate_and_store(entry, language))
+        task.add_done_callback(lambda _: _pending.pop(key, None))
+    text = await asyncio.shield(task)
+    if text is None:
+        TEMPLATE_LOOKUPS.inc(outcome="fallback")
+        return entry["template"], "en"
+    TEMPLATE_LOOKUPS.inc(outcome="translated")
+    return text, language
+
+
+async def _translate_and_store(entry: dict, language: str) -> Optional[str]:
+    key = (entry["id"], language)
+    text = await _translate(entry["template"], language)
+    if text is None:
+        _failed[key] = time.monotonic()
+        return None
+    doc_id = f"{entry['id']}:{language}"
+    await db.grievance_templates.update_one(
+        {"template_id": doc_id},
+        {"$set": {"template_id": doc_id, "template": text, "source_hash": entry["hash"], "language": language,
+                  "translated_at": time.time()}},
+        upsert=True,
+    )
+    _translations[key] = text
+    _failed.pop(key, None)
+    return text
+
+
+def format_date(value: str, language: str) -> str:
+    """ISO dates as "05 March 2024" in English and "05/03/2024" otherwise; anything else as given."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return value
+    return parsed.strftime("%d %B %Y" if language == "en" else "%d/%m/%Y")
+
+
+def fill(template: str, language: str, *, name: str, scheme: str, last_payment: str, delay_days: int) -> str:
+    values = {
+        "name": name,
+        "scheme": scheme,
+        "last_payment": format_date(last_payment, language),
+        "delay_days": str(delay_days),
+    }
+    return PLACEHOLDER.sub(lambda m: values[m.group(1)], template)
+
+
+async def resolve(pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Tuple[str, str]]:
+    """Templates for distinct (template id, language) pairs, fetched or translated concurrently."""
+    pairs = list(dict.fromkeys(pairs))
+    slots = asyncio.Semaphore(GRIEVANCE_TRANSLATE_CONCURRENCY)
+
+    async def one(template_id: str, language: str) -> Tuple[str, str]:
+        async with slots:
+            return await template_text(template_id, language)
+
+    results = await asyncio.gather(*(one(tid, lang) for tid, lang in pairs))
+    return dict(zip(pairs, results))
+
+
+async def warm(languages: Optional[Sequence[str]] = None, template_ids: Optional[Sequence[str]] = None) -> List[dict]:
+    """Translate (or load) every template in every language; returns one status row per pair."""
+    languages = [lang for lang in (languages or LANGUAGE_NAMES) if lang != "en"]
+    template_ids = list(template_ids or templates())
+    pairs = [(tid, lang) for tid in template_ids for lang in languages]
+    resolved = await resolve(pairs)
+    return [{"template": tid, "language": lang, "ok": resolved[(tid, lang)][1] == lang} for tid, lang in pairs]
@@ -1,7 +1,35 @@
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image, ImageOps, ImageFilter, ImageEnhance
 import pytesseract
 import io
+import os
+from contextlib import contextmanager
+
+from app import deadline, request_timing
+from app.metrics import Histogram
+
+# Tesseract runs as a subprocess, so a small thread pool keeps the event loop
+# free while bounding how many OCR jobs compete for CPU at once.
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+_OCR_EXECUTOR = ThreadPoolExecutor(max_workers=OCR_MAX_WORKERS, thread_name_prefix="ocr")
+
+OCR_STAGE_SECONDS = Histogram(
+    "samaan_ocr_stage_duration_seconds",
+    "Time per OCR stage: preprocess, tesseract_psm3/psm6 (per page), pdf_render, pdf_text.",
+    ("stage",),
+)
+
+
+@contextmanager
+def _stage(name: str):
+    """Time an OCR stage for /metrics and the request's Server-Timing header.
+
+    Raises DeadlineExceeded instead of starting a stage after the request's deadline.
+    """
+    deadline.check(f"ocr-{name}")
+    with OCR_STAGE_SECONDS.time(stage=name), request_timing.stage(name):
+        yield
 
 
 def _preprocess_image(img: Image.Image) -> Image.Image:
@@ -20,11 +48,14 @@ def _preprocess_image(img: Image.Image) -> Image.Image:
 
 def _ocr_image(img: Image.Image) -> str:
     """Run tesseract on a preprocessed PIL image."""
-    processed = _preprocess_image(img)
+    with _stage("preprocess"):
+        processed = _preprocess_image(img)
     # Try multiple PSM modes: 3 (auto), then 6 (single block) as fallback
-    text = pytesseract.image_to_string(processed, lang="eng", config="--psm 3")
+    with _stage("tesseract_psm3"):
+        text = pytesseract.image_to_string(processed, lang="eng", config="--psm 3")
     if not text.strip():
-        text = pytesseract.image_to_string(processed, lang="eng", config="--psm 6")
+        with _stage("tesseract_psm6"):
+            text = pytesseract.image_to_string(processed, lang="eng", config="--psm 6")
     return text
 
 
@@ -34,6 +65,7 @@ def ocr_extract_from_upload(content: bytes, filename: str = "") -> str:
     Supports both image files (JPEG, PNG, WEBP, TIFF, BMP) and PDF files.
     Host must have `tesseract` and `poppler-utils` (for PDF) installed.
     """
+    deadline.check("ocr-queue")  # waited in the OCR queue past the request's deadline
     fn_lower = filename.lower()
     is_pdf = fn_lower.endswith(".pdf") or content[:4] == b"%PDF"
 
@@ -49,6 +81,11 @@ def ocr_extract_from_upload(content: bytes, filename: str = "") -> str:
     return _ocr_image(img)
 
 
+async def ocr_extract_async(content: bytes, filename: str = "") -> str:
+    """Run :func:`ocr_extract_from_upload` on the shared OCR pool."""
+    return await request_timing.run_in_executor(_OCR_EXECUTOR, ocr_extract_from_upload, content, filename)
+
+
 def _ocr_pdf(content: bytes) -> str:
     """Convert each PDF page to an image and OCR it."""
     texts: list[str] = []
@@ -56,11 +93,14 @@ def _ocr_pdf(content: bytes) -> str:
     # Primary: try pdf2image (needs poppler installed)
     try:
         from pdf2image import convert_from_bytes  # type: ignore
-        pages = convert_from_bytes(content, dpi=250)
+        with _stage("pdf_render"):
+            pages = convert_from_bytes(content, dpi=250)
         for page_img in pages:
             texts.append(_ocr_image(page_img))
         if any(t.strip() for t in texts):
             return "\n\n--- PAGE BREAK ---\n\n".join(texts)
+    except deadline.DeadlineExceeded:
+        raise
     except Exception:
         pass  # fall through to pypdf text extraction
 
@@ -68,13 +108,16 @@ def _ocr_pdf(content: bytes) -> str:
     try:
         import io as _io
         from pypdf import PdfReader  # type: ignore
-        reader = PdfReader(_io.BytesIO(content))
-        for page in reader.pages:
-            page_text = page.extract_text() or ""
-            if page_text.strip():
-                texts.append(page_text)
+        with _stage("pdf_text"):
+            reader = PdfReader(_io.BytesIO(content))
+            for page in reader.pages:
+                page_text = page.extract_text() or ""
+                if page_text.strip():
+                    texts.append(page_text)
         if texts:
             return "\n\n--- PAGE BREAK ---\n\n".join(texts)
+    except deadline.DeadlineExceeded:
+        raise
     except Exception:
         pass
 
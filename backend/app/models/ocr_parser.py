@@ -0,0 +1,224 @@
+"""
+OCR Field Parser
+----------------
+Rule-based extraction of the core ``OcrResponse`` fields (name, DOB, age,
+pension ID, account number, IFSC, address) from raw OCR text.
+
+All patterns are compiled once at import time. Label keywords are located
+with a single scan of the lower-cased text instead of a chain of substring
+checks per line, so only lines that actually carry a label are inspected.
+"""
+
+from __future__ import annotations
+
+import bisect
+import itertools
+import re
+from functools import lru_cache
+from typing import Dict, Optional
+
+# ---------------------------------------------------------------------------
+# Value patterns
+# ---------------------------------------------------------------------------
+# Each pattern is the ``\b``-anchored original rewritten to start with a plain
+# character class, which lets the regex engine skip ahead to candidate
+# characters; the lookbehind that follows restores the leading word boundary.
+#   IFSC_RE    == \b[A-Z]{4}0[A-Z0-9]{6}\b
+#   ACCOUNT_RE == \b\d{9,18}\b
+#   DOB_RE     == \b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}-\d{2}-\d{2})\b
+#   AGE_RE     == (?i)\bage[:\s]*(\d{2,3})\b
+IFSC_RE = re.compile(r"[A-Z](?<!\w[A-Z])[A-Z]{3}0[A-Z0-9]{6}\b")
+ACCOUNT_RE = re.compile(r"\d(?<!\w\d)\d{8,17}\b")
+DOB_RE = re.compile(r"\d(?<!\w\d)(?:\d?[/-]\d{1,2}[/-]\d{2,4}|\d{3}-\d{2}-\d{2})\b")
+AGE_RE = re.compile(r"[aA](?<!\w.)[gG][eE][:\s]*(\d{2,3})\b")
+TOKEN_RE = re.compile(r"\b[A-Z0-9-]{3,12}\b")
+
+# Same as AGE_RE but never crosses a line boundary (the separators recognised
+# by str.splitlines), i.e. what AGE_RE finds when run on one line at a time.
+_AGE_IN_LINE_RE = re.compile(
+    r"[aA](?<!\w.)[gG][eE](?::|[^\S\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029])*(\d{2,3})\b"
+)
+
+# ---------------------------------------------------------------------------
+# Label keywords
+# ---------------------------------------------------------------------------
+LABEL_KEYWORDS: Dict[str, tuple[str, ...]] = {
+    "name": ("name", "नाम"),
+    "dob": ("date of birth", "dob", "d.o.b", "जन्म"),
+    "pension_id": ("pension", "ppo"),
+    "account_number": ("account", "a/c", "acct"),
+    "ifsc": ("ifsc",),
+    "address": ("address",),
+}
+
+
+def _label_branches(keywords: Dict[str, tuple[str, ...]]) -> list[tuple[str, str, str]]:
+    """Return ``(field, consumed_text, regex)`` for every label keyword.
+
+    A keyword whose tail may start another field's keyword (``pensio|n|ame``)
+    only consumes up to that point and checks the rest with a lookahead, so a
+    single left-to-right scan still reports both labels.
+    """
+    branches = []
+    for field, words in keywords.items():
+        others = [w for f, ws in keywords.items() if f != field for w in ws]
+        for word in words:
+            cut = len(word)
+            for i in range(1, len(word)):
+                tail = word[i:]
+                if any(o.startswith(tail) or tail.startswith(o) for o in others):
+                    cut = i
+                    break
+            head, rest = word[:cut], word[cut:]
+            regex = re.escape(head) + (f"(?={re.escape(rest)})" if rest else "")
+            branches.append((field, head, regex))
+    return branches
+
+
+# Fields whose labelled line only yields a value when it contains a colon.
+_COLON_FIELDS = frozenset({"pension_id", "account_number", "ifsc", "address"})
+
+_LABEL_BRANCHES = _label_branches(LABEL_KEYWORDS)
+_LABEL_FIELD = {head: field for field, head, _ in _LABEL_BRANCHES}
+
+
+@lru_cache(maxsize=None)
+def _label_re(pending: frozenset) -> re.Pattern:
+    """One alternation over the keywords of the still-unresolved fields."""
+    # Plain (group-free) alternation: named groups would disable the
+    # engine's literal-prefix scan and make this several times slower.
+    return re.compile("|".join(rx for field, _, rx in _LABEL_BRANCHES if field in pending))
+
+
+def _value_after_colon(line: str) -> Optional[str]:
+    parts = line.split(":")
+    if len(parts) > 1:
+        return parts[1].strip()
+    return None
+
+
+def parse_fields(text: str) -> dict:
+    """Extract the core OCR fields from ``text``.
+
+    Labelled lines are tried first (value after ``:`` or, for name and DOB,
+    on the following line); regex fallbacks over the whole text fill in
+    whatever is still missing.
+    """
+    fields: Dict[str, Optional[str]] = {
+        "name": None,
+        "dob": None,
+        "age": None,
+        "pension_id": None,
+        "account_number": None,
+        "ifsc": None,
+        "address": None,
+    }
+
+    low = text.lower()
+    # Start offset of every line inside ``low``, plus a final end offset.
+    starts = list(itertools.accumulate(map(len, low.splitlines(True)), initial=0))
+    if len(low) == len(text):
+        # Offsets line up, so lines can be sliced out of ``text`` on demand.
+        def line_at(idx: int) -> str:
+            return text[starts[idx]:starts[idx + 1]].strip()
+    else:
+        # lower() changed some lengths (e.g. "İ"); fall back to a line list.
+        raw_lines = text.splitlines()
+
+        def line_at(idx: int) -> str:
+            return raw_lines[idx].strip()
+
+    n_lines = len(starts) - 1
+
+    def next_line(idx: int) -> Optional[str]:
+        for j in range(idx + 1, n_lines):
+            candidate = line_at(j)
+            if candidate:
+                return candidate
+        return None
+
+    def apply(idx: int, labels: set) -> None:
+        line = line_at(idx)
+
+        if "name" in labels and not fields["name"]:
+            value = _value_after_colon(line)
+            if value:
+                fields["name"] = value
+            else:
+                fields["name"] = next_line(idx) or fields["name"]
+
+        if "dob" in labels and not fields["dob"]:
+            m = DOB_RE.search(line)
+            if not m:
+                following = next_line(idx)
+                if following is not None:
+                    m = DOB_RE.search(following)
+            if m:
+                fields["dob"] = m.group(0)
+
+        for key in ("pension_id", "account_number", "ifsc"):
+            if key in labels and not fields[key]:
+                value = _value_after_colon(line)
+                if value is not None:
+                    fields[key] = value
+
+        if "address" in labels and not fields["address"]:
+            value = _value_after_colon(line)
+            if value:
+                fields["address"] = value
+
+    # Walk only the lines that carry a label of a still-missing field.
+    pending = frozenset(LABEL_KEYWORDS)
+    pattern = _label_re(pending)
+    pos = 0
+    while True:
+        m = pattern.search(low, pos)
+        if m is None:
+            break
+        idx = bisect.bisect_right(starts, m.start()) - 1
+        pos = starts[idx + 1]
+        labels = {_LABEL_FIELD[m.group()]}
+        for head in pattern.findall(low, m.end(), pos):
+            labels.add(_LABEL_FIELD[head])
+        if labels <= _COLON_FIELDS and low.find(":", starts[idx], pos) < 0:
+            continue  # e.g. "pension" in running prose: nothing to extract
+        apply(idx, labels)
+        resolved = frozenset(f for f in labels if fields[f])
+        if resolved:
+            pending -= resolved
+            if not pending:
+                break
+            pattern = _label_re(pending)
+
+    # ── Age: first in-line match, else anywhere in the text ────────────
+    m = AGE_RE.search(text)
+    if m and len(m.group(0).splitlines()) > 1:
+        # The leftmost match spans lines; prefer the first one within a line.
+        m = _AGE_IN_LINE_RE.search(text) or m
+    if m:
+        fields["age"] = m.group(1) + " years"
+
+    # ── Regex fallbacks ────────────────────────────────────────────────
+    if not fields["ifsc"]:
+        m = IFSC_RE.search(text)
+        if m:
+            fields["ifsc"] = m.group(0)
+
+    if not fields["account_number"]:
+        m = ACCOUNT_RE.search(text)
+        if m:
+            fields["account_number"] = m.group(0)
+
+    if not fields["dob"]:
+        m = DOB_RE.search(text)
+        if m:
+            fields["dob"] = m.group(0)
+
+    if not fields["pension_id"]:
+        for m in TOKEN_RE.finditer(text):
+            token = m.group(0)
+            if not DOB_RE.match(token) and not IFSC_RE.match(token):
+                fields["pension_id"] = token
+                break
+
+    return fields
@@ -0,0 +1,104 @@
+"""
+Password Hasher
+---------------
+bcrypt hashing and verification off the event loop.
+
+* Work runs on a dedicated thread pool (the bcrypt extension releases the
+  GIL, so hashes on different threads use different cores).
+* At most ``PASSWORD_HASH_QUEUE_MAX`` jobs may be running or waiting;
+  beyond that :class:`HasherBusy` is raised immediately instead of letting
+  logins pile up behind each other.
+* ``BCRYPT_ROUNDS`` sets the cost of new hashes. Hashes made with another
+  cost still verify; :func:`needs_rehash` tells the caller to replace them.
+* Bulk imports hash through :func:`hash_many` on a separate process pool
+  (``PASSWORD_HASH_PROCESSES``), so an import never queues ahead of logins.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional
+
+from passlib.hash import bcrypt
+
+from app import request_timing
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE_MAX = int(os.getenv("PASSWORD_HASH_QUEUE_MAX", "64"))
+PASSWORD_HASH_PROCESSES = int(os.getenv("PASSWORD_HASH_PROCESSES", str(os.cpu_count() or 1)))
+
+_HASHER = bcrypt.using(rounds=BCRYPT_ROUNDS)
+_EXECUTOR = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_pending = 0
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+class HasherBusy(RuntimeError):
+    """Too many hash/verify jobs queued; the caller should retry later."""
+
+
+async def _run(fn: Callable, *args):
+    global _pending
+    if _pending >= PASSWORD_HASH_QUEUE_MAX:
+        raise HasherBusy(f"{_pending} password hashing jobs pending")
+    _pending += 1
+    try:
+        with request_timing.stage("bcrypt"):
+            return await asyncio.get_running_loop().run_in_executor(_EXECUTOR, fn, *args)
+    finally:
+        _pending -= 1
+
+
+def _verify_sync(password: str, stored: str) -> bool:
+    try:
+        return bcrypt.verify(password, stored)
+    except Exception:
+        return False
+
+
+async def hash_password(password: str) -> str:
+    return await _run(_HASHER.hash, password)
+
+
+async def verify_password(password: str, stored: str) -> bool:
+    """True if ``password`` matches ``stored``; malformed hashes never match."""
+    return await _run(_verify_sync, password, stored)
+
+
+def _hash_chunk(passwords: List[str], rounds: int) -> List[str]:
+    hasher = bcrypt.using(rounds=rounds)
+    return [hasher.hash(p) for p in passwords]
+
+
+async def hash_many(passwords: List[str]) -> List[str]:
+    """Hash a batch across worker processes; results are in input order."""
+    global _process_pool
+    if not passwords:
+        return []
+    if _process_pool is None:
+        # spawn: forking a process that runs the event loop and store threads is unsafe.
+        _process_pool = ProcessPoolExecutor(PASSWORD_HASH_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    size = -(-len(passwords) // PASSWORD_HASH_PROCESSES)
+    loop = asyncio.get_running_loop()
+    try:
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(_process_pool, _hash_chunk, passwords[i:i + size], BCRYPT_ROUNDS)
+            for i in range(0, len(passwords), size)
+        ))
+    except BrokenProcessPool:
+        _process_pool = None  # a worker died; start a fresh pool next time
+        raise
+    return [h for part in parts for h in part]
+
+
+def needs_rehash(stored: str) -> bool:
+    """True if ``stored`` was not made with the current ``BCRYPT_ROUNDS``."""
+    try:
+        return bcrypt.from_string(stored).rounds != BCRYPT_ROUNDS
+    except Exception:
+        return False
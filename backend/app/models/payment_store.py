@@ -0,0 +1,140 @@
+"""
+Payment History Store
+---------------------
+Per-user payment dates kept in ``db.payments`` together with the running
+aggregates :func:`app.models.delay_model.score_gaps` needs (gap count, gap
+sum, last gap, last date). Recording a payment that arrives in date order
+is a ``$push`` plus a ``$set`` of the updated aggregates, and a risk query
+reads the aggregates alone, so neither touches the stored history.
+
+A late payment that lands before the current last date re-derives the
+aggregates from the full history. :func:`recompute` does the same from the
+stored dates and is scheduled in the background every
+``PAYMENT_RECOMPUTE_EVERY`` payments, repairing any drift left by concurrent
+writers in other worker processes (the per-user lock below is per process).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import weakref
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from app.db import db
+from app.models.date_parser import parse_dates
+from app.models.delay_model import score_gaps
+
+PAYMENT_RECOMPUTE_EVERY = int(os.getenv("PAYMENT_RECOMPUTE_EVERY", "100"))
+
+_AGGREGATES_ONLY = {"dates": 0, "_id": 0}
+
+_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _lock(username: str) -> asyncio.Lock:
+    lock = _locks.get(username)
+    if lock is None:
+        lock = _locks[username] = asyncio.Lock()
+    return lock
+
+
+def _aggregates(dates: List[datetime]) -> dict:
+    """Aggregates of an already sorted, non-empty list of dates."""
+    gaps = [(b - a).days for a, b in zip(dates[:-1], dates[1:])]
+    return {
+        "count": len(dates),
+        "gap_sum": sum(gaps),
+        "last_gap": gaps[-1] if gaps else None,
+        "last_date": dates[-1].isoformat(),
+    }
+
+
+def _score(doc: Optional[dict]) -> dict:
+    if not doc or not doc.get("count"):
+        return {"risk_score": 0.1, "status": "Insufficient data", "expected_next_date": None, "count": 0}
+    prediction = score_gaps(
+        doc["count"] - 1,
+        doc["gap_sum"],
+        doc["last_gap"],
+        datetime.fromisoformat(doc["last_date"]),
+    )
+    prediction["count"] = doc["count"]
+    return prediction
+
+
+async def get_prediction(username: str) -> Optional[dict]:
+    """Delay prediction for ``username`` from its aggregates; None if unknown."""
+    doc = await db.payments.find_one({"username": username}, _AGGREGATES_ONLY)
+    if doc is None:
+        return None
+    return _score(doc)
+
+
+async def record_payments(username: str, raw_dates: List[str]) -> Tuple[dict, bool]:
+    """Append payment dates for ``username`` and return the new prediction.
+
+    Returns ``(prediction, recompute_due)``. Unparseable entries are skipped
+    and listed by position in ``prediction["invalid_dates"]``. Raises
+    ``ValueError`` when the new dates cannot be ordered against the stored
+    ones (naive and timezone-aware dates mixed).
+    """
+    column = parse_dates(raw_dates)
+    new = column.valid()
+    try:
+        new.sort()
+    except TypeError:
+        raise ValueError("cannot compare naive and timezone-aware dates")
+
+    async with _lock(username):
+        doc = await db.payments.find_one({"username": username}, _AGGREGATES_ONLY)
+        before = doc["count"] if doc else 0
+        if not new:
+            prediction, after = _score(doc), before
+        else:
+            last = datetime.fromisoformat(doc["last_date"]) if before else None
+            try:
+                in_order = last is None or new[0] >= last
+            except TypeError:
+                raise ValueError("cannot compare naive and timezone-aware dates")
+            if in_order:
+                agg = _aggregates(new)
+                if last is not None:
+                    first_gap = (new[0] - last).days
+                    agg["count"] += before
+                    agg["gap_sum"] += doc["gap_sum"] + first_gap
+                    if agg["last_gap"] is None:
+                        agg["last_gap"] = first_gap
+                update = {"$push": {"dates": {"$each": [d.isoformat() for d in new]}}, "$set": agg}
+            else:
+                # Late payment: rebuild the sorted history and its aggregates.
+                full = await db.payments.find_one({"username": username})
+                dates = sorted(list(map(datetime.fromisoformat, full["dates"])) + new)
+                agg = _aggregates(dates)
+                update = {"$set": {"dates": [d.isoformat() for d in dates], **agg}}
+            await db.payments.update_one({"username": username}, update, upsert=True)
+            prediction, after = _score(agg), agg["count"]
+
+    if column.invalid:
+        prediction["invalid_dates"] = column.invalid
+    recompute_due = after // PAYMENT_RECOMPUTE_EVERY > before // PAYMENT_RECOMPUTE_EVERY
+    return prediction, recompute_due
+
+
+async def recompute(username: str) -> None:
+    """Re-derive the aggregates of ``username`` from the stored history."""
+    async with _lock(username):
+        doc = await db.payments.find_one({"username": username})
+        if not doc or not doc.get("dates"):
+            return
+        dates = list(map(datetime.fromisoformat, doc["dates"]))
+        if any(b < a for a, b in zip(dates[:-1], dates[1:])):
+            dates.sort()
+        agg = _aggregates(dates)
+        if any(doc.get(k) != v for k, v in agg.items()):
+            print(f"[PAYMENTS] recompute '{username}': aggregates corrected")
+            await db.payments.update_one(
+                {"username": username},
+                {"$set": {"dates": [d.isoformat() for d in dates], **agg}},
+            )
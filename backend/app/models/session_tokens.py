@@ -0,0 +1,168 @@
+"""
+Session Tokens
+--------------
+Stateless access tokens and revocable refresh tokens, issued at login.
+
+Both are compact JWTs (HS256) signed with ``AUTH_SECRET``:
+
+* Access tokens (``typ: access``) live ``ACCESS_TOKEN_TTL_S`` and are checked
+  from the signature and expiry alone, so validating one never touches the
+  database. They cannot be revoked; they simply run out.
+* Refresh tokens (``typ: refresh``) live ``REFRESH_TOKEN_TTL_S`` and carry a
+  ``jti``. Exchanging one for a new pair revokes it (rotation); presenting a
+  revoked one again revokes every session of that user, since it means the
+  token was copied.
+
+Revocations are kept per user in ``db.sessions``: the revoked ``jti`` values
+until they expire, plus ``revoked_before`` for "log out everywhere".
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from typing import Optional
+
+from app.db import db, DUPLICATE_KEY_ERRORS
+
+ACCESS_TOKEN_TTL_S = int(os.getenv("ACCESS_TOKEN_TTL_S", "900"))
+REFRESH_TOKEN_TTL_S = int(os.getenv("REFRESH_TOKEN_TTL_S", str(30 * 24 * 3600)))
+
+_secret = os.getenv("AUTH_SECRET")
+if not _secret:
+    print("[AUTH] ⚠️   AUTH_SECRET not set; using a random key, so tokens do not survive restarts or work across workers")
+    _secret = secrets.token_urlsafe(32)
+_KEY = _secret.encode()
+
+
+class InvalidToken(ValueError):
+    """Malformed, forged, expired, wrong-type or revoked token."""
+
+
+def _b64(raw: bytes) -> bytes:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=")
+
+
+def _unb64(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def _json(obj: dict) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+_HEADER = _b64(_json({"alg": "HS256", "typ": "JWT"}))
+
+
+def _sign(claims: dict) -> str:
+    signing_input = _HEADER + b"." + _b64(_json(claims))
+    sig = hmac.new(_KEY, signing_input, hashlib.sha256).digest()
+    return (signing_input + b"." + _b64(sig)).decode()
+
+
+def decode(token: str, typ: str) -> dict:
+    """Verify signature, type and expiry; return the claims or raise InvalidToken."""
+    try:
+        header, payload, sig = token.encode().split(b".")
+        sig = _unb64(sig)
+    except ValueError:  # wrong segment count, bad base64 or non-ASCII
+        raise InvalidToken("malformed") from None
+    if header != _HEADER:
+        raise InvalidToken("unsupported header")
+    expected = hmac.new(_KEY, header + b"." + payload, hashlib.sha256).digest()
+    if not hmac.compare_digest(sig, expected):
+        raise InvalidToken("bad signature")
+    claims = json.loads(_unb64(payload))
+    if not isinstance(claims, dict) or claims.get("typ") != typ or not isinstance(claims.get("sub"), str):
+        raise InvalidToken("wrong token type")
+    if not claims.get("exp", 0) > time.time():
+        raise InvalidToken("expired")
+    return claims
+
+
+def issue_pair(username: str) -> dict:
+    """New access + refresh token for ``username``."""
+    now = round(time.time(), 3)
+    access = _sign({"sub": username, "typ": "access", "iat": now, "exp": int(now) + ACCESS_TOKEN_TTL_S})
+    refresh = _sign({
+        "sub": username, "typ": "refresh", "iat": now, "exp": int(now) + REFRESH_TOKEN_TTL_S,
+        "jti": secrets.token_urlsafe(12),
+    })
+    return {
+        "access_token": access,
+        "refresh_token": refresh,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_TTL_S,
+    }
+
+
+# ---- revocation list (db.sessions) ----
+_SESSION_FIELDS = {"_id": 0, "username": 1, "revoked": 1, "revoked_before": 1}
+
+
+def _is_revoked(doc: Optional[dict], claims: dict) -> bool:
+    if not doc:
+        return False
+    if claims["iat"] <= doc.get("revoked_before", 0):
+        return True
+    return any(e.get("jti") == claims.get("jti") for e in doc.get("revoked") or ())
+
+
+async def _revoke(claims: dict) -> bool:
+    """Add the token's jti to its user's list; False if it already was revoked.
+
+    The list is replaced with compare-and-set on its previous value, dropping
+    expired entries on the way, so concurrent revocations are not lost.
+    """
+    username, entry = claims["sub"], {"jti": claims["jti"], "exp": claims["exp"]}
+    for _ in range(8):
+        doc = await db.sessions.find_one({"username": username}, _SESSION_FIELDS)
+        if _is_revoked(doc, claims):
+            return False
+        if doc is None:
+            try:
+                await db.sessions.insert_one({"username": username, "revoked": [entry], "revoked_before": 0})
+                return True
+            except DUPLICATE_KEY_ERRORS:
+                continue
+        old = doc.get("revoked") or []
+        now = time.time()
+        new = [e for e in old if e.get("exp", 0) > now] + [entry]
+        res = await db.sessions.update_one({"username": username, "revoked": old}, {"$set": {"revoked": new}})
+        if res.matched_count:
+            return True
+    raise RuntimeError(f"could not update revocation list for '{username}'")
+
+
+async def revoke_all(username: str) -> None:
+    """Revoke every refresh token issued to ``username`` so far."""
+    await db.sessions.update_one(
+        {"username": username},
+        {"$set": {"revoked_before": round(time.time(), 3)}},
+        upsert=True,
+    )
+
+
+async def refresh(token: str) -> dict:
+    """Exchange a refresh token for a new pair, revoking the old one."""
+    claims = decode(token, "refresh")
+    if not await _revoke(claims):
+        await revoke_all(claims["sub"])
+        print(f"[AUTH] ⚠️   revoked refresh token reused for '{claims['sub']}'; all sessions revoked")
+        raise InvalidToken("revoked")
+    return issue_pair(claims["sub"])
+
+
+async def logout(token: str, everywhere: bool = False) -> str:
+    """Revoke a refresh token (or all of its user's); returns the username."""
+    claims = decode(token, "refresh")
+    if everywhere:
+        await revoke_all(claims["sub"])
+    else:
+        await _revoke(claims)
+    return claims["sub"]
@@ -73,7 +73,7 @@ async def simplify_text_async(text: str, language: str = "en") -> str:
     ]
 
     try:
-        response = await chat_completion(messages, temperature=0.4, max_tokens=512)
+        response = await chat_completion(messages, temperature=0.4, max_tokens=512, caller="simplify", cache=True)
         return response.content
     except LLMError:
         # Fall back to rule-based approach
@@ -101,7 +101,7 @@ async def translate_text_async(text: str, language: str = "en") -> str:
     ]
 
     try:
-        response = await chat_completion(messages, temperature=0.2, max_tokens=1024)
+        response = await chat_completion(messages, temperature=0.2, max_tokens=1024, caller="translate", cache=True)
         return response.content
     except LLMError:
         return text  # fallback: return original if translation fails
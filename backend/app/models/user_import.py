@@ -0,0 +1,138 @@
+"""
+User Import
+-----------
+Bulk account creation from NDJSON, shared by ``POST /users/import`` and
+``python -m app.cli.import_users``.
+
+Each line is ``{"username": ..., "password": ..., "emergency_contact":
+{"name", "phone", "relation"}}``; ``password`` and ``emergency_contact`` may
+be omitted. Rows are processed in batches of ``USER_IMPORT_BATCH``:
+
+* usernames that already exist (or repeat within the input) are rejected
+  before anything is hashed, so re-running an import is cheap;
+* the remaining passwords are hashed across worker processes;
+* the batch is written with one unordered ``insert_many`` (a single
+  transaction on the local store), and rows the database rejects are
+  reported without failing the others.
+
+Progress is yielded as events: one ``error`` per rejected row (with its
+1-based line number), one ``batch`` per written batch and a final
+``summary``.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import AsyncIterable, AsyncIterator, Iterable, List, Optional, Tuple, Union
+
+from pydantic import BaseModel, ValidationError, constr
+
+from app.db import db, BULK_WRITE_ERRORS
+from app.models import password_hasher
+
+USER_IMPORT_BATCH = int(os.getenv("USER_IMPORT_BATCH", "500"))
+
+# Unique key of a rejected insert -> the error create_user would raise.
+_ERROR_BY_KEY = {"username": "user_exists", "fingerprint": "fingerprint_in_use"}
+
+
+class ImportContact(BaseModel):
+    name: str
+    phone: str
+    relation: str
+
+
+class ImportRow(BaseModel):
+    username: constr(min_length=1)
+    password: Optional[str] = None
+    emergency_contact: Optional[ImportContact] = None
+
+
+def _row_error(e: ValidationError) -> str:
+    first = e.errors()[0]
+    where = ".".join(str(x) for x in first["loc"] if x != "__root__")
+    return f"{where}: {first['msg']}" if where else first["msg"]
+
+
+async def _aiter(lines: Union[AsyncIterable[str], Iterable[str]]) -> AsyncIterator[str]:
+    if hasattr(lines, "__aiter__"):
+        async for line in lines:
+            yield line
+    else:
+        for line in lines:
+            yield line
+
+
+async def _write_batch(batch: List[Tuple[int, ImportRow]]) -> Tuple[int, List[dict]]:
+    """Insert one batch; return (inserted, error events)."""
+    errors: List[dict] = []
+    names = [row.username for _, row in batch]
+    existing = {u["username"] for u in await db.users.find({"username": {"$in": names}}, {"_id": 0, "username": 1})}
+    todo, seen = [], set()
+    for line_no, row in batch:
+        if row.username in existing or row.username in seen:
+            reason = "user_exists" if row.username in existing else "duplicate_in_input"
+            errors.append({"type": "error", "line": line_no, "username": row.username, "error": reason})
+            continue
+        seen.add(row.username)
+        todo.append((line_no, row))
+    if not todo:
+        return 0, errors
+
+    hashes = iter(await password_hasher.hash_many([row.password for _, row in todo if row.password is not None]))
+    docs = [{
+        "username": row.username,
+        "password": next(hashes) if row.password is not None else None,
+        "fingerprint": None,
+        "emergency_contact": row.emergency_contact.dict() if row.emergency_contact else None,
+    } for _, row in todo]
+    failed = 0
+    try:
+        await db.users.insert_many(docs, ordered=False)
+    except BULK_WRITE_ERRORS as e:
+        for we in e.details.get("writeErrors", []):
+            line_no, row = todo[we["index"]]
+            key = next(iter(we.get("keyPattern") or {}), None)
+            reason = _ERROR_BY_KEY.get(key) if we.get("code") == 11000 else None
+            errors.append({"type": "error", "line": line_no, "username": row.username,
+                           "error": reason or str(we.get("errmsg", "write_failed"))[:200]})
+            failed += 1
+    return len(docs) - failed, errors
+
+
+async def import_users(lines: Union[AsyncIterable[str], Iterable[str]],
+                       batch_size: int = USER_IMPORT_BATCH) -> AsyncIterator[dict]:
+    """Import NDJSON ``lines``; yield ``error``, ``batch`` and ``summary`` events."""
+    rows = inserted = failed = 0
+    batch: List[Tuple[int, ImportRow]] = []
+    line_no = 0
+
+    async def flush():
+        nonlocal inserted, failed
+        ok, errors = await _write_batch(batch)
+        inserted += ok
+        failed += len(errors)
+        batch.clear()
+        return errors
+
+    async for line in _aiter(lines):
+        line_no += 1
+        if not line.strip():
+            continue
+        rows += 1
+        try:
+            batch.append((line_no, ImportRow.parse_raw(line)))
+        except ValidationError as e:
+            failed += 1
+            yield {"type": "error", "line": line_no, "username": None, "error": _row_error(e)}
+            continue
+        if len(batch) >= batch_size:
+            for err in await flush():
+                yield err
+            yield {"type": "batch", "rows": rows, "inserted": inserted, "failed": failed}
+    if batch:
+        for err in await flush():
+            yield err
+        yield {"type": "batch", "rows": rows, "inserted": inserted, "failed": failed}
+    print(f"[IMPORT] {rows} rows: {inserted} inserted, {failed} failed")
+    yield {"type": "summary", "rows": rows, "inserted": inserted, "failed": failed}
@@ -1,8 +1,13 @@
+import asyncio
+import os
+import time
 from typing import Optional
 from difflib import SequenceMatcher
 
-from passlib.hash import bcrypt
-from app.db import db
+from app.cache import TTLCache
+from app.db import db, DUPLICATE_KEY_ERRORS, StorageReadOnly
+from app.models import password_hasher
+from app.models.fingerprint_index import FingerprintIndex
 
 
 # Device fingerprints are deterministic hashes — same browser/device always
@@ -10,6 +15,29 @@ from app.db import db
 # attempts while still allowing minor hash variations due to browser updates.
 FP_SIMILARITY_THRESHOLD = 0.95
 
+# A lookup that finds no match reloads the index from the database at most
+# this often, to pick up fingerprints registered by other worker processes.
+FP_INDEX_REFRESH_S = float(os.getenv("FP_INDEX_REFRESH_S", "30"))
+
+# Projections: only fetch what each caller reads (never the password hash
+# unless verifying it).
+_FP_FIELDS = {"_id": 0, "username": 1, "fingerprint": 1}
+_PROFILE_FIELDS = {"_id": 0, "username": 1, "emergency_contact": 1}
+
+# Read-through cache of user lookups, per username and projection. Writes
+# made through this module invalidate it; writes from other worker
+# processes show up once the entry expires.
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_S = float(os.getenv("USER_CACHE_TTL_S", "30"))
+_user_cache = TTLCache("users", USER_CACHE_SIZE, USER_CACHE_TTL_S)
+_cached_projections: set = set()
+
+
+def _invalidate(username: str) -> None:
+    # Always bumps the epoch, even before anything was cached for the user.
+    for fields in _cached_projections | {None}:
+        _user_cache.invalidate((username, fields))
+
 
 def _fp_similarity(a: str, b: str) -> float:
     """Return similarity ratio between two fingerprint strings (0.0 – 1.0)."""
@@ -20,51 +48,128 @@ def _fp_similarity(a: str, b: str) -> float:
     return SequenceMatcher(None, a, b).ratio()
 
 
-async def create_user(username: str, password: Optional[str]) -> dict:
-    existing = await db.users.find_one({"username": username})
+_fp_index: Optional[FingerprintIndex] = None
+_fp_index_loaded_at = 0.0
+_fp_index_lock = asyncio.Lock()
+
+
+async def _fingerprint_index(stale_before: Optional[float] = None) -> FingerprintIndex:
+    """Process-wide fingerprint index, built from the users collection on first use.
+
+    With ``stale_before`` (a ``time.monotonic()`` value) an index loaded
+    before then is rebuilt. Callers that queued behind a rebuild which
+    finished after they asked get that one instead of starting another.
+    """
+    global _fp_index, _fp_index_loaded_at
+    if _fp_index is not None and (stale_before is None or _fp_index_loaded_at >= stale_before):
+        return _fp_index
+    async with _fp_index_lock:
+        if _fp_index is None or (stale_before is not None and _fp_index_loaded_at < stale_before):
+            users = await db.users.find({"fingerprint": {"$ne": None}}, _FP_FIELDS)
+            # Building takes seconds for very large user bases; keep it off the loop.
+            _fp_index = await asyncio.to_thread(
+                FingerprintIndex.build,
+                [(u.get("username"), u.get("fingerprint")) for u in users],
+                FP_SIMILARITY_THRESHOLD,
+                _fp_similarity,
+            )
+            _fp_index_loaded_at = time.monotonic()
+            print(f"[FP] index built: {len(_fp_index)} fingerprints")
+        return _fp_index
+
+
+async def create_user(username: str, password: Optional[str], fingerprint: Optional[str] = None) -> dict:
+    existing = await db.users.find_one({"username": username}, {"_id": 0, "username": 1})
     if existing:
         raise ValueError("user_exists")
     hashed = None
     if password is not None:
-        hashed = bcrypt.hash(password)
+        hashed = await password_hasher.hash_password(password)
     doc = {
         "username": username,
         "password": hashed,
-        "fingerprint": None,
+        "fingerprint": fingerprint,
         "emergency_contact": None,
     }
-    await db.users.insert_one(doc)
+    try:
+        await db.users.insert_one(doc)
+    except DUPLICATE_KEY_ERRORS:
+        # Lost a race for the username, or the device is already registered.
+        if await db.users.find_one({"username": username}, {"_id": 0, "username": 1}):
+            raise ValueError("user_exists")
+        raise ValueError("fingerprint_in_use")
+    _invalidate(username)
+    if fingerprint and _fp_index is not None:
+        _fp_index.add(username, fingerprint)
     return {"username": username}
 
 
-async def get_user(username: str) -> Optional[dict]:
-    return await db.users.find_one({"username": username})
+async def get_user(username: str, projection: Optional[dict] = None, cached: bool = True) -> Optional[dict]:
+    """Fetch a user, from the cache unless ``cached=False``; misses are not cached."""
+    key = (username, tuple(sorted(projection.items())) if projection else None)
+    if cached:
+        user = _user_cache.get(key)
+        if user is not None:
+            return dict(user)
+    epoch = _user_cache.epoch
+    user = await db.users.find_one({"username": username}, projection)
+    # Password hashes are never kept in memory beyond the request.
+    if user is not None and "password" not in user:
+        _cached_projections.add(key[1])
+        _user_cache.set(key, user, epoch=epoch)
+        user = dict(user)
+    return user
 
 
 async def verify_user_password(username: str, password: str) -> bool:
-    user = await get_user(username)
+    """Check a password; raises ``password_hasher.HasherBusy`` when overloaded.
+
+    A correct password stored with an outdated bcrypt cost is re-hashed
+    with the current one.
+    """
+    user = await get_user(username, {"_id": 0, "username": 1, "password": 1}, cached=False)
     if not user:
         return False
     stored = user.get("password")
     if stored is None:
         return False
-    try:
-        return bcrypt.verify(password, stored)
-    except Exception:
-        return False
+    ok = await password_hasher.verify_password(password, stored)
+    if ok and password_hasher.needs_rehash(stored):
+        try:
+            new_hash = await password_hasher.hash_password(password)
+        except password_hasher.HasherBusy:
+            return ok  # try again on a later login
+        # Only if the password was not changed in the meantime.
+        try:
+            res = await db.users.update_one(
+                {"username": username, "password": stored},
+                {"$set": {"password": new_hash}}
+            )
+        except StorageReadOnly:
+            return ok  # MongoDB is down; re-hash on a later login
+        _invalidate(username)
+        if res.matched_count:
+            print(f"[AUTH] re-hashed password for '{username}' at cost {password_hasher.BCRYPT_ROUNDS}")
+    return ok
 
 
 async def add_fingerprint(username: str, fingerprint_data: str):
-    res = await db.users.update_one(
-        {"username": username},
-        {"$set": {"fingerprint": fingerprint_data}}
-    )
+    try:
+        res = await db.users.update_one(
+            {"username": username},
+            {"$set": {"fingerprint": fingerprint_data}}
+        )
+    except DUPLICATE_KEY_ERRORS:
+        raise ValueError("fingerprint_in_use")
+    _invalidate(username)
     if res.matched_count == 0:
         raise ValueError("no_user")
+    if _fp_index is not None:
+        _fp_index.add(username, fingerprint_data)
 
 
 async def verify_fingerprint(username: str, fingerprint_data: str) -> bool:
-    user = await get_user(username)
+    user = await get_user(username, _FP_FIELDS)
     if not user:
         return False
     stored = user.get("fingerprint")
@@ -76,21 +181,30 @@ async def verify_fingerprint(username: str, fingerprint_data: str) -> bool:
 
 
 async def get_user_by_fingerprint(fingerprint_data: str) -> Optional[dict]:
-    """Find the best-matching user whose stored fingerprint is similar enough."""
-    all_users = await db.users.find({"fingerprint": {"$ne": None}})
-    best_user = None
-    best_score = 0.0
-    for user in all_users:
-        stored = user.get("fingerprint") or ""
-        score = _fp_similarity(stored, fingerprint_data)
-        if score > best_score:
-            best_score = score
-            best_user = user
+    """Find the best-matching user whose stored fingerprint is similar enough.
+
+    Same result as scoring every stored fingerprint, but only the candidates
+    the fingerprint index cannot rule out are compared.
+    """
+    index = await _fingerprint_index()
+    for attempt in range(2):
+        username, best_score, scored = index.best_match(fingerprint_data)
+        # The retry reads storage: the cached user may be what is stale.
+        user = await get_user(username, _FP_FIELDS, cached=not attempt) if username else None
+        if user is not None and user.get("fingerprint") == index.get(username):
+            break
+        # No match, or the index is behind the database: reload once.
+        stale = username is not None
+        now = time.monotonic()
+        if attempt or not (stale or now - _fp_index_loaded_at >= FP_INDEX_REFRESH_S):
+            user = None
+            break
+        index = await _fingerprint_index(stale_before=now)
     print(
-        f"[FP] login scan: best_score={best_score:.4f} threshold={FP_SIMILARITY_THRESHOLD} "
-        f"user={best_user.get('username') if best_user else None}"
+        f"[FP] login lookup: best_score={best_score:.4f} threshold={FP_SIMILARITY_THRESHOLD} "
+        f"scored={scored}/{len(index)} user={user.get('username') if user else None}"
     )
-    return best_user if best_score >= FP_SIMILARITY_THRESHOLD else None
+    return user
 
 
 async def update_emergency_contact(username: str, contact: dict) -> bool:
@@ -99,12 +213,13 @@ async def update_emergency_contact(username: str, contact: dict) -> bool:
         {"username": username},
         {"$set": {"emergency_contact": contact}}
     )
+    _invalidate(username)
     return res.matched_count > 0
 
 
 async def get_profile(username: str) -> Optional[dict]:
     """Return public profile fields for a user (no password/fingerprint)."""
-    user = await get_user(username)
+    user = await get_user(username, _PROFILE_FIELDS)
     if not user:
         return None
     return {
@@ -0,0 +1,80 @@
+"""
+Request Timing
+--------------
+Named stage durations of the current request, sent back in the
+``Server-Timing`` header by ``ServerTimingMiddleware``.
+
+Code records a stage with ``with stage("tesseract_psm3"): ...`` or
+:func:`record`; outside a request (CLI, benchmarks) both are no-ops. The
+collector lives in a context variable, so concurrent requests never see
+each other's stages. Work handed to a thread pool must be submitted through
+:func:`run_in_executor`, which carries the context into the worker thread.
+
+A stage that runs several times in one request (one tesseract pass per PDF
+page, several database reads) is reported once with the summed duration
+and the count in ``desc``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+_stages: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_stages", default=None,
+)
+
+
+def start() -> Tuple[List[Tuple[str, float]], contextvars.Token]:
+    """Begin collecting for the current context; returns the list and a reset token."""
+    stages: List[Tuple[str, float]] = []
+    return stages, _stages.set(stages)
+
+
+def finish(token: contextvars.Token) -> None:
+    _stages.reset(token)
+
+
+def record(name: str, seconds: float) -> None:
+    stages = _stages.get()
+    if stages is not None:
+        stages.append((name, seconds))  # list.append is atomic across threads
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Record the duration of the ``with`` block as ``name``, even if it raises."""
+    if _stages.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def run_in_executor(executor, fn: Callable, *args):
+    """``loop.run_in_executor`` that keeps the caller's context (and its stages)."""
+    ctx = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(executor, functools.partial(ctx.run, fn, *args))
+
+
+def header_value(stages: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """Format stages as a Server-Timing value, durations in milliseconds."""
+    summed: Dict[str, List[float]] = {}
+    for name, seconds in list(stages):
+        entry = summed.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+    parts = [
+        f'{name};dur={seconds * 1000:.1f}' + (f';desc="{n}x"' if n > 1 else "")
+        for name, (seconds, n) in summed.items()
+    ]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
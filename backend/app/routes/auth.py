@@ -1,11 +1,53 @@
-from fastapi import APIRouter, HTTPException
+import hashlib
+import json
+import os
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel
 from typing import Optional
 
-from app.models import user_model
+from app.models import session_tokens, user_import, user_model
+from app.models.password_hasher import HasherBusy
 
 router = APIRouter()
 
+# Usernames fetched per storage query while streaming /users.
+USERS_PAGE_SIZE = int(os.getenv("USERS_PAGE_SIZE", "1000"))
+# Accounts allowed to use admin routes (bulk import); none by default.
+ADMIN_USERS = frozenset(u.strip() for u in os.getenv("ADMIN_USERS", "").split(",") if u.strip())
+USER_IMPORT_MAX_BYTES = int(os.getenv("USER_IMPORT_MAX_BYTES", str(16 * 1024 * 1024)))
+USER_IMPORT_MAX_ROWS = int(os.getenv("USER_IMPORT_MAX_ROWS", "50000"))
+
+
+def _busy() -> HTTPException:
+    return HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+async def require_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)) -> str:
+    """Dependency: username from a valid ``Authorization: Bearer <access token>``.
+
+    Signature and expiry only, no database access.
+    """
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Missing bearer token", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        claims = session_tokens.decode(credentials.credentials, "access")
+    except session_tokens.InvalidToken as e:
+        raise HTTPException(status_code=401, detail=f"Invalid token: {e}", headers={"WWW-Authenticate": "Bearer"})
+    return claims["sub"]
+
+
+async def require_admin(username: str = Depends(require_user)) -> str:
+    """Dependency: like :func:`require_user`, for accounts listed in ``ADMIN_USERS``."""
+    if username not in ADMIN_USERS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return username
+
 
 class SignupRequest(BaseModel):
     username: str
@@ -20,12 +62,15 @@ class LoginRequest(BaseModel):
 @router.post("/login")
 async def login(req: LoginRequest):
     """Log in with standard username and password."""
-    ok = await user_model.verify_user_password(req.username, req.password)
+    try:
+        ok = await user_model.verify_user_password(req.username, req.password)
+    except HasherBusy:
+        raise _busy()
     if not ok:
         raise HTTPException(status_code=401, detail="Invalid username or password")
 
     print(f"[AUTH] ✅ Password login success for '{req.username}'")
-    return {"success": True, "username": req.username}
+    return {"success": True, "username": req.username, **session_tokens.issue_pair(req.username)}
 
 
 class FingerprintRequest(BaseModel):
@@ -52,6 +97,8 @@ async def signup(req: SignupRequest):
     try:
         user = await user_model.create_user(req.username, req.password)
         return {"success": True, "user": user}
+    except HasherBusy:
+        raise _busy()
     except ValueError as e:
         if str(e) == "user_exists":
             raise HTTPException(status_code=400, detail="User already exists")
@@ -63,7 +110,9 @@ async def signup_fingerprint(req: FingerprintRequest):
     try:
         await user_model.add_fingerprint(req.username, req.fingerprint)
         return {"success": True}
-    except ValueError:
+    except ValueError as e:
+        if str(e) == "fingerprint_in_use":
+            raise HTTPException(status_code=409, detail="Fingerprint already registered to another user")
         raise HTTPException(status_code=404, detail="user_not_found")
 
 
@@ -71,10 +120,11 @@ async def signup_fingerprint(req: FingerprintRequest):
 async def register_with_fingerprint(req: RegisterFingerprintRequest):
     """Create a new user with fingerprint only (no password)."""
     try:
-        await user_model.create_user(req.username, None)
-    except ValueError:
+        await user_model.create_user(req.username, None, fingerprint=req.fingerprint)
+    except ValueError as e:
+        if str(e) == "fingerprint_in_use":
+            raise HTTPException(status_code=409, detail="Fingerprint already registered to another user")
         raise HTTPException(status_code=400, detail="User already exists")
-    await user_model.add_fingerprint(req.username, req.fingerprint)
     print(f"[AUTH] ✅ Registered new user '{req.username}' with fingerprint")
     return {"success": True, "username": req.username}
 
@@ -87,7 +137,48 @@ async def login_with_fingerprint(req: LoginFingerprintRequest):
         print("[AUTH] ❌ Fingerprint login failed — not found")
         raise HTTPException(status_code=401, detail="No account matches this fingerprint")
     print(f"[AUTH] ✅ Fingerprint login success for '{user['username']}'")
-    return {"success": True, "username": user["username"]}
+    return {"success": True, "username": user["username"], **session_tokens.issue_pair(user["username"])}
+
+
+# ── Session tokens ────────────────────────────────────────────────────────────
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+class LogoutRequest(BaseModel):
+    refresh_token: str
+    everywhere: bool = False
+
+
+@router.post("/token/refresh")
+async def refresh_token(req: RefreshRequest):
+    """Exchange a refresh token for a new access/refresh pair (the old one is revoked)."""
+    try:
+        tokens = await session_tokens.refresh(req.refresh_token)
+    except session_tokens.InvalidToken as e:
+        raise HTTPException(status_code=401, detail=f"Invalid refresh token: {e}")
+    return {"success": True, **tokens}
+
+
+@router.post("/logout")
+async def logout(req: LogoutRequest):
+    """Revoke a refresh token, or every session of its user with ``everywhere``."""
+    try:
+        username = await session_tokens.logout(req.refresh_token, everywhere=req.everywhere)
+    except session_tokens.InvalidToken as e:
+        raise HTTPException(status_code=401, detail=f"Invalid refresh token: {e}")
+    print(f"[AUTH] logout for '{username}'{' (all sessions)' if req.everywhere else ''}")
+    return {"success": True}
+
+
+@router.get("/me")
+async def me(username: str = Depends(require_user)):
+    """Profile of the user the access token was issued to."""
+    profile = await user_model.get_profile(username)
+    if not profile:
+        raise HTTPException(status_code=404, detail="User not found")
+    return profile
 
 
 @router.post("/verify/fingerprint")
@@ -119,27 +210,96 @@ async def save_emergency_contact(req: EmergencyContactRequest):
     return {"success": True, "emergency_contact": contact}
 
 
+def _etag(body: dict) -> str:
+    return '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest() + '"'
+
+
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """If-None-Match uses weak comparison: ``W/"x"`` matches ``"x"``."""
+    if not if_none_match:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
 @router.get("/profile/{username}")
-async def get_user_profile(username: str):
-    """Fetch public profile including emergency contact."""
+async def get_user_profile(username: str, if_none_match: Optional[str] = Header(None)):
+    """Fetch public profile including emergency contact.
+
+    Sends an ``ETag``; a request whose ``If-None-Match`` carries it gets an
+    empty 304 instead.
+    """
     profile = await user_model.get_profile(username)
     if not profile:
         raise HTTPException(status_code=404, detail="User not found")
-    return profile
+    headers = {"ETag": _etag(profile), "Cache-Control": "private, no-cache"}
+    if _etag_matches(headers["ETag"], if_none_match):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(profile, headers=headers)
 
 
 @router.get("/users")
-async def list_users():
-    """Debug endpoint: list all registered usernames."""
-    from app.db import db, USING_MONGO
-    if USING_MONGO:
-        import asyncio
-        raw_db = db._raw
-        def _list_sync():
-            coll = raw_db["users"]
-            return [{"username": u.get("username", "?")} for u in coll.find({}, {"_id": 0, "username": 1})]
-        users = await asyncio.to_thread(_list_sync)
-    else:
-        data = db.users._read()
-        users = [{"username": u} for u in data.keys()]
-    return {"users": users, "storage": "mongodb" if USING_MONGO else "file"}
+async def list_users(after: Optional[str] = None, limit: Optional[int] = Query(None, ge=1)):
+    """Debug endpoint: registered usernames in username order, streamed as NDJSON.
+
+    One ``{"type": "user", "username": ...}`` line per user, then an ``end``
+    line with ``count``, ``storage`` and ``next``. ``next`` is set when
+    ``limit`` stopped the listing early; pass it back as ``after`` for the
+    following page.
+    """
+    from app.db import db, storage_mode
+
+    async def _stream():
+        cursor, sent, more = after, 0, True
+        while more and (limit is None or sent < limit):
+            want = USERS_PAGE_SIZE if limit is None else min(USERS_PAGE_SIZE, limit - sent)
+            query = {"username": {"$gt": cursor}} if cursor is not None else {}
+            # One extra row tells whether anything follows this page.
+            page = await db.users.find(query, {"_id": 0, "username": 1}, sort=[("username", 1)], limit=want + 1)
+            more = len(page) > want
+            page = page[:want]
+            if page:
+                cursor = page[-1]["username"]
+                sent += len(page)
+                yield "".join(json.dumps({"type": "user", "username": u["username"]}, ensure_ascii=False) + "\n"
+                              for u in page)
+        end = {"type": "end", "count": sent, "next": cursor if more else None, "storage": storage_mode()}
+        yield json.dumps(end, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+
+def _too_large(detail: str) -> HTTPException:
+    return HTTPException(status_code=413, detail=detail)
+
+
+@router.post("/users/import", dependencies=[Depends(require_admin)])
+async def import_users(request: Request):
+    """Create many users from an NDJSON body (one user object per line). Admins only.
+
+    Streams NDJSON progress: an ``error`` line per rejected row (with its
+    line number), a ``batch`` line per written batch and a final ``summary``.
+    See ``app.models.user_import`` for the row format. Bodies over
+    ``USER_IMPORT_MAX_BYTES`` or ``USER_IMPORT_MAX_ROWS`` lines get 413;
+    larger imports go through ``python -m app.cli.import_users``.
+    """
+    limit = f"at most {USER_IMPORT_MAX_BYTES} bytes and {USER_IMPORT_MAX_ROWS} rows per request"
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > USER_IMPORT_MAX_BYTES:
+        raise _too_large(f"Import too large: {limit}.")
+    # Read the body up front: the response streams while the request is done.
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > USER_IMPORT_MAX_BYTES:
+            raise _too_large(f"Import too large: {limit}.")
+        chunks.append(chunk)
+    body = b"".join(chunks).decode("utf-8", errors="replace")
+    if sum(1 for line in body.splitlines() if line.strip()) > USER_IMPORT_MAX_ROWS:
+        raise _too_large(f"Too many rows: {limit}.")
+
+    async def _stream():
+        async for event in user_import.import_users(body.splitlines()):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
@@ -1,14 +1,28 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from pydantic import BaseModel, Field
+from typing import List, Optional, Tuple
+import logging
 import os
-import httpx
+
+from app import request_timing
+from app.models import chat_sessions, faq_index
+from app.services.llm_provider import LLMConfigError, LLMError, LLMRateLimitError, chat_completion
+
+logger = logging.getLogger("samaan.chat")
 
 router = APIRouter()
 
-LLM_API_KEY = os.getenv("LLM_API_KEY", "")
-LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
-LLM_MODEL = os.getenv("LLM_MODEL", "mixtral-8x7b-32768")
+CHAT_MAX_MESSAGE_CHARS = int(os.getenv("CHAT_MAX_MESSAGE_CHARS", "2000"))
+# Budget for the LLM call, retries included; past it the user gets a fallback reply.
+CHAT_DEADLINE_S = float(os.getenv("CHAT_DEADLINE_S", "10"))
+# How close the message must be to a known FAQ question for a failed LLM
+# call to fall back to that entry's answer rather than a canned reply.
+CHAT_GUIDE_MIN_CONFIDENCE = float(os.getenv("CHAT_GUIDE_MIN_CONFIDENCE", "0.3"))
+
+NOT_CONFIGURED_REPLY = "Chat service is not configured yet. Please ask the administrator to set the LLM_API_KEY in the environment."
+BUSY_REPLY = "Many people are asking questions right now. Please try again in a minute."
+SLOW_REPLY = "I'm taking longer than usual to answer. Please try again in a moment."
+GUIDE_PREFIX = "I can't reach the assistant right now, but this is what the SAMAAN pension guide says:\n\n"
 
 SYSTEM_PROMPT = """You are SAMAAN Assistant — a helpful, empathetic AI chatbot for the SAMAAN Pension Assist platform.
 You help Indian pensioners with:
@@ -32,52 +46,92 @@ class ChatMessage(BaseModel):
 
 
 class ChatRequest(BaseModel):
-    messages: List[ChatMessage]
+    # Session mode: the new message only; the server keeps the history.
+    session_id: Optional[str] = None
+    message: Optional[str] = Field(None, max_length=CHAT_MAX_MESSAGE_CHARS)
+    # Stateless mode: the whole conversation, of which the last 10 are used.
+    messages: Optional[List[ChatMessage]] = None
 
 
 class ChatResponse(BaseModel):
     reply: str
+    session_id: Optional[str] = None
+    # "faq" when answered from the local knowledge base without the LLM,
+    # "fallback" for a canned reply after the LLM failed or timed out.
+    source: str = "llm"
 
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest):
-    """Send a message to the LLM and return the response."""
-    if not LLM_API_KEY:
-        return ChatResponse(
-            reply="Chat service is not configured yet. Please ask the administrator to set the LLM_API_KEY in the environment."
+def _guide_entry(match: faq_index.Match) -> Optional[dict]:
+    """The FAQ entry to answer with when the LLM fails: only one both retrieval paths agree on."""
+    if match.kind != "context" or match.nearest is not match.entries[0]:
+        return None
+    return match.nearest if match.nearest_confidence >= CHAT_GUIDE_MIN_CONFIDENCE else None
+
+
+async def _ask(api_messages: List[dict], match: faq_index.Match, cache: bool) -> Tuple[str, str]:
+    """Reply and its source: "llm", or "fallback" when the LLM failed or ran out of time."""
+    try:
+        resp = await chat_completion(
+            api_messages, temperature=0.7, max_tokens=512, caller="chat", timeout=CHAT_DEADLINE_S, cache=cache,
         )
+        return resp.content, "llm"
+    except LLMConfigError:
+        return NOT_CONFIGURED_REPLY, "fallback"
+    except LLMError as e:
+        logger.warning("Chat fell back after LLM error: %s", e)
+        guide = _guide_entry(match)
+        if guide is not None:
+            return GUIDE_PREFIX + guide["answer"], "fallback"
+        return (BUSY_REPLY if isinstance(e, LLMRateLimitError) else SLOW_REPLY), "fallback"
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(req: ChatRequest, background_tasks: BackgroundTasks):
+    """Send a message to the LLM and return the response.
+
+    With ``message`` the conversation is kept server side under
+    ``session_id`` (a new id is returned when none, or an expired one, is
+    given); with ``messages`` the client sends the history itself.
+
+    The latest user message is first looked up in the pension FAQ index
+    (unless it is a follow-up whose words the session already holds): a
+    confident match is answered from it directly, weaker ones add the
+    matching passages to the prompt. The LLM gets ``CHAT_DEADLINE_S``;
+    after that, or when it fails, a canned reply is sent instead (failed
+    turns are not stored in the session).
+    """
+    if req.message is None and not req.messages:
+        raise HTTPException(status_code=422, detail="Send 'message' (with 'session_id' to continue) or 'messages'.")
+
+    if req.message is None:
+        question = next((m.content for m in reversed(req.messages) if m.role == "user"), "")
+        with request_timing.stage("faq"):
+            match = faq_index.lookup(question)
+        if match.kind == "direct":
+            return ChatResponse(reply=match.answer, source="faq")
+        api_messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        if match.kind == "context":
+            api_messages.append({"role": "system", "content": faq_index.context_prompt(match.entries)})
+        for msg in req.messages[-10:]:
+            api_messages.append({"role": msg.role, "content": msg.content})
+        reply, source = await _ask(api_messages, match, cache=True)
+        return ChatResponse(reply=reply, source=source)
 
-    api_messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-    for msg in req.messages[-10:]:
-        api_messages.append({"role": msg.role, "content": msg.content})
-
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.post(
-                f"{LLM_BASE_URL}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {LLM_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": LLM_MODEL,
-                    "messages": api_messages,
-                    "temperature": 0.7,
-                    "max_tokens": 512,
-                },
-            )
-            response.raise_for_status()
-            data = response.json()
-            reply = data["choices"][0]["message"]["content"]
-            return ChatResponse(reply=reply.strip())
-        except httpx.HTTPStatusError as e:
-            error_body = e.response.text[:200] if e.response else "Unknown"
-            print(f"[CHAT] ❌ LLM API error {e.response.status_code}: {error_body}")
-            return ChatResponse(
-                reply="I'm having trouble connecting to my brain right now. Please try again in a moment."
-            )
-        except Exception as e:
-            print(f"[CHAT] ❌ Exception: {e}")
-            return ChatResponse(
-                reply="Something went wrong on my end. Please try again shortly."
-            )
+    session = await chat_sessions.load(req.session_id)
+    session_id = req.session_id if session else chat_sessions.new_session_id()
+    match = faq_index.Match("none")
+    if not chat_sessions.covers(session, req.message):
+        with request_timing.stage("faq"):
+            match = faq_index.lookup(req.message)
+    if match.kind == "direct":
+        reply, source = match.answer, "faq"
+    else:
+        context = faq_index.context_prompt(match.entries) if match.kind == "context" else None
+        api_messages = chat_sessions.build_messages(SYSTEM_PROMPT, session, req.message, context)
+        # Only a first message has a prompt other sessions can repeat.
+        reply, source = await _ask(api_messages, match, cache=session is None)
+    if source != "fallback":
+        turns = [{"role": "user", "content": req.message}, {"role": "assistant", "content": reply}]
+        if await chat_sessions.append(session_id, session, turns):
+            background_tasks.add_task(chat_sessions.summarize, session_id)
+    return ChatResponse(reply=reply, session_id=session_id, source=source)
@@ -5,6 +5,7 @@ Features:
 - Input validation (1–5 000 chars)
 - LRU cache for repeated queries
 - Structured error responses
+- Per-IP rate limit (RateLimitMiddleware, policy "POST /api/clarify")
 - Language toggle (EN / HI)
 - Mode toggle (prose / bullets)
 """
@@ -13,13 +14,11 @@ from __future__ import annotations
 
 import hashlib
 import logging
-import time
-from collections import OrderedDict
-from typing import Dict, Tuple
 
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import JSONResponse
 
+from app.cache import TTLCache
 from app.schemas.clarify import ClarifyRequest, ClarifyResponse, ErrorResponse
 from app.services.llm_provider import (
     LLMError,
@@ -35,11 +34,11 @@ logger = logging.getLogger("samaan.clarify")
 router = APIRouter()
 
 # ---------------------------------------------------------------------------
-# Simple in-memory LRU cache (no external dependency)
+# In-memory LRU cache (reported in /health and /metrics as "clarify")
 # ---------------------------------------------------------------------------
 _CACHE_MAX = 128
-_cache: OrderedDict[str, Tuple[str, float]] = OrderedDict()
 _CACHE_TTL = 3600  # 1 hour
+_cache = TTLCache("clarify", _CACHE_MAX, _CACHE_TTL)
 
 
 def _cache_key(text: str, language: str, mode: str) -> str:
@@ -48,44 +47,6 @@ def _cache_key(text: str, language: str, mode: str) -> str:
     return hashlib.sha256(raw.encode()).hexdigest()
 
 
-def _cache_get(key: str) -> str | None:
-    """Return cached value if it exists and is not expired."""
-    if key in _cache:
-        value, ts = _cache[key]
-        if time.time() - ts < _CACHE_TTL:
-            _cache.move_to_end(key)
-            return value
-        del _cache[key]
-    return None
-
-
-def _cache_set(key: str, value: str) -> None:
-    """Insert into cache, evicting oldest if full."""
-    _cache[key] = (value, time.time())
-    if len(_cache) > _CACHE_MAX:
-        _cache.popitem(last=False)
-
-
-# ---------------------------------------------------------------------------
-# Simple per-IP rate limiter (sliding window, in-memory)
-# ---------------------------------------------------------------------------
-_RATE_WINDOW = 60  # seconds
-_RATE_LIMIT = 20   # max requests per window per IP
-_rate_buckets: Dict[str, list[float]] = {}
-
-
-def _check_rate_limit(client_ip: str) -> bool:
-    """Return True if the request is allowed, False if rate-limited."""
-    now = time.time()
-    bucket = _rate_buckets.setdefault(client_ip, [])
-    # prune old entries
-    bucket[:] = [t for t in bucket if now - t < _RATE_WINDOW]
-    if len(bucket) >= _RATE_LIMIT:
-        return False
-    bucket.append(now)
-    return True
-
-
 # ---------------------------------------------------------------------------
 # Route
 # ---------------------------------------------------------------------------
@@ -104,17 +65,9 @@ def _check_rate_limit(client_ip: str) -> bool:
 async def clarify(req: ClarifyRequest, request: Request):
     client_ip = request.client.host if request.client else "unknown"
 
-    # Rate limit check
-    if not _check_rate_limit(client_ip):
-        logger.warning("Rate limit exceeded for %s", client_ip)
-        return JSONResponse(
-            status_code=429,
-            content={"error": "rate_limit_exceeded", "detail": "Too many requests. Please wait a minute."},
-        )
-
     # Cache check
     key = _cache_key(req.text, req.language, req.mode)
-    cached = _cache_get(key)
+    cached = _cache.get(key)
     if cached is not None:
         logger.info("Cache hit for key=%s", key[:12])
         return ClarifyResponse(
@@ -128,7 +81,7 @@ async def clarify(req: ClarifyRequest, request: Request):
     messages = build_messages(req.text, language=req.language, mode=req.mode)
 
     try:
-        llm_resp = await chat_completion(messages, temperature=0.3, max_tokens=1024)
+        llm_resp = await chat_completion(messages, temperature=0.3, max_tokens=1024, caller="clarify")
     except LLMConfigError as exc:
         return JSONResponse(
             status_code=503,
@@ -154,7 +107,7 @@ async def clarify(req: ClarifyRequest, request: Request):
     simplified = llm_resp.content
 
     # Cache the result
-    _cache_set(key, simplified)
+    _cache.set(key, simplified)
 
     logger.info(
         "Clarify success | lang=%s mode=%s chars_in=%d chars_out=%d ip=%s",
@@ -1,37 +1,85 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from datetime import datetime
+from typing import List, Optional
+import os
+
+from app import request_timing
+from app.models import grievance_letters
+from app.models.text_simplifier import LANGUAGE_NAMES
 
 router = APIRouter()
 
+GRIEVANCE_BATCH_MAX = int(os.getenv("GRIEVANCE_BATCH_MAX", "10000"))
+
 
 class GrievanceRequest(BaseModel):
     scheme: str
     last_payment: str
     delay_days: int
     name: str
+    language: Optional[str] = None  # a LANGUAGE_NAMES code; English when omitted
 
 
 class GrievanceResponse(BaseModel):
     letter: str
+    # The language the letter is written in: "en" when the requested
+    # translation is not available yet.
+    language: str = "en"
+    template: str = grievance_letters.DEFAULT_TEMPLATE
+
+
+class GrievanceBatchRequest(BaseModel):
+    letters: List[GrievanceRequest]
+    language: Optional[str] = None  # default for letters that do not set their own
+
+
+class GrievanceBatchResponse(BaseModel):
+    letters: List[GrievanceResponse]
+    # Requested languages that could not be served and fell back to English.
+    untranslated: List[str] = []
+
+
+def _language(code: Optional[str], default: str = "en") -> str:
+    code = code or default
+    if code not in LANGUAGE_NAMES:
+        raise HTTPException(status_code=422, detail=f"Unsupported language {code!r}; use one of {sorted(LANGUAGE_NAMES)}.")
+    return code
 
 
 @router.post("/generate-grievance", response_model=GrievanceResponse)
 async def generate_grievance(req: GrievanceRequest):
-    # Simple template-based generator
-    try:
-        last = datetime.fromisoformat(req.last_payment)
-        last_str = last.strftime("%d %B %Y")
-    except Exception:
-        last_str = req.last_payment
-
-    letter = (
-        f"Respected Sir/Madam,\n\n"
-        f"I, {req.name}, am writing regarding delayed pension payments under the {req.scheme} scheme. "
-        f"My last received pension payment was on {last_str}. It has been {req.delay_days} days since the expected payment date. "
-        "Kindly look into this matter and expedite the pending disbursement. I request you to inform me of the reason for the delay and the expected date of payment.\n\n"
-        "Thank you for your prompt attention to this matter.\n\n"
-        f"Yours faithfully,\n{req.name}"
+    """Write a grievance letter from the template for ``scheme`` in ``language``."""
+    language = _language(req.language)
+    template_id = grievance_letters.template_for(req.scheme)
+    with request_timing.stage("template"):
+        template, used = await grievance_letters.template_text(template_id, language)
+    letter = grievance_letters.fill(
+        template, used, name=req.name, scheme=req.scheme, last_payment=req.last_payment, delay_days=req.delay_days,
     )
+    return GrievanceResponse(letter=letter, language=used, template=template_id)
+
+
+@router.post("/generate-grievance/batch", response_model=GrievanceBatchResponse)
+async def generate_grievance_batch(req: GrievanceBatchRequest):
+    """Write many letters in one call (e.g. for a pension camp), in request order.
 
-    return GrievanceResponse(letter=letter)
+    Each distinct scheme template and language is fetched, or translated,
+    once for the whole batch; the letters themselves are plain string fills.
+    """
+    if len(req.letters) > GRIEVANCE_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Too many letters: at most {GRIEVANCE_BATCH_MAX} per batch.")
+    default = _language(req.language)
+    keys = [(grievance_letters.template_for(item.scheme), _language(item.language, default)) for item in req.letters]
+    with request_timing.stage("template"):
+        resolved = await grievance_letters.resolve(keys)
+    with request_timing.stage("fill"):
+        letters = []
+        for item, key in zip(req.letters, keys):
+            template, used = resolved[key]
+            letter = grievance_letters.fill(
+                template, used,
+                name=item.name, scheme=item.scheme, last_payment=item.last_payment, delay_days=item.delay_days,
+            )
+            letters.append(GrievanceResponse(letter=letter, language=used, template=key[0]))
+    untranslated = sorted({lang for (_, lang), (_, used) in resolved.items() if used != lang})
+    return GrievanceBatchResponse(letters=letters, untranslated=untranslated)
@@ -1,8 +1,14 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.models.ocr_engine import ocr_extract_from_upload
+from typing import List
+from app.deadline import DeadlineExceeded
+from app.models.ocr_engine import ocr_extract_async
+from app.models.ocr_parser import parse_fields
 from app.services.llm_provider import chat_completion, LLMError
 import asyncio
+import json
+import os
 import re
 
 router = APIRouter()
@@ -21,6 +27,25 @@ class OcrResponse(BaseModel):
     ai_fields: dict | None = None  # AI-extracted labeled fields
 
 
+# Core fields merged across a beneficiary's documents, in OcrResponse order.
+PROFILE_FIELDS = ("name", "dob", "age", "pension_id", "account_number", "ifsc", "address")
+
+OCR_BATCH_MAX_FILES = int(os.getenv("OCR_BATCH_MAX_FILES", "20"))
+
+
+class BeneficiaryProfile(BaseModel):
+    name: str | None = None
+    dob: str | None = None
+    age: str | None = None
+    pension_id: str | None = None
+    account_number: str | None = None
+    ifsc: str | None = None
+    address: str | None = None
+    documents: list[str] = []           # doc_name of each successfully read file
+    sources: dict[str, str] = {}        # field -> filename it was taken from
+    conflicts: dict[str, list[str]] = {}  # field -> all distinct values seen
+
+
 async def _ai_extract_fields(raw_text: str) -> dict:
     """Use AI to extract and label all identifiable fields from OCR text."""
     import json as _json
@@ -51,6 +76,7 @@ async def _ai_extract_fields(raw_text: str) -> dict:
             ],
             temperature=0.1,
             max_tokens=600,
+            caller="ocr-fields",
         )
         content = resp.content.strip()
         # Strip markdown code fences if present
@@ -94,6 +120,7 @@ async def _ai_doc_name(raw_text: str) -> str:
             ],
             temperature=0.2,
             max_tokens=40,
+            caller="ocr-name",
         )
         return resp.content.strip().strip('"').strip("'")
     except LLMError:
@@ -118,13 +145,12 @@ def _fallback_doc_name(text: str) -> str:
     return "Scanned Document"
 
 
-@router.post("/ocr-extract", response_model=OcrResponse)
-async def ocr_extract(file: UploadFile = File(...)):
-    content = await file.read()
-    filename = file.filename or ""
-
+async def _process_document(content: bytes, filename: str) -> OcrResponse:
+    """OCR one uploaded file and build its OcrResponse (raises HTTPException)."""
     try:
-        text = ocr_extract_from_upload(content, filename=filename)
+        text = await ocr_extract_async(content, filename=filename)
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -134,93 +160,7 @@ async def ocr_extract(file: UploadFile = File(...)):
             detail="Could not extract text from this document. Please ensure the image is clear or use a text-based PDF."
         )
 
-    # ── Regex helpers ──────────────────────────────────────────────
-    ifsc_re = re.compile(r"\b[A-Z]{4}0[A-Z0-9]{6}\b")
-    acct_re = re.compile(r"\b\d{9,18}\b")
-    dob_re = re.compile(
-        r"\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}-\d{2}-\d{2})\b"
-    )
-    age_re = re.compile(r"\bage[:\s]*(\d{2,3})\b", re.IGNORECASE)
-    pin_re = re.compile(r"\b[1-9]\d{5}\b")
-
-    name = dob = age_str = pension_id = account_number = ifsc = address = None
-
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
-    for i, line in enumerate(lines):
-        low = line.lower()
-
-        # Name
-        if not name and any(kw in low for kw in ("name", "नाम")):
-            parts = line.split(":")
-            if len(parts) > 1 and parts[1].strip():
-                name = parts[1].strip()
-            elif i + 1 < len(lines):
-                name = lines[i + 1]
-
-        # Date of birth
-        if not dob and any(kw in low for kw in ("date of birth", "dob", "d.o.b", "जन्म")):
-            m = dob_re.search(line)
-            if not m and i + 1 < len(lines):
-                m = dob_re.search(lines[i + 1])
-            if m:
-                dob = m.group(0)
-
-        # Age
-        if not age_str and "age" in low:
-            m = age_re.search(line)
-            if m:
-                age_str = m.group(1) + " years"
-
-        # Pension ID
-        if not pension_id and any(kw in low for kw in ("pension", "ppo", "ppoid")):
-            parts = line.split(":")
-            if len(parts) > 1:
-                pension_id = parts[1].strip()
-
-        # Account number
-        if not account_number and any(kw in low for kw in ("account", "a/c", "acct")):
-            parts = line.split(":")
-            if len(parts) > 1:
-                account_number = parts[1].strip()
-
-        # IFSC
-        if not ifsc and "ifsc" in low:
-            parts = line.split(":")
-            if len(parts) > 1:
-                ifsc = parts[1].strip()
-
-        # Address (look for "address" label)
-        if not address and "address" in low:
-            parts = line.split(":")
-            if len(parts) > 1 and parts[1].strip():
-                address = parts[1].strip()
-
-    # ── Regex fallbacks ────────────────────────────────────────────
-    if not ifsc:
-        m = ifsc_re.search(text)
-        if m:
-            ifsc = m.group(0)
-
-    if not account_number:
-        m = acct_re.search(text)
-        if m:
-            account_number = m.group(0)
-
-    if not dob:
-        m = dob_re.search(text)
-        if m:
-            dob = m.group(0)
-
-    if not age_str:
-        m = age_re.search(text)
-        if m:
-            age_str = m.group(1) + " years"
-
-    if not pension_id:
-        for token in re.findall(r"\b[A-Z0-9-]{3,12}\b", text):
-            if not dob_re.match(token) and not ifsc_re.match(token):
-                pension_id = token
-                break
+    fields = parse_fields(text)
 
     # ── AI document naming + AI field extraction ──────────────────
     doc_name, ai_fields = await asyncio.gather(
@@ -229,28 +169,99 @@ async def ocr_extract(file: UploadFile = File(...)):
     )
 
     # Promote AI-extracted core fields if regex missed them
-    if not name and ai_fields.get("Full Name"):
-        name = ai_fields["Full Name"]
-    if not dob and ai_fields.get("Date of Birth"):
-        dob = ai_fields["Date of Birth"]
-    if not age_str and ai_fields.get("Age"):
-        age_str = ai_fields["Age"]
-    if not address and ai_fields.get("Address"):
-        address = ai_fields["Address"]
-    if not account_number and ai_fields.get("Account Number"):
-        account_number = ai_fields["Account Number"]
-    if not ifsc and ai_fields.get("IFSC Code"):
-        ifsc = ai_fields["IFSC Code"]
+    if not fields["name"] and ai_fields.get("Full Name"):
+        fields["name"] = ai_fields["Full Name"]
+    if not fields["dob"] and ai_fields.get("Date of Birth"):
+        fields["dob"] = ai_fields["Date of Birth"]
+    if not fields["age"] and ai_fields.get("Age"):
+        fields["age"] = ai_fields["Age"]
+    if not fields["address"] and ai_fields.get("Address"):
+        fields["address"] = ai_fields["Address"]
+    if not fields["account_number"] and ai_fields.get("Account Number"):
+        fields["account_number"] = ai_fields["Account Number"]
+    if not fields["ifsc"] and ai_fields.get("IFSC Code"):
+        fields["ifsc"] = ai_fields["IFSC Code"]
 
     return OcrResponse(
         doc_name=doc_name,
-        name=name,
-        dob=dob,
-        age=age_str,
-        pension_id=pension_id,
-        account_number=account_number,
-        ifsc=ifsc,
-        address=address,
         raw_text=text,
         ai_fields=ai_fields if ai_fields else None,
+        **fields,
     )
+
+
+def _merge_profile(results: list[tuple[str, OcrResponse]]) -> BeneficiaryProfile:
+    """Merge per-document fields, first non-empty value in upload order wins."""
+    profile = BeneficiaryProfile()
+    for filename, res in results:
+        if res.doc_name:
+            profile.documents.append(res.doc_name)
+        for field in PROFILE_FIELDS:
+            value = getattr(res, field)
+            if not value:
+                continue
+            current = getattr(profile, field)
+            if current is None:
+                setattr(profile, field, value)
+                profile.sources[field] = filename
+            elif value != current:
+                seen = profile.conflicts.setdefault(field, [current])
+                if value not in seen:
+                    seen.append(value)
+    return profile
+
+
+@router.post("/ocr-extract", response_model=OcrResponse)
+async def ocr_extract(file: UploadFile = File(...)):
+    content = await file.read()
+    return await _process_document(content, file.filename or "")
+
+
+@router.post("/ocr-extract/batch")
+async def ocr_extract_batch(files: List[UploadFile] = File(...)):
+    """OCR many documents of one beneficiary concurrently.
+
+    Streams NDJSON: one ``document`` line per file as soon as it finishes
+    (``result`` is OcrResponse-shaped, or ``error`` on failure), followed by
+    a final ``profile`` line with the merged BeneficiaryProfile.
+    """
+    if len(files) > OCR_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files: at most {OCR_BATCH_MAX_FILES} per batch.",
+        )
+
+    # Read everything up front: the upload spool is closed once the
+    # handler returns, before the streamed body is consumed.
+    uploads = [(f.filename or "", await f.read()) for f in files]
+
+    async def _run(index: int, filename: str, content: bytes):
+        try:
+            return index, filename, await _process_document(content, filename), None
+        except HTTPException as exc:
+            return index, filename, None, {"status_code": exc.status_code, "detail": exc.detail}
+        except DeadlineExceeded as exc:
+            return index, filename, None, {"status_code": 504, "detail": str(exc)}
+
+    async def _stream():
+        tasks = [asyncio.create_task(_run(i, fn, c)) for i, (fn, c) in enumerate(uploads)]
+        done: list[tuple[int, str, OcrResponse]] = []
+        try:
+            for fut in asyncio.as_completed(tasks):
+                index, filename, result, error = await fut
+                line = {"type": "document", "index": index, "filename": filename}
+                if result is not None:
+                    line["result"] = result.dict()
+                    done.append((index, filename, result))
+                else:
+                    line["error"] = error
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+        finally:
+            for t in tasks:
+                t.cancel()
+
+        done.sort(key=lambda item: item[0])
+        profile = _merge_profile([(fn, res) for _, fn, res in done])
+        yield json.dumps({"type": "profile", "profile": profile.dict()}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
@@ -1,9 +1,15 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from app.models.delay_model import predict_delay as _predict
+import os
+from app.models.delay_model import predict_delay as _predict, predict_delay_batch as _predict_batch
+from app.models import payment_store, user_model
+from app.routes.auth import require_user
 
 router = APIRouter()
 
+PREDICT_BATCH_MAX = int(os.getenv("PREDICT_BATCH_MAX", "50000"))
+
 
 class PredictRequest(BaseModel):
     payment_history: list[str]
@@ -12,10 +18,80 @@ class PredictRequest(BaseModel):
 class PredictResponse(BaseModel):
     risk_score: float
     status: str
-    expected_next_date: str
+    expected_next_date: str | None = None  # None when there is not enough history
+
+
+class BatchPredictRequest(BaseModel):
+    histories: list[list[str]]
+
+
+class BatchPredictItem(BaseModel):
+    risk_score: float | None = None
+    status: str | None = None
+    expected_next_date: str | None = None
+    error: str | None = None
+    invalid_dates: list[int] | None = None
+
+
+class BatchPredictResponse(BaseModel):
+    results: list[BatchPredictItem]
+
+
+class PaymentRequest(BaseModel):
+    dates: list[str]
+
+
+class StoredPredictResponse(BaseModel):
+    risk_score: float
+    status: str
+    expected_next_date: str | None = None
+    count: int
+    invalid_dates: list[int] | None = None
 
 
 @router.post("/predict-delay", response_model=PredictResponse)
 async def predict_delay(req: PredictRequest):
     """Return risk score, status and expected next date."""
     return _predict(req.payment_history)
+
+
+@router.post("/predict-delay/batch", response_model=BatchPredictResponse)
+def predict_delay_batch(req: BatchPredictRequest):
+    """Score many payment histories in one call; results keep request order.
+
+    Declared sync so the NumPy work runs on the threadpool, and returned as a
+    plain JSONResponse to skip per-item response-model validation.
+    """
+    if len(req.histories) > PREDICT_BATCH_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many histories: at most {PREDICT_BATCH_MAX} per batch.",
+        )
+    return JSONResponse({"results": _predict_batch(req.histories)})
+
+
+@router.post("/predict-delay/{username}/payments", response_model=StoredPredictResponse)
+async def record_payments(
+    username: str, req: PaymentRequest, background_tasks: BackgroundTasks, caller: str = Depends(require_user),
+):
+    """Add payment dates to the caller's own stored history and return the updated prediction."""
+    if caller != username:
+        raise HTTPException(status_code=403, detail="Payments can only be recorded for your own account")
+    if await user_model.get_user(username, {"_id": 0, "username": 1}) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    try:
+        prediction, recompute_due = await payment_store.record_payments(username, req.dates)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if recompute_due:
+        background_tasks.add_task(payment_store.recompute, username)
+    return prediction
+
+
+@router.get("/predict-delay/{username}", response_model=StoredPredictResponse)
+async def predict_delay_for_user(username: str):
+    """Prediction from the user's stored payment history; no payload needed."""
+    prediction = await payment_store.get_prediction(username)
+    if prediction is None:
+        raise HTTPException(status_code=404, detail="No payment history for this user")
+    return prediction
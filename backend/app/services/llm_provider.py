@@ -3,18 +3,31 @@ LLM Provider Abstraction Layer
 -------------------------------
 Wraps OpenAI-compatible chat-completion APIs (Groq, OpenAI, Mistral, etc.)
 with retry logic, timeout handling, and structured error reporting.
+
+All calls share one pooled ``httpx.AsyncClient`` per event loop, so
+connections (and TLS sessions) to the provider are reused. Callers whose
+prompts repeat can pass ``cache=True``: replies are kept in the "llm"
+TTL cache and identical calls already in flight share one request.
 """
 
 from __future__ import annotations
 
 import os
 import asyncio
+import hashlib
+import json
 import logging
+import time
 from dataclasses import dataclass
 from typing import List, Dict, Optional
 
 import httpx
 
+from app import deadline as request_deadline
+from app import request_timing
+from app.cache import TTLCache
+from app.metrics import Counter, Histogram
+
 logger = logging.getLogger("samaan.llm")
 
 # ---------------------------------------------------------------------------
@@ -25,6 +38,39 @@ LLM_BASE_URL: str = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
 LLM_MODEL: str = os.getenv("LLM_MODEL", "mixtral-8x7b-32768")
 LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "30"))
 LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+LLM_MAX_KEEPALIVE: int = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_CACHE_SIZE: int = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL_S: float = float(os.getenv("LLM_CACHE_TTL_S", "3600"))
+
+
+# ---------------------------------------------------------------------------
+# Metrics, labelled by ``caller`` (the feature making the call)
+# ---------------------------------------------------------------------------
+LLM_CALL_SECONDS = Histogram(
+    "samaan_llm_call_duration_seconds",
+    "chat_completion() wall time including retries and back-off.",
+    ("caller", "outcome"),
+)
+LLM_ATTEMPTS = Counter("samaan_llm_attempts_total", "HTTP requests sent to the LLM provider.", ("caller",))
+LLM_RETRIES = Counter(
+    "samaan_llm_retries_total",
+    "Attempts that failed transiently and were retried.",
+    ("caller", "reason"),
+)
+LLM_TOKENS = Counter(
+    "samaan_llm_tokens_total",
+    "Tokens reported in the provider's usage block.",
+    ("caller", "kind"),
+)
+
+
+def record_usage(caller: str, usage: Optional[Dict]) -> None:
+    """Add a response's ``usage`` block to the token counters."""
+    for kind in ("prompt", "completion"):
+        n = (usage or {}).get(f"{kind}_tokens")
+        if isinstance(n, int):
+            LLM_TOKENS.inc(n, caller=caller, kind=kind)
 
 
 # ---------------------------------------------------------------------------
@@ -79,6 +125,51 @@ class LLMResponse:
     usage: Optional[Dict] = None
 
 
+# ---------------------------------------------------------------------------
+# Shared HTTP client and response cache
+# ---------------------------------------------------------------------------
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+_responses = TTLCache("llm", LLM_CACHE_SIZE, LLM_CACHE_TTL_S)
+# cache key -> [shared call, number of callers waiting for it]
+_inflight: Dict[str, list] = {}
+
+
+def _http_client() -> httpx.AsyncClient:
+    """The pooled client for the running event loop (pooled connections cannot cross loops)."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=LLM_TIMEOUT,
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def aclose() -> None:
+    """Close the pooled client; called at shutdown."""
+    global _client
+    if _client is not None and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client = None
+
+
+def _cache_key(messages: List[Dict[str, str]], temperature: float, max_tokens: int, url: str, model: str) -> str:
+    raw = json.dumps([url, model, temperature, max_tokens, messages], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _forget(key: str, task: "asyncio.Task[LLMResponse]") -> None:
+    entry = _inflight.get(key)
+    if entry is not None and entry[0] is task:
+        del _inflight[key]
+    if not task.cancelled():
+        task.exception()  # retrieved here when every waiter was cancelled
+
+
 async def chat_completion(
     messages: List[Dict[str, str]],
     *,
@@ -87,13 +178,108 @@ async def chat_completion(
     api_key: Optional[str] = None,
     base_url: Optional[str] = None,
     model: Optional[str] = None,
+    caller: str = "other",
+    timeout: Optional[float] = None,
+    cache: bool = False,
 ) -> LLMResponse:
     """
     Call an OpenAI-compatible chat/completions endpoint.
 
     Retries up to ``LLM_MAX_RETRIES`` times with exponential back-off on
-    transient errors (429, 500, 502, 503, 504).
+    transient errors (429, 500, 502, 503, 504). ``timeout`` bounds the whole
+    call, retries and back-off included: attempts get what is left of it
+    and no retry starts that could not finish in time. Inside a request the
+    request deadline (``app.deadline``) bounds it too. ``cache=True``
+    serves repeated prompts from the "llm" cache and shares identical calls
+    in flight; a shared call runs on its first caller's ``timeout`` alone and
+    each caller stops waiting at its own deadline. ``caller`` names the feature in the LLM metrics.
     """
+    if not cache:
+        return await _observed(messages, temperature, max_tokens, api_key, base_url, model, caller, timeout)
+
+    key = _cache_key(messages, temperature, max_tokens, base_url or LLM_BASE_URL, model or LLM_MODEL)
+    cached = _responses.get(key)
+    if cached is not None:
+        return cached
+    entry = _inflight.get(key)
+    if entry is None:
+        # Not bound by the deadline of the request that happens to start it;
+        # each waiter bounds its own wait below.
+        task = request_deadline.detach(
+            _observed(messages, temperature, max_tokens, api_key, base_url, model, caller, timeout, cache_key=key)
+        )
+        entry = _inflight[key] = [task, 0]
+        task.add_done_callback(lambda t: _forget(key, t))
+    task = entry[0]
+    entry[1] += 1
+    try:
+        budget = request_deadline.clamp(timeout or None)
+        if budget is not None and budget <= 0:
+            raise LLMTimeoutError()
+        # Shielded so one waiter giving up does not cancel the call for the others ...
+        return await asyncio.wait_for(asyncio.shield(task), budget)
+    except asyncio.TimeoutError:
+        if task.done():
+            raise
+        raise LLMTimeoutError() from None
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0 and not task.done():
+            task.cancel()  # ... but nobody waiting means nobody needs the reply
+
+
+async def _observed(
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    api_key: Optional[str],
+    base_url: Optional[str],
+    model: Optional[str],
+    caller: str,
+    timeout: Optional[float],
+    cache_key: Optional[str] = None,
+) -> LLMResponse:
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        # The request's own deadline, if any, caps ``timeout``.
+        budget = request_deadline.clamp(timeout or None)
+        if budget is not None and budget <= 0:
+            raise LLMTimeoutError()
+        until = time.monotonic() + budget if budget is not None else None
+        response = await _chat_completion(messages, temperature, max_tokens, api_key, base_url, model, caller, until)
+        if cache_key is not None:
+            _responses.set(cache_key, response)
+        outcome = "ok"
+        return response
+    except LLMConfigError:
+        outcome = "not_configured"
+        raise
+    except LLMRateLimitError:
+        outcome = "rate_limited"
+        raise
+    except LLMTimeoutError:
+        outcome = "timeout"
+        raise
+    except asyncio.CancelledError:
+        outcome = "cancelled"  # the client went away or its deadline passed
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        LLM_CALL_SECONDS.observe(elapsed, caller=caller, outcome=outcome)
+        request_timing.record(f"llm-{caller}", elapsed)
+
+
+async def _chat_completion(
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    api_key: Optional[str],
+    base_url: Optional[str],
+    model: Optional[str],
+    caller: str,
+    deadline: Optional[float],
+) -> LLMResponse:
     key = api_key or LLM_API_KEY
     url = base_url or LLM_BASE_URL
     mdl = model or LLM_MODEL
@@ -115,29 +301,36 @@ async def chat_completion(
     last_error: Optional[Exception] = None
 
     for attempt in range(1, LLM_MAX_RETRIES + 1):
+        attempt_timeout = LLM_TIMEOUT
+        if deadline is not None:
+            attempt_timeout = min(LLM_TIMEOUT, deadline - time.monotonic())
+            if attempt_timeout <= 0:
+                break
+        LLM_ATTEMPTS.inc(caller=caller)
         try:
-            async with httpx.AsyncClient(timeout=LLM_TIMEOUT) as client:
-                resp = await client.post(
-                    f"{url}/chat/completions",
-                    headers=headers,
-                    json=payload,
-                )
+            resp = await _http_client().post(
+                f"{url}/chat/completions",
+                headers=headers,
+                json=payload,
+                timeout=attempt_timeout,
+            )
 
-                if resp.status_code == 429:
-                    raise LLMRateLimitError()
+            if resp.status_code == 429:
+                raise LLMRateLimitError()
 
-                resp.raise_for_status()
-                data = resp.json()
+            resp.raise_for_status()
+            data = resp.json()
 
-                content = data["choices"][0]["message"]["content"].strip()
-                usage = data.get("usage")
+            content = data["choices"][0]["message"]["content"].strip()
+            usage = data.get("usage")
+            record_usage(caller, usage)
 
-                logger.info(
-                    "LLM call succeeded | model=%s attempt=%d tokens=%s",
-                    mdl, attempt, usage,
-                )
+            logger.info(
+                "LLM call succeeded | caller=%s model=%s attempt=%d tokens=%s",
+                caller, mdl, attempt, usage,
+            )
 
-                return LLMResponse(content=content, model=mdl, usage=usage)
+            return LLMResponse(content=content, model=mdl, usage=usage)
 
         except (httpx.TimeoutException, httpx.ConnectError) as exc:
             last_error = exc
@@ -168,9 +361,21 @@ async def chat_completion(
 
         # exponential back-off: 1s, 2s, 4s …
         if attempt < LLM_MAX_RETRIES:
-            await asyncio.sleep(2 ** (attempt - 1))
+            backoff = 2 ** (attempt - 1)
+            if deadline is not None and time.monotonic() + backoff >= deadline:
+                break  # no time left for another attempt
+            LLM_RETRIES.inc(caller=caller, reason=_retry_reason(last_error))
+            await asyncio.sleep(backoff)
 
     # All retries exhausted
     if isinstance(last_error, LLMRateLimitError):
         raise last_error
     raise LLMTimeoutError() from last_error
+
+
+def _retry_reason(exc: Optional[Exception]) -> str:
+    if isinstance(exc, LLMRateLimitError):
+        return "rate_limited"
+    if isinstance(exc, httpx.HTTPStatusError):
+        return "server_error"
+    return "timeout"
@@ -0,0 +1,124 @@
+"""
+Micro-benchmark: payment-date parser
+------------------------------------
+Compares ``app.models.date_parser.parse_dates`` against the previous
+``_parse_date`` of ``delay_model`` (five ``strptime`` attempts, then
+``fromisoformat``) on synthetic payment-history columns, one per date format,
+and checks that both return identical values on a randomised corpus first.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_date_parser --rows 240 --repeat 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.models.date_parser import parse_dates
+
+_COLUMN_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%Y/%m/%d", "%d %B %Y")
+
+# Shapes seen in real uploads plus the awkward ones: unpadded fields, ISO
+# timestamps, non-ASCII digits, impossible calendar dates and plain junk.
+_FUZZ_FORMATS = _COLUMN_FORMATS + (
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S+05:30",
+    "%G-W%V-%u",
+    "%d-%m-%y",
+    "%d.%m.%Y",
+    "%d\t%B %Y",
+    "%Y%m%d",
+)
+_DEVANAGARI = str.maketrans("0123456789", "०१२३४५६७८९")
+
+
+def _legacy_parse_date(s: str) -> datetime | None:
+    """The per-value parser that used to live in ``app/models/delay_model.py``."""
+    s = s.strip()
+    for fmt in ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%Y/%m/%d", "%d %B %Y"):
+        try:
+            return datetime.strptime(s, fmt)
+        except Exception:
+            continue
+    try:
+        # ISO fallback
+        return datetime.fromisoformat(s)
+    except Exception:
+        return None
+
+
+def make_column(rng: random.Random, rows: int, fmt: str) -> list[str]:
+    """Monthly payment dates in one format, as a history would arrive."""
+    d = datetime(rng.randint(1995, 2005), rng.randint(1, 12), rng.randint(1, 28))
+    out = []
+    for _ in range(rows):
+        d += timedelta(days=rng.choice((28, 30, 31, 31, 35)))
+        out.append(d.strftime(fmt))
+    return out
+
+
+def _fuzz_value(rng: random.Random) -> str:
+    r = rng.random()
+    if r < 0.6:
+        d = datetime(rng.randint(1, 9999), rng.randint(1, 12), rng.randint(1, 28), rng.choice((0, 0, 13)))
+        s = d.strftime(rng.choice(_FUZZ_FORMATS))
+        if rng.random() < 0.1:
+            s = s.translate(_DEVANAGARI)
+        if rng.random() < 0.1:
+            s = f" {s}\n"
+        return s
+    if r < 0.8:
+        return "".join(rng.choice("0123456789-/ :TW") for _ in range(rng.choice((8, 10, 10, 11))))
+    y, m, d = rng.randint(0, 9999), rng.randint(0, 40), rng.randint(0, 40)
+    if rng.random() < 0.5:
+        return rng.choice(("%04d-%02d-%02d", "%04d/%02d/%02d", "%d-%d-%d")) % (y, m, d)
+    return rng.choice(("%02d-%02d-%04d", "%02d/%02d/%04d", "%d/%d/%d")) % (d, m, y)
+
+
+def check_equivalence(samples: int, seed: int) -> None:
+    rng = random.Random(seed)
+    for i in range(samples):
+        column = [_fuzz_value(rng) for _ in range(rng.randint(0, 40))]
+        expected = [_legacy_parse_date(v) for v in column]
+        got = parse_dates(column)
+        if got.dates != expected or got.invalid != [j for j, d in enumerate(expected) if d is None]:
+            raise SystemExit(f"mismatch on sample {i}: {column!r}")
+    print(f"equivalence: {samples} random columns identical")
+
+
+def _time(fn, column: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(column)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--rows", type=int, default=240)
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--samples", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=5)
+    args = ap.parse_args()
+
+    check_equivalence(args.samples, args.seed)
+
+    rng = random.Random(args.seed)
+    for fmt in _COLUMN_FORMATS + ("%-d-%-m-%Y",):
+        column = make_column(rng, args.rows, fmt)
+        old = _time(lambda c: [_legacy_parse_date(v) for v in c], column, args.repeat)
+        new = _time(parse_dates, column, args.repeat)
+        print(
+            f"{fmt:<12} {args.rows} dates: legacy {old / args.rows * 1e6:6.2f} us/date  "
+            f"new {new / args.rows * 1e6:6.2f} us/date  speedup {old / new:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: batch delay prediction
+---------------------------------
+Scores a synthetic book of pensioners with the scalar ``predict_delay`` in a
+loop and with the vectorised ``predict_delay_batch``, checks that every
+result is identical, and reports histories/sec for both.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_delay_batch --histories 10000 --months 240
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import random
+import time
+from datetime import date, timedelta
+
+from app.models import delay_model
+from app.models.date_parser import ParsedDates
+from app.models.delay_model import predict_delay, predict_delay_batch
+
+_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y")
+
+
+def make_histories(n: int, months: int, seed: int) -> list[list[str]]:
+    """Monthly payment dates with jitter, occasional late payments and junk."""
+    rng = random.Random(seed)
+    histories = []
+    for _ in range(n):
+        fmt = rng.choice(_FORMATS)
+        d = date(rng.randint(1995, 2005), rng.randint(1, 12), rng.randint(1, 28))
+        length = rng.randint(0, months)
+        history = []
+        for _ in range(length):
+            d += timedelta(days=rng.choice((28, 30, 31, 31, 35, 60, 95)))
+            history.append(d.strftime(fmt))
+        if history and rng.random() < 0.05:
+            history[rng.randrange(len(history))] = "not a date"
+        if rng.random() < 0.2:
+            rng.shuffle(history)
+        histories.append(history)
+    return histories
+
+
+@contextlib.contextmanager
+def preparsed(histories: list[list[str]]):
+    """Swap date parsing for a dict lookup so only scoring is timed."""
+    original = delay_model.parse_dates
+    cache = {raw: d for h in histories for raw, d in zip(h, original(h).dates)}
+
+    def lookup(values):
+        dates = list(map(cache.__getitem__, values))
+        return ParsedDates(dates, [i for i, d in enumerate(dates) if d is None])
+
+    delay_model.parse_dates = lookup
+    try:
+        yield
+    finally:
+        delay_model.parse_dates = original
+
+
+def _time(fn, *args) -> tuple[float, object]:
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - t0, out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--histories", type=int, default=10000)
+    ap.add_argument("--months", type=int, default=240)
+    ap.add_argument("--seed", type=int, default=11)
+    args = ap.parse_args()
+
+    histories = make_histories(args.histories, args.months, args.seed)
+    n_dates = sum(len(h) for h in histories)
+    print(f"{len(histories)} histories, {n_dates} payment dates")
+
+    t_scalar, scalar = _time(lambda: [predict_delay(h) for h in histories])
+    t_batch, batch = _time(predict_delay_batch, histories)
+
+    # invalid_dates is batch-only; everything else must match exactly.
+    mismatches = sum(
+        1 for a, b in zip(scalar, batch) if a != {k: v for k, v in b.items() if k != "invalid_dates"}
+    )
+    if mismatches:
+        raise SystemExit(f"{mismatches} results differ from predict_delay")
+    print("equivalence: all results identical")
+
+    print(f"end to end   scalar {len(histories) / t_scalar:>12,.0f} histories/s   "
+          f"batch {len(histories) / t_batch:>12,.0f} histories/s   ({t_scalar / t_batch:.1f}x)")
+
+    with preparsed(histories):
+        s_scalar, _ = _time(lambda: [predict_delay(h) for h in histories])
+        s_batch, _ = _time(predict_delay_batch, histories)
+    print(f"scoring only scalar {len(histories) / s_scalar:>12,.0f} histories/s   "
+          f"batch {len(histories) / s_batch:>12,.0f} histories/s   ({s_scalar / s_batch:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
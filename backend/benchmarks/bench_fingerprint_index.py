@@ -0,0 +1,157 @@
+"""
+Benchmark: fingerprint login lookup
+-----------------------------------
+Compares the previous full scan of ``get_user_by_fingerprint`` (one
+``SequenceMatcher`` per stored fingerprint) against ``FingerprintIndex`` for
+10k to 1M users, after checking on a randomised corpus that both pick the
+same user (ties and near-threshold cases included).
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_fingerprint_index --users 10000 100000 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import List, Optional, Tuple
+
+from app.models.fingerprint_index import FingerprintIndex
+from app.models.user_model import FP_SIMILARITY_THRESHOLD, _fp_similarity
+
+_HEX = "0123456789abcdef"
+
+
+def _legacy_best(users: List[Tuple[str, Optional[str]]], query: str) -> Optional[str]:
+    """The scan ``get_user_by_fingerprint`` used to run over every user."""
+    best_user, best_score = None, 0.0
+    for username, stored in users:
+        if stored is None:
+            continue
+        score = _fp_similarity(stored or "", query)
+        if score > best_score:
+            best_score, best_user = score, username
+    return best_user if best_score >= FP_SIMILARITY_THRESHOLD else None
+
+
+def make_fingerprint(rng: random.Random) -> str:
+    """Same shape as the frontend's: ``fp_`` + three 8-digit hex words."""
+    return "fp_" + "".join(rng.choice(_HEX) for _ in range(24))
+
+
+def mutate(rng: random.Random, fp: str, edits: int) -> str:
+    s = list(fp)
+    for _ in range(edits):
+        if not s:
+            s.append(rng.choice(_HEX))
+            continue
+        op, i = rng.random(), rng.randrange(3 if len(s) > 3 else 0, len(s))
+        if op < 0.5:
+            s[i] = rng.choice(_HEX)
+        elif op < 0.75:
+            del s[i]
+        else:
+            s.insert(i, rng.choice(_HEX))
+    return "".join(s)
+
+
+def make_queries(rng: random.Random, users, n: int) -> List[str]:
+    """Exact hits, near misses around the threshold and unknown devices."""
+    queries = []
+    for _ in range(n):
+        r = rng.random()
+        stored = rng.choice(users)[1] or make_fingerprint(rng)
+        if r < 0.5:
+            queries.append(stored)
+        elif r < 0.8:
+            queries.append(mutate(rng, stored, rng.choice((1, 1, 2, 3))))
+        else:
+            queries.append(make_fingerprint(rng))
+    return queries
+
+
+def _adversarial_users(rng: random.Random, n: int) -> List[Tuple[str, Optional[str]]]:
+    """Few distinct bases, many near-duplicates, odd lengths and empties."""
+    bases = [make_fingerprint(rng) for _ in range(max(1, n // 50))]
+    bases += ["fp_", "ab", "fp_aaaaaaaaaaaaaaaaaaaaaaaa", "x" * 60, "fp_" + "0123" * 12]
+    users = []
+    for i in range(n):
+        r = rng.random()
+        base = rng.choice(bases)
+        if r < 0.05:
+            fp = None
+        elif r < 0.08:
+            fp = ""
+        elif r < 0.6:
+            fp = mutate(rng, base, rng.choice((0, 1, 1, 2))) if len(base) > 4 else base
+        else:
+            fp = make_fingerprint(rng)
+        users.append((f"user{i}", fp))
+    return users
+
+
+def check_equivalence(samples: int, seed: int) -> None:
+    rng = random.Random(seed)
+    users = _adversarial_users(rng, 3000)
+    index = FingerprintIndex.build(users, FP_SIMILARITY_THRESHOLD, _fp_similarity)
+    queries = make_queries(rng, [u for u in users if u[1]], samples)
+    queries += ["", "fp_", "ab", "abc", "x" * 59, "fp_" + "0123" * 12 + "4"]
+    for q in queries:
+        expected = _legacy_best(users, q)
+        got = index.best_match(q)[0]
+        if got != expected:
+            raise SystemExit(f"mismatch for {q!r}: legacy={expected} index={got}")
+    # Updates keep each user's position, as the database does.
+    for _ in range(200):
+        i = rng.randrange(len(users))
+        users[i] = (users[i][0], rng.choice((None, make_fingerprint(rng), mutate(rng, users[i][1] or "fp_0", 1))))
+        index.add(*users[i])
+        q = rng.choice(queries)
+        if index.best_match(q)[0] != _legacy_best(users, q):
+            raise SystemExit(f"mismatch after update for {q!r}")
+    print(f"equivalence: {len(queries)} lookups + 200 updates identical to the full scan")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--users", type=int, nargs="+", default=[10000, 100000])
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--legacy-queries", type=int, default=2, help="full scans timed per size (0 = skip)")
+    ap.add_argument("--samples", type=int, default=300)
+    ap.add_argument("--seed", type=int, default=3)
+    args = ap.parse_args()
+
+    check_equivalence(args.samples, args.seed)
+
+    rng = random.Random(args.seed)
+    for n in args.users:
+        users = [(f"user{i}", make_fingerprint(rng)) for i in range(n)]
+        t0 = time.perf_counter()
+        index = FingerprintIndex.build(users, FP_SIMILARITY_THRESHOLD, _fp_similarity)
+        build_s = time.perf_counter() - t0
+
+        queries = make_queries(rng, users, args.queries)
+        t0 = time.perf_counter()
+        scored = sum(index.best_match(q)[2] for q in queries)
+        index_s = (time.perf_counter() - t0) / len(queries)
+
+        line = (
+            f"{n:>9,} users: build {build_s:6.2f}s  "
+            f"index {index_s * 1e3:7.3f} ms/lookup ({scored / len(queries):.1f} scored)"
+        )
+        # Time the full scan on non-identical queries (identical ones used to
+        # be just as slow, the scan never stopped early).
+        legacy_q = [q for q in queries if q not in index._exact][:args.legacy_queries]
+        if legacy_q:
+            t0 = time.perf_counter()
+            for q in legacy_q:
+                _legacy_best(users, q)
+            legacy_s = (time.perf_counter() - t0) / len(legacy_q)
+            line += f"  full scan {legacy_s * 1e3:9.1f} ms/lookup  ({legacy_s / index_s:,.0f}x)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
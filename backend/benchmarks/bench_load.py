@@ -0,0 +1,332 @@
+"""
+Benchmark: end-to-end load
+--------------------------
+Boots ``app.main:app`` under uvicorn in a subprocess against a fresh local
+SQLite store (MongoDB is pointed at a closed port) and ``benchmarks.stub_llm``
+instead of the real LLM provider, then keeps ``--concurrency`` clients busy
+(closed loop) with a weighted mix of ``/api/clarify``, ``/simplify-text``,
+``/chat``, ``/ocr-extract`` (generated PNG pages and a two-page PDF),
+``/login`` and ``/predict-delay`` for ``--duration`` seconds after a
+``--warmup``. Request payloads come from a seeded RNG, so two runs with the
+same arguments send the same sequence per client.
+
+Reports requests/sec, unexpected responses and p50/p95/p99 latency per
+endpoint and overall. ``--save-baseline`` stores the numbers as JSON;
+``--baseline`` compares against a stored run and exits 1 if any endpoint's
+p95 grew or its throughput fell by more than ``--tolerance``, or its error
+rate rose by more than one point. Baselines only mean something on the
+machine (and tesseract/poppler install) that recorded them.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_load --concurrency 16 --duration 30 --save-baseline /tmp/load-baseline.json
+    python -m benchmarks.bench_load --concurrency 16 --duration 30 --baseline /tmp/load-baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+from PIL import Image, ImageDraw
+
+from benchmarks.bench_delay_batch import make_histories
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_MIX = "clarify=3,simplify=2,chat=3,ocr=1,login=1,predict=4"
+
+_SENTENCES = (
+    "Pursuant to Clause 14(b) the commuted value of pension shall be restored after fifteen years.",
+    "Dearness relief is admissible on the basic pension at rates notified by the Government from time to time.",
+    "The life certificate must be submitted in November every year to the disbursing bank.",
+    "Family pension is payable to the spouse at thirty percent of the last drawn pay.",
+    "Arrears arising from revision shall be credited within ninety days of the order.",
+    "Pensioners above eighty years are entitled to additional pension as per the prescribed slabs.",
+    "The Pension Payment Order shall indicate the name of the spouse eligible for family pension.",
+    "Any overpayment detected on audit shall be recovered from future instalments.",
+    "Fixed medical allowance is paid to pensioners not availing CGHS facilities.",
+    "Nomination under the scheme may be changed by submitting Form 1 to the head of office.",
+    "Interest on delayed payment of gratuity is payable at the rate applicable to GPF.",
+    "The Jeevan Pramaan digital certificate is accepted in lieu of physical presence.",
+    "A grievance not resolved within thirty days may be escalated to the CPENGRAMS portal.",
+    "Income tax is deducted at source on pension exceeding the exemption limit.",
+    "Reemployed pensioners shall declare their pay in the reemployed post annually.",
+)
+_CHAT_QUESTIONS = (
+    "My pension has not come this month, what should I do?",
+    "How do I submit my life certificate?",
+    "What is family pension?",
+    "Can I change my bank branch for pension credit?",
+    "Why was tax deducted from my pension?",
+)
+
+
+# ---- payloads ----
+def _document_page(lines: List[str], size=(1240, 1754)) -> Image.Image:
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    for i, line in enumerate(lines):
+        draw.text((80, 120 + i * 48), line, fill="black")
+    return img
+
+
+def make_documents() -> List[Tuple[str, bytes, str]]:
+    """A few (filename, bytes, content type) uploads: PNG pages and a two-page PDF."""
+    pages = [
+        _document_page(["PENSION PAYMENT ORDER", "Name: Ramesh Kumar", "PPO No: PPO/2018/004521",
+                        "Date of Birth: 15/08/1958", "Account No: 30412345678", "IFSC: SBIN0001234"]),
+        _document_page(["LIFE CERTIFICATE", "Certified that Sunita Devi", "Pension ID: 4587123",
+                        "Date of Birth: 02-01-1950", "Address: 12 MG Road, Pune 411001"]),
+        _document_page(["BANK PASSBOOK", "State Bank of India", "Account Number: 20987654321",
+                        "IFSC Code: SBIN0004567", "Name: Abdul Rahman"]),
+    ]
+    docs = []
+    for i, page in enumerate(pages):
+        buf = io.BytesIO()
+        page.save(buf, "PNG")
+        docs.append((f"page{i}.png", buf.getvalue(), "image/png"))
+    buf = io.BytesIO()
+    pages[0].save(buf, "PDF", save_all=True, append_images=pages[1:2], resolution=150)
+    docs.append(("ppo.pdf", buf.getvalue(), "application/pdf"))
+    return docs
+
+
+Builder = Callable[[random.Random], Tuple[str, str, dict, Tuple[int, ...]]]
+
+
+def make_builders(users: List[Tuple[str, str]], documents) -> Dict[str, Builder]:
+    """Endpoint name -> rng -> (method, path, httpx kwargs, expected statuses)."""
+
+    def clarify(rng):
+        text = " ".join(rng.sample(_SENTENCES, 3))
+        body = {"text": text, "language": rng.choice(("en", "hi")), "mode": rng.choice(("prose", "bullets"))}
+        return "POST", "/api/clarify", {"json": body}, (200,)
+
+    def simplify(rng):
+        body = {"text": rng.choice(_SENTENCES), "language": rng.choice(("en", "hi")),
+                "mode": rng.choice(("simplify", "translate"))}
+        return "POST", "/simplify-text", {"json": body}, (200,)
+
+    def chat(rng):
+        turns = []
+        for _ in range(rng.randint(1, 3)):
+            turns += [{"role": "user", "content": rng.choice(_CHAT_QUESTIONS)},
+                      {"role": "assistant", "content": rng.choice(_SENTENCES)}]
+        return "POST", "/chat", {"json": {"messages": turns[:-1]}}, (200,)
+
+    def ocr(rng):
+        name, data, ctype = rng.choice(documents)
+        return "POST", "/ocr-extract", {"files": {"file": (name, data, ctype)}}, (200,)
+
+    def login(rng):
+        username, password = rng.choice(users)
+        if rng.random() < 0.1:
+            return "POST", "/login", {"json": {"username": username, "password": "wrong"}}, (401,)
+        return "POST", "/login", {"json": {"username": username, "password": password}}, (200,)
+
+    def predict(rng):
+        history = make_histories(1, rng.randint(12, 60), rng.randrange(1 << 30))[0]
+        return "POST", "/predict-delay", {"json": {"payment_history": history}}, (200,)
+
+    return {"clarify": clarify, "simplify": simplify, "chat": chat, "ocr": ocr, "login": login, "predict": predict}
+
+
+def parse_mix(spec: str) -> Dict[str, int]:
+    mix = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, weight = part.partition("=")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+# ---- processes ----
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _spawn(args: List[str], env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", *args], cwd=BACKEND_DIR, env={**os.environ, **env})
+
+
+async def _wait_ready(client: httpx.AsyncClient, url: str, proc: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"{url} exited with status {proc.returncode} before becoming ready")
+        try:
+            await client.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"{url} not ready after {timeout:.0f}s")
+
+
+# ---- load ----
+async def _client(index: int, client, builders, names, weights, seed, warmup_end, end, samples) -> None:
+    rng = random.Random(seed * 1000 + index)
+    while time.monotonic() < end:
+        name = rng.choices(names, weights)[0]
+        method, path, kwargs, expected = builders[name](rng)
+        started = time.monotonic()
+        try:
+            status = (await client.request(method, path, **kwargs)).status_code
+        except httpx.HTTPError:
+            status = None
+        if started >= warmup_end:
+            samples[name].append((time.monotonic() - started, status if status not in expected else 0))
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def summarize(samples: Dict[str, List[Tuple[float, Optional[int]]]], duration: float) -> Dict[str, dict]:
+    results = {}
+    everything = [s for name in sorted(samples) for s in samples[name]]
+    for name, rows in sorted(samples.items()) + [("overall", everything)]:
+        latencies = sorted(lat for lat, _ in rows)
+        unexpected = [str(status) if status is not None else "failed" for _, status in rows if status != 0]
+        results[name] = {
+            "requests": len(rows),
+            "errors": len(unexpected),
+            "error_statuses": {s: unexpected.count(s) for s in sorted(set(unexpected))},
+            "rps": round(len(rows) / duration, 2),
+            "p50_ms": round(_percentile(latencies, 0.50) * 1e3, 1),
+            "p95_ms": round(_percentile(latencies, 0.95) * 1e3, 1),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1e3, 1),
+        }
+    return results
+
+
+def print_table(results: Dict[str, dict]) -> None:
+    print(f"{'endpoint':>10} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, r in results.items():
+        statuses = " ".join(f"{s}x{n}" for s, n in r["error_statuses"].items())
+        print(f"{name:>10} {r['requests']:>9} {r['errors']:>7} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}  {statuses}")
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Regressions of ``results`` against ``baseline``, as readable lines."""
+    problems = []
+    for name, base in baseline.items():
+        cur = results.get(name)
+        if cur is None or not base["requests"] or not cur["requests"]:
+            continue
+        if base["p95_ms"] and cur["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            problems.append(f"{name}: p95 {base['p95_ms']:.1f} -> {cur['p95_ms']:.1f} ms")
+        if cur["rps"] < base["rps"] * (1 - tolerance):
+            problems.append(f"{name}: throughput {base['rps']:.1f} -> {cur['rps']:.1f} req/s")
+        base_err, cur_err = base["errors"] / base["requests"], cur["errors"] / cur["requests"]
+        if cur_err > base_err + 0.01:
+            problems.append(f"{name}: error rate {base_err:.1%} -> {cur_err:.1%}")
+    return problems
+
+
+async def run(args) -> Dict[str, dict]:
+    app_port, llm_port = _free_port(), _free_port()
+    mix = parse_mix(args.mix)
+    with tempfile.TemporaryDirectory(prefix="samaan-load-") as tmp:
+        stub = _spawn(["benchmarks.stub_llm", "--port", str(llm_port), "--latency-ms", str(args.llm_latency_ms),
+                       "--jitter-ms", str(args.llm_jitter_ms)], {})
+        server = _spawn(["uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning"], {
+            "LOCAL_DB_PATH": str(Path(tmp) / "samaan.db"),
+            "MONGO_URI": "mongodb://127.0.0.1:1",
+            "MONGO_CONNECT_TIMEOUT_S": "0.2",
+            "LLM_API_KEY": "stub",
+            "LLM_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+            "RATE_LIMIT_ENABLED": "0",
+            "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+            "AUTH_SECRET": "load-test",
+        })
+        try:
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", limits=limits,
+                                         timeout=args.timeout) as client:
+                await _wait_ready(client, f"http://127.0.0.1:{llm_port}/docs", stub)
+                await _wait_ready(client, "/health", server)
+
+                users = [(f"load-user-{i}", f"pension-{i}") for i in range(args.users)]
+                for username, password in users:
+                    r = await client.post("/signup", json={"username": username, "password": password})
+                    r.raise_for_status()
+                builders = make_builders(users, make_documents())
+                unknown = set(mix) - set(builders)
+                if unknown:
+                    raise SystemExit(f"unknown endpoints in --mix: {', '.join(sorted(unknown))}")
+
+                # (latency, 0 if the status was expected else the status; None if the request failed)
+                samples: Dict[str, List[Tuple[float, Optional[int]]]] = defaultdict(list)
+                now = time.monotonic()
+                warmup_end, end = now + args.warmup, now + args.warmup + args.duration
+                names, weights = list(mix), list(mix.values())
+                await asyncio.gather(*(
+                    _client(i, client, builders, names, weights, args.seed, warmup_end, end, samples)
+                    for i in range(args.concurrency)
+                ))
+        finally:
+            for proc in (server, stub):
+                proc.terminate()
+                proc.wait(10)
+    return summarize(samples, args.duration)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=30, help="measured seconds")
+    ap.add_argument("--warmup", type=float, default=5, help="seconds of load before measuring")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,... (default: %(default)s)")
+    ap.add_argument("--users", type=int, default=20, help="accounts created for /login")
+    ap.add_argument("--bcrypt-rounds", type=int, default=12)
+    ap.add_argument("--llm-latency-ms", type=float, default=400)
+    ap.add_argument("--llm-jitter-ms", type=float, default=200)
+    ap.add_argument("--timeout", type=float, default=120, help="per-request client timeout (s)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--save-baseline", type=Path)
+    ap.add_argument("--baseline", type=Path)
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed relative p95/throughput change")
+    args = ap.parse_args()
+
+    config = {k: getattr(args, k) for k in ("concurrency", "duration", "mix", "bcrypt_rounds", "llm_latency_ms")}
+    print(f"concurrency {args.concurrency}, {args.duration:.0f}s after {args.warmup:.0f}s warmup, mix {args.mix}, "
+          f"stub LLM {args.llm_latency_ms:.0f}+{args.llm_jitter_ms:.0f} ms, bcrypt cost {args.bcrypt_rounds}")
+    results = asyncio.run(run(args))
+    print_table(results)
+
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.save_baseline.write_text(json.dumps({"config": config, "results": results}, indent=2) + "\n")
+        print(f"baseline written to {args.save_baseline}")
+    if args.baseline:
+        stored = json.loads(args.baseline.read_text())
+        if stored.get("config") != config:
+            print(f"warning: baseline was recorded with {stored.get('config')}")
+        problems = compare(results, stored["results"], args.tolerance)
+        for line in problems:
+            print(f"REGRESSION {line}")
+        if problems:
+            return 1
+        print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
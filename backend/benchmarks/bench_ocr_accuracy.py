@@ -0,0 +1,194 @@
+"""
+Benchmark: OCR throughput and field accuracy
+--------------------------------------------
+Sends every document of a synthetic corpus (``benchmarks.ocr_corpus``) to
+``POST /ocr-extract`` and compares the returned fields with the manifest's
+ground truth. Reports pages/sec, per-document latency, failed requests, and
+field-level precision/recall: a returned value is a true positive when it
+matches the truth (or an alternate spelling) after normalisation, a false
+positive when it is wrong or the page has no such field, and a missed or
+wrong value of a field that is present counts against recall.
+
+By default the app runs in process (no server needed) with the LLM turned
+off, so the numbers measure tesseract plus ``parse_fields``; ``--with-llm``
+keeps the environment's LLM settings (AI fields fill in what the rules
+missed), and ``--url`` targets a running server instead. Without
+``--corpus`` a corpus is generated into a temporary directory with the
+``ocr_corpus`` options.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_ocr_accuracy --count 40 --pdfs 8 --concurrency 4
+    python -m benchmarks.bench_ocr_accuracy --corpus /tmp/ocr-corpus --report ocr-report.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks import ocr_corpus
+
+FIELDS = ("name", "dob", "age", "pension_id", "account_number", "ifsc", "address")
+_CONTENT_TYPES = {".pdf": "application/pdf", ".png": "image/png", ".jpg": "image/jpeg"}
+
+
+def normalize(field: str, value) -> Optional[str]:
+    """Canonical form for comparing an extracted value with the truth."""
+    if value is None:
+        return None
+    text = str(value).strip()
+    if field == "dob":
+        from app.models.date_parser import parse_date
+
+        parsed = parse_date(text)
+        return parsed.date().isoformat() if parsed else re.sub(r"\s+", "", text) or None
+    if field == "age":
+        return re.sub(r"\D", "", text) or None
+    if field in ("pension_id", "account_number", "ifsc"):
+        return re.sub(r"[\s/.\-]", "", text).upper() or None
+    return " ".join(re.sub(r"[,.;:]", " ", text).casefold().split()) or None
+
+
+class Score:
+    def __init__(self):
+        self.tp = self.fp = self.fn = 0
+
+    def add(self, field: str, truth: Optional[str], alternates: List[str], got) -> None:
+        accepted = {normalize(field, v) for v in [truth, *alternates] if v is not None}
+        value = normalize(field, got)
+        if value is not None and value in accepted:
+            self.tp += 1
+            return
+        if value is not None:
+            self.fp += 1
+        if accepted:
+            self.fn += 1
+
+    @property
+    def precision(self) -> Optional[float]:
+        return self.tp / (self.tp + self.fp) if self.tp + self.fp else None
+
+    @property
+    def recall(self) -> Optional[float]:
+        return self.tp / (self.tp + self.fn) if self.tp + self.fn else None
+
+    def as_dict(self) -> dict:
+        return {"tp": self.tp, "fp": self.fp, "fn": self.fn, "precision": self.precision, "recall": self.recall}
+
+
+def _pct(x: Optional[float]) -> str:
+    return "     -" if x is None else f"{x:6.1%}"
+
+
+async def run(corpus: Path, manifest: dict, client: httpx.AsyncClient, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    documents = manifest["documents"]
+
+    async def one(doc: dict):
+        path = corpus / doc["file"]
+        files = {"file": (path.name, path.read_bytes(), _CONTENT_TYPES.get(path.suffix, "application/octet-stream"))}
+        async with sem:
+            started = time.perf_counter()
+            try:
+                resp = await client.post("/ocr-extract", files=files)
+                status, body = resp.status_code, (resp.json() if resp.status_code == 200 else None)
+            except httpx.HTTPError as e:
+                status, body = type(e).__name__, None
+            return doc, status, body, time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(d) for d in documents))
+    elapsed = time.perf_counter() - started
+
+    by_field: Dict[str, Score] = defaultdict(Score)
+    by_group: Dict[str, Score] = defaultdict(Score)
+    overall = Score()
+    failures: Dict[str, int] = defaultdict(int)
+    latencies = sorted(r[3] for r in results)
+    for doc, status, body, _ in results:
+        if status != 200:
+            failures[str(status)] += 1
+        for field in FIELDS:
+            args = (field, doc["fields"].get(field), doc["alternates"].get(field, []), (body or {}).get(field))
+            for score in (by_field[field], by_group[f"lang={doc['language']}"],
+                          by_group[f"type={'+'.join(doc['doc_types'])}" if doc["kind"] == "image" else "type=pdf"],
+                          overall):
+                score.add(*args)
+
+    pages = sum(d["pages"] for d in documents)
+    return {
+        "documents": len(documents),
+        "pages": pages,
+        "seconds": round(elapsed, 2),
+        "pages_per_s": round(pages / elapsed, 2) if elapsed else None,
+        "latency_p50_s": round(latencies[len(latencies) // 2], 3) if latencies else None,
+        "latency_p95_s": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 3) if latencies else None,
+        "failures": dict(failures),
+        "fields": {f: by_field[f].as_dict() for f in FIELDS},
+        "groups": {g: s.as_dict() for g, s in sorted(by_group.items())},
+        "overall": overall.as_dict(),
+    }
+
+
+def print_report(report: dict) -> None:
+    failed = ", ".join(f"{s} x{n}" for s, n in report["failures"].items()) or "none"
+    print(f"{report['documents']} documents, {report['pages']} pages in {report['seconds']:.1f}s: "
+          f"{report['pages_per_s']} pages/s, latency p50 {report['latency_p50_s']}s p95 {report['latency_p95_s']}s, "
+          f"failed requests: {failed}")
+    print(f"{'':>22} {'precision':>9} {'recall':>7} {'tp':>5} {'fp':>5} {'fn':>5}")
+    rows = [(f, s) for f, s in report["fields"].items()] + list(report["groups"].items()) + [("overall", report["overall"])]
+    for name, s in rows:
+        print(f"{name:>22} {_pct(s['precision']):>9} {_pct(s['recall']):>7} {s['tp']:>5} {s['fp']:>5} {s['fn']:>5}")
+
+
+async def _main(args, corpus: Path, manifest: dict) -> dict:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        if not args.with_llm:
+            os.environ["LLM_API_KEY"] = ""  # read by llm_provider at import
+        from app.main import app
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://ocr-bench",
+                                   timeout=args.timeout)
+    async with client:
+        return await run(corpus, manifest, client, args.concurrency)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--corpus", type=Path, help="directory written by benchmarks.ocr_corpus")
+    ap.add_argument("--url", help="base URL of a running backend (default: in process)")
+    ap.add_argument("--with-llm", action="store_true", help="keep LLM_API_KEY for in-process runs")
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--timeout", type=float, default=300)
+    ap.add_argument("--report", type=Path, help="also write the results as JSON")
+    ocr_corpus.add_render_args(ap)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="ocr-corpus-") as tmp:
+        corpus = args.corpus or Path(tmp)
+        if args.corpus:
+            manifest = json.loads((corpus / "manifest.json").read_text(encoding="utf-8"))
+        else:
+            manifest = ocr_corpus.generate_from_args(args, corpus)
+        report = asyncio.run(_main(args, corpus, manifest))
+
+    print_report(report)
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
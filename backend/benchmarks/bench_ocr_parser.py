@@ -0,0 +1,201 @@
+"""
+Micro-benchmark: OCR field parser
+---------------------------------
+Compares ``app.models.ocr_parser.parse_fields`` against the previous inline
+implementation of ``/ocr-extract`` on large synthetic OCR outputs, and checks
+that both return identical fields on a randomised corpus first.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_ocr_parser --pages 50 --repeat 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import time
+
+from app.models.ocr_parser import parse_fields
+
+PAGE_BREAK = "\n\n--- PAGE BREAK ---\n\n"
+
+_WORDS = (
+    "the of pension order payment shall be made to beneficiary under scheme "
+    "treasury district office government india ministry page passage manage "
+    "arrears revised basic family commutation sanctioned authority dearness "
+    "relief with effect from month year amount rupees only"
+).split()
+
+_LABELLED = (
+    "Name: {name}",
+    "नाम : {name}",
+    "Date of Birth: {dob}",
+    "DOB {dob}",
+    "Age: {age}",
+    "PPO No: {ppo}",
+    "Pension ID : {ppo}",
+    "Account No: {acct}",
+    "A/c No. {acct}",
+    "IFSC: {ifsc}",
+    "Address: {addr}",
+    "Name",
+    "{name}",
+    "Pensioname {name}",
+)
+
+
+def _legacy_parse_fields(text: str) -> dict:
+    """The per-request parser that used to live in ``app/routes/ocr.py``."""
+    ifsc_re = re.compile(r"\b[A-Z]{4}0[A-Z0-9]{6}\b")
+    acct_re = re.compile(r"\b\d{9,18}\b")
+    dob_re = re.compile(
+        r"\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}-\d{2}-\d{2})\b"
+    )
+    age_re = re.compile(r"\bage[:\s]*(\d{2,3})\b", re.IGNORECASE)
+
+    name = dob = age_str = pension_id = account_number = ifsc = address = None
+
+    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    for i, line in enumerate(lines):
+        low = line.lower()
+        if not name and any(kw in low for kw in ("name", "नाम")):
+            parts = line.split(":")
+            if len(parts) > 1 and parts[1].strip():
+                name = parts[1].strip()
+            elif i + 1 < len(lines):
+                name = lines[i + 1]
+        if not dob and any(kw in low for kw in ("date of birth", "dob", "d.o.b", "जन्म")):
+            m = dob_re.search(line)
+            if not m and i + 1 < len(lines):
+                m = dob_re.search(lines[i + 1])
+            if m:
+                dob = m.group(0)
+        if not age_str and "age" in low:
+            m = age_re.search(line)
+            if m:
+                age_str = m.group(1) + " years"
+        if not pension_id and any(kw in low for kw in ("pension", "ppo", "ppoid")):
+            parts = line.split(":")
+            if len(parts) > 1:
+                pension_id = parts[1].strip()
+        if not account_number and any(kw in low for kw in ("account", "a/c", "acct")):
+            parts = line.split(":")
+            if len(parts) > 1:
+                account_number = parts[1].strip()
+        if not ifsc and "ifsc" in low:
+            parts = line.split(":")
+            if len(parts) > 1:
+                ifsc = parts[1].strip()
+        if not address and "address" in low:
+            parts = line.split(":")
+            if len(parts) > 1 and parts[1].strip():
+                address = parts[1].strip()
+
+    if not ifsc:
+        m = ifsc_re.search(text)
+        if m:
+            ifsc = m.group(0)
+    if not account_number:
+        m = acct_re.search(text)
+        if m:
+            account_number = m.group(0)
+    if not dob:
+        m = dob_re.search(text)
+        if m:
+            dob = m.group(0)
+    if not age_str:
+        m = age_re.search(text)
+        if m:
+            age_str = m.group(1) + " years"
+    if not pension_id:
+        for token in re.findall(r"\b[A-Z0-9-]{3,12}\b", text):
+            if not dob_re.match(token) and not ifsc_re.match(token):
+                pension_id = token
+                break
+
+    return {
+        "name": name,
+        "dob": dob,
+        "age": age_str,
+        "pension_id": pension_id,
+        "account_number": account_number,
+        "ifsc": ifsc,
+        "address": address,
+    }
+
+
+def _labelled_line(rng: random.Random) -> str:
+    line = rng.choice(_LABELLED).format(
+        name=rng.choice(["Ramesh Kumar", "SUNITA DEVI", "", "İsmail"]),
+        dob=rng.choice(["15/08/1960", "1958-01-31", "3-4-55", "n/a"]),
+        age=rng.choice(["63", "7", "101", "\n64"]),
+        ppo=rng.choice(["PPO-123456", "", "EPS/2019/77"]),
+        acct=rng.choice(["123456789012", "XXXX1234", ""]),
+        ifsc=rng.choice(["SBIN0001234", "sbin0001234", ""]),
+        addr=rng.choice(["12 MG Road, Pune 411001", ""]),
+    )
+    return line.upper() if rng.random() < 0.2 else line
+
+
+def make_page(rng: random.Random, lines: int = 60, label_rate: float = 0.02) -> str:
+    out = [f"GOVERNMENT OF INDIA  page {rng.randint(1, 999)}"]
+    for _ in range(lines):
+        r = rng.random()
+        if r < label_rate:
+            out.append(_labelled_line(rng))
+        elif r < label_rate + 0.05:
+            out.append(rng.choice(["", "   ", "\x0c", "   "]))
+        else:
+            words = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(4, 14)))
+            out.append(words.upper() if rng.random() < 0.3 else words)
+    return "\n".join(out)
+
+
+def make_document(rng: random.Random, pages: int, label_rate: float = 0.02) -> str:
+    return PAGE_BREAK.join(make_page(rng, label_rate=label_rate) for _ in range(pages))
+
+
+def check_equivalence(samples: int, seed: int) -> None:
+    rng = random.Random(seed)
+    for i in range(samples):
+        doc = make_document(rng, pages=rng.randint(1, 3), label_rate=rng.choice([0.0, 0.05, 0.3]))
+        old, new = _legacy_parse_fields(doc), parse_fields(doc)
+        if old != new:
+            raise SystemExit(f"mismatch on sample {i}:\nlegacy={old}\nnew={new}")
+    print(f"equivalence: {samples} random documents identical")
+
+
+def _time(fn, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--pages", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--samples", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    check_equivalence(args.samples, args.seed)
+
+    rng = random.Random(args.seed)
+    for label_rate in (0.0, 0.02):
+        doc = make_document(rng, args.pages, label_rate=label_rate)
+        old = _time(_legacy_parse_fields, doc, args.repeat)
+        new = _time(parse_fields, doc, args.repeat)
+        print(
+            f"{args.pages} pages ({len(doc) / 1024:.0f} KiB, label_rate={label_rate}): "
+            f"legacy {old * 1e3:.2f} ms  new {new * 1e3:.2f} ms  speedup {old / new:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
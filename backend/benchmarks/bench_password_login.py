@@ -0,0 +1,86 @@
+"""
+Benchmark: password login throughput
+------------------------------------
+Runs concurrent password checks the way the previous ``verify_user_password``
+did (``bcrypt.verify`` called directly inside the coroutine) and through
+``app.models.password_hasher``, while a heartbeat coroutine measures how long
+the event loop is blocked. Logins/sec shows the pool using several cores;
+loop lag is what every other request on the worker waits.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_password_login --logins 40 --concurrency 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable, List
+
+from passlib.hash import bcrypt
+
+from app.models import password_hasher
+
+_PASSWORD = "correct horse battery staple"
+
+
+async def _legacy_verify(password: str, stored: str) -> bool:
+    """The inline check ``verify_user_password`` used to run."""
+    try:
+        return bcrypt.verify(password, stored)
+    except Exception:
+        return False
+
+
+async def _heartbeat(lags: List[float], stop: asyncio.Event, every: float = 0.005) -> None:
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(every)
+        lags.append(time.perf_counter() - t0 - every)
+
+
+async def _run(verify: Callable[[str, str], Awaitable[bool]], stored: str, logins: int, concurrency: int):
+    sem = asyncio.Semaphore(concurrency)
+    lags: List[float] = []
+    stop = asyncio.Event()
+
+    async def one(i: int) -> bool:
+        async with sem:
+            return await verify(_PASSWORD if i % 4 else "wrong", stored)
+
+    beat = asyncio.create_task(_heartbeat(lags, stop))
+    await asyncio.sleep(0.02)
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(logins)))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await beat
+    expected = [bool(i % 4) for i in range(logins)]
+    if results != expected:
+        raise SystemExit("verification results differ from expected")
+    # While the loop is blocked the heartbeat cannot sample, so only the
+    # worst stall is meaningful for the inline run.
+    return logins / elapsed, max(lags, default=0.0)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--logins", type=int, default=40)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--rounds", type=int, default=password_hasher.BCRYPT_ROUNDS)
+    args = ap.parse_args()
+
+    stored = bcrypt.using(rounds=args.rounds).hash(_PASSWORD)
+    print(
+        f"bcrypt cost {args.rounds}, {args.logins} logins, concurrency {args.concurrency}, "
+        f"{password_hasher.PASSWORD_HASH_WORKERS} hash workers"
+    )
+    for name, verify in (("inline (before)", _legacy_verify), ("pool (after)", password_hasher.verify_password)):
+        rate, worst = asyncio.run(_run(verify, stored, args.logins, args.concurrency))
+        print(f"{name:>16}: {rate:6.1f} logins/s  longest event-loop stall {worst * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
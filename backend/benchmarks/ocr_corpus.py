@@ -0,0 +1,305 @@
+"""
+Synthetic pension-document corpus
+---------------------------------
+Renders Aadhaar-, PPO-, bank-passbook- and life-certificate-style pages with
+PIL for OCR benchmarks, in English (``en``) and bilingual Hindi/English
+(``hi``, Devanagari labels and names next to the English ones, as on real
+documents). Each page is degraded with a random amount of Gaussian noise,
+blur and rotation up to ``--noise``, ``--blur`` and ``--rotate``, then saved
+as JPEG at ``--jpeg-quality`` (0 = PNG). ``--pdfs`` more documents are
+written as multi-page PDFs combining several pages of one beneficiary.
+
+``manifest.json`` lists every file with its page count, document types,
+language, the degradation applied and the true values of the fields
+``parse_fields`` extracts (name, dob, age, pension_id, account_number, ifsc,
+address). ``alternates`` holds other accepted spellings (the Devanagari
+name on Hindi pages).
+
+Fonts are looked up in the usual system directories (DejaVu, Liberation,
+Noto, FreeSans, Arial; Noto Sans Devanagari, Lohit, Mangal, FreeSans for
+Hindi) or given with ``--font`` / ``--font-hi``. Without a Devanagari font
+Hindi pages are skipped; without libraqm in Pillow, Devanagari is drawn
+unshaped (matras not reordered), which OCR reads worse than real print.
+
+Run from ``backend/``::
+
+    python -m benchmarks.ocr_corpus --out /tmp/ocr-corpus --count 50 --pdfs 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import random
+import sys
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont, features
+
+DOC_TYPES = ("aadhaar", "ppo", "passbook", "life_certificate")
+LANGUAGES = ("en", "hi")
+
+_FONT_DIRS = (
+    "/usr/share/fonts", "/usr/local/share/fonts", "~/.local/share/fonts", "~/.fonts",
+    "/Library/Fonts", "/System/Library/Fonts", "C:/Windows/Fonts",
+)
+_LATIN_FONTS = ("DejaVuSans.ttf", "LiberationSans-Regular.ttf", "NotoSans-Regular.ttf", "FreeSans.ttf",
+                "Arial.ttf", "arial.ttf")
+_DEVANAGARI_FONTS = ("NotoSansDevanagari-Regular.ttf", "Lohit-Devanagari.ttf", "lohit_hi.ttf",
+                     "Mangal.ttf", "mangal.ttf", "FreeSans.ttf")
+
+# (English, Devanagari) names
+_NAMES = (
+    ("Ramesh Kumar", "रमेश कुमार"), ("Sunita Devi", "सुनीता देवी"), ("Abdul Rahman", "अब्दुल रहमान"),
+    ("Lakshmi Iyer", "लक्ष्मी अय्यर"), ("Harpreet Singh", "हरप्रीत सिंह"), ("Meena Sharma", "मीना शर्मा"),
+    ("Gopal Das", "गोपाल दास"), ("Kamala Nair", "कमला नायर"), ("Suresh Patil", "सुरेश पाटिल"),
+    ("Anita Gupta", "अनीता गुप्ता"), ("Mohan Lal", "मोहन लाल"), ("Shanti Verma", "शांति वर्मा"),
+)
+_STREETS = ("MG Road", "Station Road", "Gandhi Nagar", "Civil Lines", "Nehru Colony", "Shastri Marg")
+_CITIES = (("Pune", "411001"), ("Lucknow", "226001"), ("Patna", "800001"), ("Jaipur", "302001"),
+           ("Bhopal", "462001"), ("Chennai", "600001"))
+_BANKS = (("State Bank of India", "SBIN"), ("Punjab National Bank", "PUNB"), ("Bank of Baroda", "BARB"),
+          ("Canara Bank", "CNRB"))
+
+
+def find_font(candidates: Sequence[str]) -> Optional[Path]:
+    for name in candidates:
+        for base in _FONT_DIRS:
+            root = Path(base).expanduser()
+            if root.is_dir():
+                match = next(root.rglob(name), None)
+                if match:
+                    return match
+    return None
+
+
+@dataclass
+class Fonts:
+    latin: Path
+    devanagari: Optional[Path]
+
+    def get(self, size: int, devanagari: bool = False) -> ImageFont.FreeTypeFont:
+        return ImageFont.truetype(str(self.devanagari if devanagari else self.latin), size)
+
+
+# ---- beneficiaries ----
+def make_person(rng: random.Random) -> dict:
+    name, name_hi = rng.choice(_NAMES)
+    born = date(1935, 1, 1) + timedelta(days=rng.randrange(30 * 365))
+    age = (date(2024, 11, 1) - born).days // 365
+    city, pin = rng.choice(_CITIES)
+    bank, ifsc_prefix = rng.choice(_BANKS)
+    return {
+        "name": name,
+        "name_hi": name_hi,
+        "dob": born.strftime(rng.choice(("%d/%m/%Y", "%d-%m-%Y"))),
+        "age": str(age),
+        "pension_id": f"PPO{rng.randint(1990, 2020)}{rng.randrange(10**6):06d}",
+        "account_number": "".join(str(rng.randrange(10)) for _ in range(rng.choice((11, 14)))),
+        "ifsc": f"{ifsc_prefix}0{rng.randrange(10**6):06d}",
+        "address": f"{rng.randint(1, 250)} {rng.choice(_STREETS)}, {city} {pin}",
+        "bank": bank,
+        "aadhaar": " ".join(f"{rng.randrange(10**4):04d}" for _ in range(3)),
+    }
+
+
+# Per document type: (heading, Hindi heading), then (field key, English label, Hindi label) lines.
+_LAYOUTS: Dict[str, Tuple[Tuple[str, str], List[Tuple[str, str, str]]]] = {
+    "aadhaar": (("GOVERNMENT OF INDIA", "भारत सरकार"), [
+        ("name", "Name", "नाम"),
+        ("dob", "DOB", "जन्म तिथि"),
+        ("address", "Address", "पता"),
+        ("aadhaar", "Aadhaar No", "आधार संख्या"),
+    ]),
+    "ppo": (("PENSION PAYMENT ORDER", "पेंशन भुगतान आदेश"), [
+        ("pension_id", "PPO No", "पी.पी.ओ. संख्या"),
+        ("name", "Name of Pensioner", "पेंशनभोगी का नाम"),
+        ("dob", "Date of Birth", "जन्म तिथि"),
+        ("account_number", "Account No", "खाता संख्या"),
+        ("ifsc", "IFSC", "आईएफएससी"),
+        ("address", "Address", "पता"),
+    ]),
+    "passbook": (("SAVINGS BANK PASSBOOK", "बचत खाता पासबुक"), [
+        ("bank", "Bank", "बैंक"),
+        ("name", "Name", "नाम"),
+        ("account_number", "Account Number", "खाता संख्या"),
+        ("ifsc", "IFSC Code", "आईएफएससी कोड"),
+        ("address", "Address", "पता"),
+    ]),
+    "life_certificate": (("LIFE CERTIFICATE", "जीवन प्रमाण पत्र"), [
+        ("name", "Name", "नाम"),
+        ("pension_id", "PPO No", "पी.पी.ओ. संख्या"),
+        ("dob", "Date of Birth", "जन्म तिथि"),
+        ("age", "Age", "आयु"),
+    ]),
+}
+# What parse_fields reports; "bank" and "aadhaar" above are printed for realism only.
+_TRUTH_FIELDS = ("name", "dob", "age", "pension_id", "account_number", "ifsc", "address")
+
+
+def render_page(doc_type: str, person: dict, language: str, fonts: Fonts, size=(1240, 1754)) -> Image.Image:
+    """A clean A4 page at 150 dpi."""
+    (heading, heading_hi), lines = _LAYOUTS[doc_type]
+    img = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(img)
+    hi = language == "hi"
+    y = 120
+    if hi:
+        draw.text((100, y), heading_hi, font=fonts.get(44, devanagari=True), fill=0)
+        y += 70
+    draw.text((100, y), heading, font=fonts.get(44), fill=0)
+    y += 110
+    body, body_hi = fonts.get(32), fonts.get(32, devanagari=True) if hi else None
+    for key, label, label_hi in lines:
+        value = person[key]
+        if key == "age":
+            value = f"{value} years"
+        if hi:
+            hi_value = person["name_hi"] if key == "name" else value
+            draw.text((100, y), f"{label_hi}: {hi_value}", font=body_hi, fill=0)
+            y += 56
+        draw.text((100, y), f"{label}: {value}", font=body, fill=0)
+        y += 80
+    draw.rectangle((60, 60, size[0] - 60, y + 40), outline=0, width=3)
+    return img
+
+
+def truth_for(doc_types: Sequence[str], person: dict, language: str) -> Tuple[dict, dict]:
+    """(fields, alternates) a perfect reader would extract from these pages."""
+    present = {key for t in doc_types for key, _, _ in _LAYOUTS[t][1]}
+    fields = {f: (f"{person[f]} years" if f == "age" else person[f]) if f in present else None
+              for f in _TRUTH_FIELDS}
+    alternates = {"name": [person["name_hi"]]} if language == "hi" else {}
+    return fields, alternates
+
+
+def degrade(img: Image.Image, rng: random.Random, noise: float, blur: float, rotate: float) -> Tuple[Image.Image, dict]:
+    applied = {
+        "rotation_deg": round(rng.uniform(-rotate, rotate), 2),
+        "blur_radius": round(rng.uniform(0, blur), 2),
+        "noise_sigma": round(rng.uniform(0, noise), 2),
+    }
+    if applied["rotation_deg"]:
+        img = img.rotate(applied["rotation_deg"], resample=Image.BICUBIC, expand=True, fillcolor=255)
+    if applied["blur_radius"]:
+        img = img.filter(ImageFilter.GaussianBlur(applied["blur_radius"]))
+    if applied["noise_sigma"]:
+        arr = np.asarray(img, dtype=np.float32)
+        arr += np.random.default_rng(rng.randrange(1 << 32)).normal(0, applied["noise_sigma"], arr.shape)
+        img = Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8))
+    return img, applied
+
+
+def encode(img: Image.Image, jpeg_quality: int) -> Tuple[bytes, str]:
+    buf = io.BytesIO()
+    if jpeg_quality:
+        img.save(buf, "JPEG", quality=jpeg_quality)
+        return buf.getvalue(), ".jpg"
+    img.save(buf, "PNG")
+    return buf.getvalue(), ".png"
+
+
+def generate(out: Path, count: int, pdfs: int, doc_types: Sequence[str], languages: Sequence[str],
+             fonts: Fonts, noise: float, blur: float, rotate: float, jpeg_quality: int, seed: int) -> dict:
+    """Write the corpus to ``out`` and return its manifest."""
+    rng = random.Random(seed)
+    out.mkdir(parents=True, exist_ok=True)
+    documents = []
+
+    def page(doc_type, person, language):
+        return degrade(render_page(doc_type, person, language, fonts), rng, noise, blur, rotate)
+
+    for i in range(count):
+        person = make_person(rng)
+        doc_type, language = rng.choice(doc_types), rng.choice(languages)
+        img, applied = page(doc_type, person, language)
+        data, ext = encode(img, jpeg_quality)
+        name = f"{i:05d}-{doc_type}-{language}{ext}"
+        (out / name).write_bytes(data)
+        fields, alternates = truth_for([doc_type], person, language)
+        documents.append({"file": name, "kind": "image", "pages": 1, "doc_types": [doc_type],
+                          "language": language, "degradation": [applied],
+                          "fields": fields, "alternates": alternates})
+
+    for i in range(pdfs):
+        person = make_person(rng)
+        language = rng.choice(languages)
+        types = rng.sample(list(doc_types), min(len(doc_types), rng.randint(2, 3)))
+        pages, applied = zip(*(page(t, person, language) for t in types))
+        name = f"pdf-{i:05d}-{language}.pdf"
+        pages[0].convert("RGB").save(out / name, "PDF", save_all=True, resolution=150,
+                                     append_images=[p.convert("RGB") for p in pages[1:]])
+        fields, alternates = truth_for(types, person, language)
+        documents.append({"file": name, "kind": "pdf", "pages": len(pages), "doc_types": list(types),
+                          "language": language, "degradation": list(applied),
+                          "fields": fields, "alternates": alternates})
+
+    manifest = {
+        "seed": seed,
+        "settings": {"noise": noise, "blur": blur, "rotate": rotate, "jpeg_quality": jpeg_quality,
+                     "fonts": {"latin": str(fonts.latin), "devanagari": str(fonts.devanagari or "")},
+                     "raqm": features.check("raqm")},
+        "documents": documents,
+    }
+    (out / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+    return manifest
+
+
+def resolve_fonts(font: Optional[Path], font_hi: Optional[Path], languages: List[str]) -> Tuple[Fonts, List[str]]:
+    """Pick fonts; drop ``hi`` from ``languages`` (with a warning) if there is no Devanagari font."""
+    latin = font or find_font(_LATIN_FONTS)
+    if latin is None:
+        raise SystemExit("no TrueType font found; pass --font /path/to/font.ttf")
+    devanagari = font_hi or find_font(_DEVANAGARI_FONTS)
+    if "hi" in languages:
+        if devanagari is None:
+            print("warning: no Devanagari font found (pass --font-hi); skipping Hindi pages", file=sys.stderr)
+            languages = [lang for lang in languages if lang != "hi"]
+        elif not features.check("raqm"):
+            print("warning: Pillow has no libraqm; Devanagari is drawn without shaping", file=sys.stderr)
+    if not languages:
+        raise SystemExit("no languages left to render")
+    return Fonts(latin, devanagari), languages
+
+
+def add_render_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--count", type=int, default=50, help="single-page image documents")
+    ap.add_argument("--pdfs", type=int, default=10, help="multi-page PDF documents")
+    ap.add_argument("--types", default=",".join(DOC_TYPES))
+    ap.add_argument("--languages", default=",".join(LANGUAGES))
+    ap.add_argument("--noise", type=float, default=12, help="max Gaussian noise sigma (0-255 scale)")
+    ap.add_argument("--blur", type=float, default=1.0, help="max Gaussian blur radius (px)")
+    ap.add_argument("--rotate", type=float, default=2.0, help="max rotation either way (degrees)")
+    ap.add_argument("--jpeg-quality", type=int, default=70, help="JPEG quality of images; 0 writes PNG")
+    ap.add_argument("--font", type=Path)
+    ap.add_argument("--font-hi", type=Path)
+    ap.add_argument("--seed", type=int, default=11)
+
+
+def generate_from_args(args, out: Path) -> dict:
+    doc_types = [t for t in args.types.split(",") if t]
+    unknown = set(doc_types) - set(DOC_TYPES)
+    if unknown:
+        raise SystemExit(f"unknown --types: {', '.join(sorted(unknown))}")
+    fonts, languages = resolve_fonts(args.font, args.font_hi, [lang for lang in args.languages.split(",") if lang])
+    return generate(out, args.count, args.pdfs, doc_types, languages, fonts,
+                    args.noise, args.blur, args.rotate, args.jpeg_quality, args.seed)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--out", type=Path, required=True)
+    add_render_args(ap)
+    args = ap.parse_args()
+    manifest = generate_from_args(args, args.out)
+    pages = sum(d["pages"] for d in manifest["documents"])
+    print(f"{len(manifest['documents'])} documents ({pages} pages) written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
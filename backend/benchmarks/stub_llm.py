@@ -0,0 +1,101 @@
+"""
+Stub LLM server
+---------------
+OpenAI-compatible ``POST /v1/chat/completions`` stand-in for offline load
+tests. It answers after ``--latency-ms`` (plus up to ``--jitter-ms``) with a
+canned reply shaped like the real one for each caller: a JSON object for
+OCR field extraction, a short title for document naming, the letter itself
+(placeholders intact) for grievance template translation, plain text for
+everything else, and a ``usage`` block counting whitespace-separated words
+as tokens. ``--error-rate`` makes that fraction of calls return 503, to
+exercise the retry path.
+
+Run from ``backend/``::
+
+    python -m benchmarks.stub_llm --port 8901 --latency-ms 400
+
+then start the app with ``LLM_BASE_URL=http://127.0.0.1:8901/v1``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+_FIELDS = {
+    "Full Name": "Ramesh Kumar",
+    "Date of Birth": "15/08/1958",
+    "Pension ID": "PPO/2018/004521",
+    "Account Number": "30412345678",
+    "IFSC Code": "SBIN0001234",
+}
+
+
+def _reply(messages: list) -> str:
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    if "field extraction" in system:
+        return json.dumps(_FIELDS)
+    if "document name" in system:
+        return "Pension Payment Order – Ramesh Kumar"
+    if "formal letters" in system:
+        # Grievance templates: keep the text, and its placeholders, as the "translation".
+        letter = next((m.get("content", "") for m in messages if m.get("role") == "user"), "")
+        return "अनुवाद:\n" + letter
+    if "translat" in system.lower():
+        return "आपकी पेंशन हर महीने की पहली तारीख को आपके बैंक खाते में जमा की जाएगी।"
+    return (
+        "Your pension is paid into your bank account on the first working day of every month. "
+        "If it is late by more than 30 days, you can file a grievance with your pension office."
+    )
+
+
+def build_app(latency_ms: float, jitter_ms: float, error_rate: float, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="Stub LLM")
+    rng = random.Random(seed)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await asyncio.sleep((latency_ms + rng.random() * jitter_ms) / 1000)
+        if rng.random() < error_rate:
+            return JSONResponse({"error": {"message": "overloaded"}}, status_code=503)
+        content = _reply(body.get("messages", []))
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        completion_tokens = len(content.split())
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    return app
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8901)
+    ap.add_argument("--latency-ms", type=float, default=400)
+    ap.add_argument("--jitter-ms", type=float, default=200)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    args = ap.parse_args()
+    uvicorn.run(
+        build_app(args.latency_ms, args.jitter_ms, args.error_rate),
+        host=args.host, port=args.port, log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
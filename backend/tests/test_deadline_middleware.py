@@ -0,0 +1,50 @@
+import asyncio
+
+from fastapi import BackgroundTasks, FastAPI
+from fastapi.testclient import TestClient
+
+from app import deadline
+from app.middleware.deadline import REQUESTS_CANCELLED, DeadlineMiddleware
+
+
+def _cancelled(reason: str) -> float:
+    return REQUESTS_CANCELLED._values.get((reason,), 0)
+
+
+def test_background_tasks_outlive_the_response():
+    # Like uvicorn, TestClient reports http.disconnect once the response is complete.
+    ran = {}
+
+    async def job():
+        await asyncio.sleep(0.05)
+        ran["remaining"] = deadline.remaining()
+        ran["done"] = True
+
+    app = FastAPI()
+
+    @app.post("/work")
+    async def work(background_tasks: BackgroundTasks):
+        background_tasks.add_task(job)
+        return {"ok": True}
+
+    app.add_middleware(DeadlineMiddleware, rules=[], default=5)
+    before = _cancelled("disconnect")
+    with TestClient(app) as client:
+        assert client.post("/work").json() == {"ok": True}
+    assert ran == {"remaining": None, "done": True}
+    assert _cancelled("disconnect") == before
+
+
+def test_deadline_still_cuts_off_a_slow_handler():
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(5)
+        return {}
+
+    app.add_middleware(DeadlineMiddleware, rules=[("GET", "/slow", 0.1)])
+    with TestClient(app) as client:
+        r = client.get("/slow")
+    assert r.status_code == 504
+    assert r.json()["error"] == "deadline_exceeded"
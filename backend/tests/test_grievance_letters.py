@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app import deadline
+from app.db import db
+from app.local_store import LocalDB
+from app.models import grievance_letters
+
+
+@pytest.mark.parametrize("scheme, template_id", [
+    # Exact scheme names, including the values the frontend sends.
+    ("IGNOAPS", "nsap"),
+    ("IGNWPS", "nsap"),
+    ("EPF95", "eps"),
+    ("Railway", "ops"),
+    ("NPS", "nps"),
+    ("OPS", "ops"),
+    ("Employees' Pension Scheme", "eps"),
+    # A scheme family named inside the text wins over a generic kind of pension.
+    ("EPS family pension", "eps"),
+    ("EPS-95 pension", "eps"),
+    ("NPS family pension", "nps"),
+    ("IGNWPS widow pension", "nsap"),
+    ("Old Age Pension (IGNOAPS)", "nsap"),
+    # Generic kinds alone fall to the template that usually pays them.
+    ("Family pension", "ops"),
+    ("Railway family pension", "ops"),
+    ("Widow pension", "nsap"),
+    # Anything else gets the general letter.
+    ("Gratuity", "general"),
+    ("", "general"),
+])
+def test_template_for(scheme, template_id):
+    assert grievance_letters.template_for(scheme) == template_id
+
+
+def test_every_alias_maps_to_its_own_template():
+    for template_id, entry in grievance_letters.templates().items():
+        for scheme in [*entry.get("schemes", ()), *entry.get("generic", ())]:
+            assert grievance_letters.template_for(scheme) == template_id, scheme
+
+
+def test_templates_fill_every_placeholder():
+    for entry in grievance_letters.templates().values():
+        letter = grievance_letters.fill(
+            entry["template"], "en", name="Ramesh Kumar", scheme="EPS-95", last_payment="2024-01-10", delay_days=45,
+        )
+        assert "{" not in letter and "}" not in letter
+        assert "Ramesh Kumar" in letter and "10 January 2024" in letter and "45" in letter
+
+
+def test_placeholders_intact():
+    source = "I, {name}, under {scheme}. Yours, {name}"
+    assert grievance_letters.placeholders_intact(source, "मैं, {name}, {scheme} के अंतर्गत। {name}")
+    assert not grievance_letters.placeholders_intact(source, "मैं, {नाम}, {scheme} के अंतर्गत। {name}")
+    assert not grievance_letters.placeholders_intact(source, "मैं, {name}, {scheme} के अंतर्गत।")
+
+
+def test_shared_translation_outlives_the_starting_request(monkeypatch, tmp_path):
+    async def slow_translate(source, language):
+        await asyncio.sleep(0.1)
+        return source
+
+    monkeypatch.setattr(db, "_local", LocalDB(tmp_path / "samaan.db"))
+    monkeypatch.setattr(grievance_letters, "_translate", slow_translate)
+    monkeypatch.setattr(grievance_letters, "_translations", {})
+
+    async def run():
+        token = deadline.start(0.05)
+        try:
+            return await grievance_letters.template_text("eps", "hi")
+        finally:
+            deadline.finish(token)
+
+    text, language = asyncio.run(run())
+    assert language == "hi"
+    assert text == grievance_letters.templates()["eps"]["template"]
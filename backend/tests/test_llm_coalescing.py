@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from app import deadline
+from app.services import llm_provider
+
+
+def test_shared_call_does_not_inherit_the_first_deadline(monkeypatch):
+    calls = []
+
+    async def slow_completion(messages, *args):
+        calls.append(deadline.remaining())
+        await asyncio.sleep(0.1)
+        return llm_provider.LLMResponse(content="ok", model="stub")
+
+    monkeypatch.setattr(llm_provider, "_chat_completion", slow_completion)
+    messages = [{"role": "user", "content": "shared deadline test"}]
+
+    async def hurried():
+        token = deadline.start(0.05)
+        try:
+            return await llm_provider.chat_completion(messages, cache=True)
+        finally:
+            deadline.finish(token)
+
+    async def run():
+        first = asyncio.ensure_future(hurried())
+        await asyncio.sleep(0)
+        second = await llm_provider.chat_completion(messages, cache=True)
+        with pytest.raises(llm_provider.LLMTimeoutError):
+            await first
+        return second
+
+    assert asyncio.run(run()).content == "ok"
+    assert calls == [None]
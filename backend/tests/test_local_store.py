@@ -0,0 +1,34 @@
+import asyncio
+import json
+import threading
+
+from app.local_store import LocalDB, LocalStore
+
+
+def test_collection_does_not_wait_for_the_writer(tmp_path):
+    store = LocalStore(tmp_path / "samaan.db")
+    busy = threading.Event()
+    store.write(lambda conn: busy.wait(5))  # writer stuck in a long group commit
+
+    async def run():
+        users = store.collection("users")  # returns at once
+        assert not store._tables["users"].done()
+        lookup = asyncio.ensure_future(users.find_one({"username": "asha"}))
+        await asyncio.sleep(0.05)
+        assert not lookup.done()
+        busy.set()
+        return await lookup
+
+    assert asyncio.run(run()) is None
+    store.close()
+
+
+def test_legacy_json_is_imported_on_first_use(tmp_path):
+    (tmp_path / "users.json").write_text(json.dumps({"asha": {"password": "x"}}))
+    local = LocalDB(tmp_path / "samaan.db", legacy_dir=tmp_path)
+
+    async def run():
+        return await local.users.find_one({"username": "asha"}, {"_id": 0})
+
+    assert asyncio.run(run()) == {"username": "asha", "password": "x"}
+    assert (tmp_path / "users.json.migrated").exists()
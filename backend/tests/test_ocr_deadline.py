@@ -0,0 +1,22 @@
+import time
+
+import pdf2image
+import pytest
+from PIL import Image
+
+from app import deadline
+from app.models import ocr_engine
+
+
+def test_deadline_during_pdf_render_is_not_swallowed(monkeypatch):
+    def slow_render(content, dpi):
+        time.sleep(0.2)
+        return [Image.new("RGB", (10, 10), "white")]
+
+    monkeypatch.setattr(pdf2image, "convert_from_bytes", slow_render)
+    token = deadline.start(0.1)
+    try:
+        with pytest.raises(deadline.DeadlineExceeded):
+            ocr_engine.ocr_extract_from_upload(b"%PDF-1.4 test", "a.pdf")
+    finally:
+        deadline.finish(token)
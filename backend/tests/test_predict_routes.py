@@ -0,0 +1,29 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.db import db
+from app.local_store import LocalDB
+from app.models import session_tokens
+from app.routes import predict
+
+PAYMENTS = {"dates": ["2024-01-01", "2024-02-01"]}
+
+
+def _auth(username):
+    return {"Authorization": "Bearer " + session_tokens.issue_pair(username)["access_token"]}
+
+
+def test_recording_payments_needs_the_users_own_token(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "_local", LocalDB(tmp_path / "samaan.db"))
+    asyncio.run(db.users.insert_one({"username": "asha", "password": "x"}))
+    app = FastAPI()
+    app.include_router(predict.router)
+    client = TestClient(app)
+
+    assert client.post("/predict-delay/asha/payments", json=PAYMENTS).status_code == 401
+    assert client.post("/predict-delay/asha/payments", json=PAYMENTS, headers=_auth("ravi")).status_code == 403
+    assert client.post("/predict-delay/ghost/payments", json=PAYMENTS, headers=_auth("ghost")).status_code == 404
+    r = client.post("/predict-delay/asha/payments", json=PAYMENTS, headers=_auth("asha"))
+    assert r.status_code == 200 and r.json()["count"] == 2
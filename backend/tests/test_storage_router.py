@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+
+from app.db import StorageReadOnly, StorageRouter
+from app.local_store import LocalDB
+
+
+def test_local_store_is_read_only_after_failover(tmp_path):
+    router = StorageRouter()
+    router._local = LocalDB(tmp_path / "samaan.db")
+
+    async def run():
+        # Before MongoDB has answered, the local store is the store of record.
+        await router.users.insert_one({"username": "asha"})
+        router._had_mongo = True  # MongoDB served requests, then went away
+        with pytest.raises(StorageReadOnly):
+            await router.users.insert_one({"username": "ravi"})
+        with pytest.raises(StorageReadOnly):
+            await router.sessions.update_one({"username": "asha"}, {"$set": {"revoked_before": 1}}, upsert=True)
+        await router.chat_sessions.insert_one({"session_id": "s1"})
+        return await router.users.find_one({"username": "asha"}, {"_id": 0})
+
+    assert asyncio.run(run()) == {"username": "asha"}
+    assert router._local_writes == 1
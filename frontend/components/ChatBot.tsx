@@ -11,6 +11,7 @@ export default function ChatBot({ isOpen, onClose }: Props) {
     const [messages, setMessages] = useState<ChatMsg[]>([
         { role: 'assistant', content: 'Namaste! 🙏 I\'m your SAMAAN pension assistant. Ask me anything about your pension, payment delays, or schemes.' }
     ])
+    const [sessionId, setSessionId] = useState<string | null>(null)
     const [input, setInput] = useState('')
     const [loading, setLoading] = useState(false)
     const endRef = useRef<HTMLDivElement>(null)
@@ -28,12 +29,12 @@ export default function ChatBot({ isOpen, onClose }: Props) {
         const text = input.trim()
         if (!text || loading) return
         const userMsg: ChatMsg = { role: 'user', content: text }
-        const updated = [...messages, userMsg]
-        setMessages(updated)
+        setMessages(prev => [...prev, userMsg])
         setInput('')
         setLoading(true)
         try {
-            const reply = await sendChatMessage(updated)
+            const { reply, sessionId: sid } = await sendChatMessage(text, sessionId)
+            setSessionId(sid)
             setMessages(prev => [...prev, { role: 'assistant', content: reply }])
         } finally {
             setLoading(false)
@@ -21,7 +21,7 @@ export async function ocrExtract(file: File) {
   return res.data
 }
 
-export async function generateGrievance(payload: { scheme: string; last_payment: string; delay_days: number; name: string }) {
+export async function generateGrievance(payload: { scheme: string; last_payment: string; delay_days: number; name: string; language?: string }) {
   const res = await axios.post(`${BASE}/generate-grievance`, payload)
   return res.data
 }
@@ -40,9 +40,16 @@ export async function fetchDashboardData() {
   }
 }
 
-export async function listUsers() {
-  const res = await axios.get(`${BASE}/users`)
-  return res.data
+// /users streams NDJSON: one {type: "user"} line per user, then {type: "end"}.
+export async function listUsers(params: { after?: string; limit?: number } = {}) {
+  const res = await axios.get(`${BASE}/users`, { params, responseType: 'text' })
+  const lines = String(res.data).split('\n').filter(Boolean).map((l) => JSON.parse(l))
+  const end = lines.find((l) => l.type === 'end') ?? {}
+  return {
+    users: lines.filter((l) => l.type === 'user').map((l) => ({ username: l.username })),
+    next: end.next ?? null,
+    storage: end.storage,
+  }
 }
 
 export async function getProfile(username: string) {
@@ -65,11 +72,16 @@ export interface ChatMsg {
   content: string
 }
 
-export async function sendChatMessage(messages: ChatMsg[]): Promise<string> {
+// The server keeps the conversation; only the new message and the session id
+// it handed out are sent.
+export async function sendChatMessage(
+  message: string,
+  sessionId: string | null
+): Promise<{ reply: string; sessionId: string | null }> {
   try {
-    const res = await axios.post(`${BASE}/chat`, { messages })
-    return res.data.reply
+    const res = await axios.post(`${BASE}/chat`, { message, session_id: sessionId })
+    return { reply: res.data.reply, sessionId: res.data.session_id ?? sessionId }
   } catch {
-    return 'Sorry, I could not connect to the server. Please try again.'
+    return { reply: 'Sorry, I could not connect to the server. Please try again.', sessionId }
   }
 }